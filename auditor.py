@@ -1,47 +1,211 @@
-import yaml
 import sys
-from jinja2 import Template
 from configs.llmconfig import llm_manager
 from concurrent.futures import ThreadPoolExecutor
 from utils.github_reader import GitHubReader
+from utils.archive_reader import ArchiveReader
+from utils.audit_store import get_audit_store
+from utils.repo_source import is_local_repo, open_reader, parse_repo_url
+from utils.prompt_registry import prompt_registry
 from configs.model_config import ModelConfig
+from configs.env_config import EnvConfig
+from utils.chunker import chunk_source, estimate_tokens, number_lines
+from utils.telemetry import bind, telemetry
+from utils.llm_budget import BudgetExceeded, truncate_content
 import os
 
 class CodeAnalyst:
     def __init__(self, github_token, model_config: ModelConfig = None):
         self.reader = GitHubReader(github_token)
         self.model_config = model_config or ModelConfig()
+        # 本地仓库路径 -> LocalRepoReader
+        self._local_readers = {}
+        # 本次审计已下载的提交归档，提前审计的随机轨道与之后的核心轨道共用，close 时释放
+        self._archive = None
+        self._archive_sha = None
 
     def _parse_repo(self, repo_url):
         """
-        repo_url: https://github.com/owner/repo
+        repo_url: https://github.com/owner/repo、file:// URL 或本地路径
         """
-        parts = repo_url.rstrip("/").split("/")
-        return parts[-2], parts[-1]
+        return parse_repo_url(repo_url)
 
-    def _get_file_full_content(self, repo_url, path):
+    def _reader_for(self, repo_url):
+        if not is_local_repo(repo_url):
+            return self.reader
+        if repo_url not in self._local_readers:
+            self._local_readers[repo_url] = open_reader(repo_url)
+        return self._local_readers[repo_url]
+
+    def _read_file(self, repo_url, path, sha=None, ref=None, reader=None):
+        owner, repo = self._parse_repo(repo_url)
+        return (reader or self._reader_for(repo_url)).get_file_raw(owner, repo, path, sha=sha, ref=ref)
+
+    def _get_file_full_content(self, repo_url, path, sha=None, ref=None, reader=None):
         try:
-            owner, repo = self._parse_repo(repo_url)
-            return self.reader.get_file_raw(owner, repo, path)
+            return self._read_file(repo_url, path, sha=sha, ref=ref, reader=reader)
         except Exception as e:
             return f"Error fetching file {path}: {str(e)}"
 
     def _load_prompt(self, role, **kwargs):
-        with open(f"prompts/auditor.yaml", "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        sys_p = data[role]['system']
-        usr_p = Template(data[role]['user']).render(**kwargs)
-        return sys_p, usr_p
-
-    def _audit_single_file(self, repo_url, path, role, model_name):
-        content = self._get_file_full_content(repo_url, path)
+        return prompt_registry.render("auditor", role, **kwargs)
+
+    def _chunk_budget(self, model_name):
+        """单个片段的 token 预算：不超过配置值，也不超过模型上下文窗口的一半"""
+        return min(EnvConfig.get_audit_chunk_tokens(), llm_manager.get_context_tokens(model_name) // 2)
+
+    def _open_archive(self, repo_url, paths, blob_shas, commit_sha, later=0):
+        """
+        本次审计待读取且未命中 blob 缓存的文件数达到 ARCHIVE_THRESHOLD 时，
+        改为一次性下载该提交的归档；否则返回 None，继续逐个读取
+        Args:
+            later: 本次审计中之后才会读取的文件数（如随机轨道提前审计时尚未规划的核心轨道），按未命中缓存计入
+        """
+        if self._archive is not None and self._archive_sha == commit_sha:
+            return self._archive
+        self.close()
+        threshold = EnvConfig.get_archive_threshold()
+        if not threshold or not commit_sha or is_local_repo(repo_url):
+            return None
+        cache = self.reader.blob_cache
+        missing = [p for p in set(paths) if not (cache and blob_shas.get(p) in cache)]
+        if not missing or len(missing) + later < threshold:
+            return None
+        owner, repo = self._parse_repo(repo_url)
+        try:
+            self._archive = ArchiveReader.download(self.reader, owner, repo, commit_sha)
+        except Exception as e:
+            print(f"⚠️ 归档下载失败，改为逐个读取文件: {e}")
+            return None
+        self._archive_sha = commit_sha
+        return self._archive
+
+    def close(self):
+        """释放本次审计下载的提交归档"""
+        if self._archive is not None:
+            self._archive.close()
+        self._archive = None
+        self._archive_sha = None
+
+    def _audit_single_file(self, repo_url, path, role, model_name, sha=None, ref=None, reader=None):
+        """
+        审计单个文件；blob SHA 已知时先查审计结果存储，
+        文件内容、模型与提示词均未变化则直接复用历史结论
+        """
+        with telemetry.span("audit_single_file", path=path, role=role, model=model_name):
+            store = get_audit_store() if sha else None
+            prompt_version = prompt_registry.version("auditor", role)
+            if store is not None:
+                stored = store.get(sha, role, model_name, prompt_version)
+                if stored is not None:
+                    print(f"[{'CORE' if 'primary' in role else 'RAND'}] 文件未变化，复用历史审计结论: {path}")
+                    return dict(stored, path=path)
+
+            try:
+                content = self._read_file(repo_url, path, sha=sha, ref=ref, reader=reader)
+            except Exception as e:
+                # 读取失败的结果不写入存储，下次运行重新审计
+                content = f"Error fetching file {path}: {str(e)}"
+                store = None
+
+            try:
+                result = self._audit_content(path, content, role, model_name)
+            except BudgetExceeded as e:
+                # 预算不足跳过的文件不写入存储，预算充足时重新审计
+                print(f"[{'CORE' if 'primary' in role else 'RAND'}] 预算不足，跳过审计: {path}（{e}）")
+                return {"path": path, "report": f"（因 LLM 预算限制未审计：{e}）", "skipped": "budget"}
+            # 按实际生成结论的模型存储（预算降级时为更便宜的模型）；提示词被截断或各片段模型不一致的结论
+            # 只用于本次报告，不作为该文件的审计结论长期复用
+            if store is not None and not result.get("skipped") and not result.get("truncated") and result.get("model"):
+                store.put(sha, role, result["model"], prompt_version, result)
+            return result
+
+    def _audit_content(self, path, content, role, model_name):
+        budget = self._chunk_budget(model_name)
+        if estimate_tokens(content) > budget:
+            return self._audit_chunked_file(path, content, role, model_name, budget)
+
         sys_p, usr_p = self._load_prompt(role, file_path=path, file_content=content)
         
         print(f"[{'CORE' if 'primary' in role else 'RAND'}] 正在审计: {path}...")
-        report = llm_manager.call(model_name, sys_p, usr_p)
-        return {"path": path, "report": report}
+        reply = llm_manager.call_result(
+            model_name, sys_p, usr_p,
+            role="primary_audit" if 'primary' in role else "random_audit",
+            shrink=lambda ratio: self._load_prompt(
+                role, file_path=path, file_content=truncate_content(content, ratio)
+            )[1],
+        )
+        return self._with_provenance({"path": path, "report": reply.content}, [reply])
+
+    @staticmethod
+    def _with_provenance(result, replies):
+        """记录生成结论的模型（各次调用不一致时为 None）与提示词是否被截断"""
+        models = {r.model for r in replies}
+        result["model"] = models.pop() if len(models) == 1 else None
+        if any(r.truncated for r in replies):
+            result["truncated"] = True
+        return result
 
-    def run_dual_track_audit(self, audit_plan):
+    def _audit_chunked_file(self, path, content, role, model_name, budget):
+        """
+        大文件 map-reduce 审计：按函数/类边界切片后并发审计，
+        再按片段顺序合并为单个文件报告（片段内行号即原文件行号）
+        reduce 只做拼接，不再额外调用 LLM 合并：片段互不重叠，且提示词要求只审计本片段内的代码，
+        各片段的结论不会重复；跨片段、跨文件的归纳由 Synthesizer 统一完成
+        """
+        chunks = chunk_source(path, content, budget)
+        total_lines = content.count("\n") + 1
+        print(f"[{'CORE' if 'primary' in role else 'RAND'}] 正在分片审计: {path}（{len(chunks)} 个片段）...")
+        skipped = []
+        replies = []
+
+        def audit_chunk(chunk):
+            numbered = number_lines(chunk.text, chunk.start_line)
+
+            def render(file_content):
+                return self._load_prompt(
+                    role,
+                    file_path=path,
+                    file_content=file_content,
+                    chunk={
+                        "index": chunk.index,
+                        "total": len(chunks),
+                        "start_line": chunk.start_line,
+                        "end_line": chunk.end_line,
+                        "total_lines": total_lines,
+                    },
+                )
+
+            sys_p, usr_p = render(numbered)
+            try:
+                reply = llm_manager.call_result(
+                    model_name, sys_p, usr_p,
+                    role="primary_audit" if 'primary' in role else "random_audit",
+                    shrink=lambda ratio: render(truncate_content(numbered, ratio))[1],
+                )
+                replies.append(reply)
+                return reply.content
+            except BudgetExceeded as e:
+                # 单个片段超出预算时保留其余片段的结论
+                skipped.append(chunk.index)
+                return f"（该片段因 LLM 预算限制未审计：{e}）"
+
+        workers = max(1, min(len(chunks), EnvConfig.get_audit_chunk_workers()))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            reports = list(executor.map(bind(audit_chunk), chunks))
+
+        sections = [
+            f"### 片段 {chunk.index}/{len(chunks)}（第 {chunk.start_line}-{chunk.end_line} 行）\n{report}"
+            for chunk, report in zip(chunks, reports)
+        ]
+        result = self._with_provenance(
+            {"path": path, "report": "\n\n".join(sections), "chunks": len(chunks)}, replies
+        )
+        if skipped:
+            result["skipped"] = "budget_partial"
+        return result
+
+    @telemetry.traced("run_dual_track_audit")
+    def run_dual_track_audit(self, audit_plan, prior_results=None):
         """
         接收 Strategist 的输出: 
         audit_plan = {
@@ -50,29 +214,54 @@ class CodeAnalyst:
             "random_tracks": [...],
             "metadata": {...}
         }
+        prior_results: 提前完成的审计结果（同结构的 {"core": [...], "random": [...]}），
+            计划中仍包含的文件直接复用，不再重复审计
         """
         repo_url = audit_plan["repo_url"]
+        # 按 Strategist 固定的提交读取，保证审计内容与规划时一致
+        commit_sha = audit_plan.get("metadata", {}).get("commit_sha")
+        blob_shas = audit_plan.get("metadata", {}).get("blob_shas", {})
         audit_reports = {"core": [], "random": []}
 
         # 从配置获取模型名称
         primary_model = self.model_config.get_model_name("primary_audit")
         random_model = self.model_config.get_model_name("random_audit")
-        
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            core_tasks = [
-                executor.submit(self._audit_single_file, repo_url, path, "primary_auditor", primary_model)
-                for path in audit_plan['core_tracks']
-            ]
-            
-            random_tasks = [
-                executor.submit(self._audit_single_file, repo_url, path, "random_auditor", random_model)
-                for path in audit_plan['random_tracks']
-            ]
-
-            for task in core_tasks:
-                audit_reports["core"].append(task.result())
-            
-            for task in random_tasks:
-                audit_reports["random"].append(task.result())
+
+        # 人工修改计划后核心文件可能与随机轨道重复，以核心轨道为准
+        core_tracks = list(dict.fromkeys(audit_plan['core_tracks']))
+        random_tracks = [p for p in dict.fromkeys(audit_plan['random_tracks']) if p not in core_tracks]
+        prior = {
+            track: {r["path"]: r for r in (prior_results or {}).get(track, [])}
+            for track in ("core", "random")
+        }
+        pending = [p for p in core_tracks if p not in prior["core"]] + \
+                  [p for p in random_tracks if p not in prior["random"]]
+
+        # 整个审计计划读取的文件数（含提前审计的随机轨道），多于本计划时其余文件之后才会读取
+        later = max(0, audit_plan.get("metadata", {}).get("planned_files", 0) - len(core_tracks) - len(random_tracks))
+        archive = self._open_archive(repo_url, pending, blob_shas, commit_sha, later)
+        try:
+            # 线程池只负责提交任务，每个模型的实际并发由 llm_manager 的自适应限制器控制
+            total = len(pending)
+            with ThreadPoolExecutor(max_workers=max(1, min(total, EnvConfig.get_audit_max_workers()))) as executor:
+                core_tasks = [
+                    prior["core"].get(path) or executor.submit(bind(self._audit_single_file), repo_url, path, "primary_auditor", primary_model, blob_shas.get(path), commit_sha, archive)
+                    for path in core_tracks
+                ]
+
+                random_tasks = [
+                    prior["random"].get(path) or executor.submit(bind(self._audit_single_file), repo_url, path, "random_auditor", random_model, blob_shas.get(path), commit_sha, archive)
+                    for path in random_tracks
+                ]
+
+                for task in core_tasks:
+                    audit_reports["core"].append(task if isinstance(task, dict) else task.result())
+
+                for task in random_tasks:
+                    audit_reports["random"].append(task if isinstance(task, dict) else task.result())
+        finally:
+            # 之后还有文件要读（随机轨道提前审计）时保留归档给下一批复用
+            if not later:
+                self.close()
 
         return audit_reports
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+本地 GitHub API 替身
+覆盖尽调流程用到的接口：仓库信息、提交、git ref / commit / tree（含递归与截断）、README、contents、
+zipball、issue 搜索与 GraphQL。支持可配置的延迟、抖动、429 注入与 X-RateLimit 配额响应头
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from benchmarks.synthetic import SyntheticRepo
+from utils.blob_cache import git_blob_sha
+
+_COMMITTED_AT = "2026-01-01T00:00:00Z"
+
+
+class MockGitHub:
+    """
+    Args:
+        repos: {"owner/repo": SyntheticRepo}
+        latency / jitter: 每个请求的基础延迟与随机抖动（秒）
+        error_rate: 以该概率返回 429（带 Retry-After），模拟二级限流
+        retry_after: 注入 429 时的 Retry-After 秒数
+        rate_limit: 每个 token 每小时的 core 配额
+        max_tree_entries: 递归 tree 的条目上限，超出时与 GitHub 一样返回 truncated=true
+    """
+
+    def __init__(
+        self,
+        repos: Dict[str, SyntheticRepo],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        rate_limit: int = 5000,
+        max_tree_entries: int = 100000,
+        seed: int = 0,
+    ):
+        self.repos = repos
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.max_tree_entries = max_tree_entries
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._remaining: Dict[tuple, int] = {}
+        self._reset_at = int(time.time()) + 3600
+        self.counts: Dict[str, int] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MockGitHub":
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def sleep(self):
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def inject_error(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def take_quota(self, token: str, resource: str) -> tuple:
+        """扣减配额，返回 (limit, remaining)"""
+        limit = 30 if resource == "search" else self.rate_limit
+        with self._lock:
+            key = (token, resource)
+            remaining = self._remaining.get(key, limit)
+            if remaining > 0:
+                remaining -= 1
+            self._remaining[key] = remaining
+            return limit, remaining
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self.counts)
+        counts["requests"] = sum(v for k, v in counts.items() if k.startswith("endpoint:"))
+        return counts
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，关闭 Nagle 以免每个请求多出约 40ms 的延迟确认等待
+    disable_nagle_algorithm = True
+    mock: MockGitHub = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+        self.mock.count("bytes", len(body))
+
+    def _json(self, obj, status: int = 200, headers=None):
+        self._send(status, json.dumps(obj).encode("utf-8"), headers=headers)
+
+    def _begin(self, resource: str) -> Optional[dict]:
+        """公共前置处理：延迟、429 注入与配额；返回应附加的配额响应头，已直接响应时返回 None"""
+        self.mock.sleep()
+        token = self.headers.get("Authorization", "").partition(" ")[2] or "anonymous"
+        if self.mock.inject_error():
+            self.mock.count("rate_limited")
+            self._json(
+                {"message": "You have exceeded a secondary rate limit."}, 429,
+                headers={"Retry-After": self.mock.retry_after},
+            )
+            return None
+        limit, remaining = self.mock.take_quota(token, resource)
+        headers = {
+            "X-RateLimit-Limit": limit,
+            "X-RateLimit-Remaining": remaining,
+            "X-RateLimit-Reset": self.mock._reset_at,
+            "X-RateLimit-Resource": resource,
+        }
+        if remaining <= 0:
+            self.mock.count("rate_limited")
+            self._json({"message": "API rate limit exceeded"}, 403, headers=headers)
+            return None
+        return headers
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path.rstrip("/").endswith("/graphql"):
+            self.mock.count("endpoint:graphql")
+            headers = self._begin("graphql")
+            if headers is None:
+                return
+            variables = json.loads(body or b"{}").get("variables", {})
+            data, errors = {}, []
+            for key, owner in variables.items():
+                if not key.startswith("o"):
+                    continue
+                index = key[1:]
+                name = f"{owner}/{variables.get('n' + index)}"
+                data[f"r{index}"] = self._graphql_repo(name)
+                if data[f"r{index}"] is None:
+                    # 与 GitHub 一致：单个仓库不存在时其余别名照常返回，错误按别名路径列出
+                    errors.append({
+                        "type": "NOT_FOUND",
+                        "path": [f"r{index}"],
+                        "message": f"Could not resolve to a Repository with the name '{name}'.",
+                    })
+            payload = {"data": data, "errors": errors} if errors else {"data": data}
+            return self._json(payload, headers=headers)
+        self._json({"message": "Not Found"}, 404)
+
+    def _graphql_repo(self, name: str):
+        repo = self.mock.repos.get(name)
+        if repo is None:
+            return None
+        return {
+            "stargazerCount": repo.num_files,
+            "forkCount": repo.num_files // 10,
+            "defaultBranchRef": {"target": {"committedDate": _COMMITTED_AT}},
+            "openIssues": {"totalCount": 10},
+            "closedIssues": {"totalCount": 90},
+        }
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        query = parse_qs(parsed.query)
+
+        if path.startswith("/search/issues"):
+            self.mock.count("endpoint:search")
+            headers = self._begin("search")
+            if headers is None:
+                return
+            q = query.get("q", [""])[0]
+            return self._json({"total_count": 10 if "is:open" in q else 100, "items": []}, headers=headers)
+
+        m = re.match(r"^/repos/([^/]+/[^/]+)(/.*)?$", path)
+        repo = self.mock.repos.get(m.group(1)) if m else None
+        if repo is None:
+            self.mock.count("endpoint:not_found")
+            return self._json({"message": "Not Found"}, 404)
+        rest = m.group(2) or ""
+        segments = rest.split("/")[1:]
+        endpoint = "/".join(segments[:2] if segments[:1] == ["git"] else segments[:1]) or "repo"
+        self.mock.count(f"endpoint:{endpoint}")
+        headers = self._begin("core")
+        if headers is None:
+            return
+
+        if not rest:
+            return self._json({
+                "full_name": repo.name,
+                "stargazers_count": repo.num_files,
+                "forks_count": repo.num_files // 10,
+                "default_branch": "main",
+            }, headers=headers)
+        if rest == "/commits":
+            return self._json([self._commit(repo)], headers=headers)
+        if rest.startswith("/commits/"):
+            return self._json(self._commit(repo), headers=headers)
+        if rest.startswith("/git/ref/heads/"):
+            return self._json({"object": {"sha": repo.commit_sha, "type": "commit"}}, headers=headers)
+        if rest.startswith("/git/commits/"):
+            return self._json({"sha": repo.commit_sha, "tree": {"sha": repo.tree_sha}}, headers=headers)
+        if rest.startswith("/git/trees/"):
+            return self._tree(repo, rest[len("/git/trees/"):], "recursive" in query, headers)
+        if rest == "/readme":
+            return self._contents(repo, "README.md", headers)
+        if rest.startswith("/contents/"):
+            return self._contents(repo, rest[len("/contents/"):], headers)
+        if rest.startswith("/zipball/"):
+            return self._send(200, repo.zipball(rest[len("/zipball/"):]), "application/zip", headers)
+        self._json({"message": "Not Found"}, 404, headers=headers)
+
+    def _commit(self, repo: SyntheticRepo) -> dict:
+        return {
+            "sha": repo.commit_sha,
+            "commit": {"tree": {"sha": repo.tree_sha}, "committer": {"date": _COMMITTED_AT}},
+        }
+
+    def _tree(self, repo: SyntheticRepo, ref: str, recursive: bool, headers):
+        # 分支名 / 提交 SHA 都解析为根 tree
+        dirpath = repo.tree_dirs.get(ref, "")
+        sha = ref if ref in repo.tree_dirs else repo.tree_sha
+        if not recursive:
+            return self._json({"sha": sha, "tree": repo.children.get(dirpath, []), "truncated": False}, headers=headers)
+        entries = []
+        truncated = False
+        for entry in repo.walk(dirpath):
+            if len(entries) >= self.mock.max_tree_entries:
+                truncated = True
+                break
+            entries.append(entry)
+        return self._json({"sha": sha, "tree": entries, "truncated": truncated}, headers=headers)
+
+    def _contents(self, repo: SyntheticRepo, path: str, headers):
+        if path not in repo:
+            return self._json({"message": "Not Found"}, 404, headers=headers)
+        data = repo.content(path)
+        return self._json({
+            "path": path,
+            "sha": git_blob_sha(data),
+            "size": len(data),
+            "encoding": "base64",
+            "content": base64.b64encode(data).decode("ascii"),
+        }, headers=headers)
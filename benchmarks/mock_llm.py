@@ -0,0 +1,173 @@
+"""
+本地 OpenAI 兼容的 chat completions 替身
+支持普通与流式（SSE）响应、usage 统计，以及可配置的首 token 延迟、抖动、生成速率、响应长度与 429 注入。
+Strategist 的选文件请求返回合成仓库中预设的核心文件，其余请求返回固定长度的审计文本
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Strategist 提示词中要求的输出格式标记
+_STRATEGIST_MARKER = "file_path_1"
+
+
+class MockLLM:
+    """
+    Args:
+        core_paths: Strategist 请求返回的核心文件路径
+        latency / jitter: 首 token 前的基础延迟与随机抖动（秒）
+        tokens_per_second: 生成速率；流式响应按该速率分片输出
+        completion_tokens: 每个响应的 token 数（以单词近似）
+        error_rate: 以该概率返回 429（带 Retry-After）
+        retry_after: 注入 429 时的 Retry-After 秒数
+    """
+
+    def __init__(
+        self,
+        core_paths: Optional[List[str]] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        tokens_per_second: float = 0.0,
+        completion_tokens: int = 200,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+    ):
+        self.core_paths = core_paths or []
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "MockLLM":
+        handler = type("Handler", (_Handler,), {"mock": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + self._rng.uniform(0, self.jitter)
+
+    def inject_error(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def answer(self, prompt: str) -> str:
+        if _STRATEGIST_MARKER in prompt and self.core_paths:
+            return "\n".join(f"- file_path_{i + 1}: {p}" for i, p in enumerate(self.core_paths))
+        return " ".join(f"finding{i % 50}" for i in range(self.completion_tokens))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，关闭 Nagle 以免每个请求多出约 40ms 的延迟确认等待
+    disable_nagle_algorithm = True
+    mock: MockLLM = None
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj, status: int = 200, headers=None):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, payload: str):
+        data = f"data: {payload}\n\n".encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json({"error": {"message": "Not Found"}}, 404)
+        body = json.loads(raw or b"{}")
+        self.mock.count("requests")
+        self.mock.count("prompt_bytes", len(raw))
+
+        time.sleep(self.mock.delay())
+        if self.mock.inject_error():
+            self.mock.count("rate_limited")
+            return self._json(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, 429,
+                headers={"Retry-After": self.mock.retry_after},
+            )
+
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        answer = self.mock.answer(prompt)
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(answer.split()),
+            "total_tokens": len(prompt) // 4 + len(answer.split()),
+        }
+        self.mock.count("completion_tokens", usage["completion_tokens"])
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            if self.mock.tokens_per_second:
+                time.sleep(usage["completion_tokens"] / self.mock.tokens_per_second)
+            return self._json({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.mock.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = answer.split(" ")
+        step = 20
+        try:
+            for i in range(0, len(words), step):
+                piece = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                if self.mock.tokens_per_second:
+                    time.sleep(len(words[i:i + step]) / self.mock.tokens_per_second)
+                self._chunk(json.dumps({
+                    "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._chunk(json.dumps({
+                    "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [], "usage": usage,
+                }))
+            self._chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开（如对冲请求被取消）
+            self.mock.count("aborted")
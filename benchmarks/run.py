@@ -0,0 +1,323 @@
+"""
+端到端基准测试
+在本地启动 mock GitHub 与 mock OpenAI 兼容服务，对不同规模的合成仓库运行完整尽调流程
+（run_code_analyst_role 与 LangGraph app），记录墙钟时间、请求数与内存峰值，并与基线比较以发现性能回退。
+
+每个场景在独立子进程中运行（干净的全局状态与准确的内存峰值），子进程通过环境变量指向 mock 服务：
+    python -m benchmarks.run                                  # 默认规模 10,1000,10000,100000
+    python -m benchmarks.run --sizes 10,1000 --gh-latency 0.05 --llm-error-rate 0.1
+    python -m benchmarks.run --update-baseline                # 重新记录基线
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# 子进程输出结果所在行的前缀
+_RESULT_MARKER = "@@BENCH_RESULT@@ "
+
+def _max_rss_mb() -> float:
+    """进程至今的最大常驻内存（MB）；不支持的平台返回 0"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 1024
+
+
+# 与基线比较的指标：(名称, 绝对容差)；超出 基线 * (1 + tolerance) + 绝对容差 视为回退
+_COMPARED_METRICS = [
+    ("wall_seconds", 0.5),
+    ("github_requests", 2),
+    ("llm_requests", 2),
+    ("peak_memory_mb", 5.0),
+]
+
+# 影响测量结果的参数；与基线记录时不同则比较结果不可靠
+_SCENARIO_SETTINGS = [
+    "file_bytes", "seed", "gh_latency", "gh_jitter", "gh_error_rate", "max_tree_entries",
+    "llm_latency", "llm_jitter", "llm_error_rate", "llm_tokens_per_second", "llm_completion_tokens",
+    "retry_after", "tracemalloc",
+]
+
+
+def _run_child(target: str, repo_url: str, trace_memory: bool = False) -> Dict[str, Any]:
+    """
+    子进程：运行一次完整流程并输出测量结果
+    peak_memory_mb 为运行期间最大常驻内存相对运行前的增量；tracemalloc 会让流程慢数倍，
+    只在 trace_memory 时开启，用于定位 Python 对象的分配峰值
+    """
+    import threading
+    import tracemalloc
+
+    # 先导入流程模块，使模块自身的导入开销不计入测量
+    from configs.env_config import EnvConfig
+    from configs.model_config import ModelConfig
+    from utils.telemetry import telemetry
+    if target == "langgraph":
+        try:
+            import code_analysit_langgraph as pipeline
+        except ImportError as e:
+            return {"status": "skipped", "reason": f"langgraph 不可用: {e}"}
+    else:
+        import code_analysit as pipeline
+
+    token = EnvConfig.get_github_token()
+    rss_before = _max_rss_mb()
+    if trace_memory:
+        tracemalloc.start()
+    telemetry.reset()
+    started = time.perf_counter()
+    if target == "langgraph":
+        config = {"configurable": {"thread_id": f"bench-{os.getpid()}"}}
+        inputs = {
+            "repo_url": repo_url,
+            "token": token,
+            "model_name": ModelConfig().get_model_name("synthesizer"),
+        }
+        # 第一次调用在人工审查点（auditor_node 之前）暂停，第二次调用直接继续
+        pipeline.app.invoke(inputs, config=config)
+        report = pipeline.app.invoke(None, config=config).get("final_report", "")
+    else:
+        report = pipeline.run_code_analyst_role(repo_url, token, report_path="report.md")
+    wall = time.perf_counter() - started
+
+    manifest = telemetry.manifest()
+    result = {
+        "status": "ok",
+        "wall_seconds": round(wall, 3),
+        "peak_memory_mb": round(_max_rss_mb() - rss_before, 1),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+        "report_chars": len(report or ""),
+        "threads": threading.active_count(),
+        "telemetry": manifest["totals"],
+        "stages": {name: stage["seconds"] for name, stage in manifest["stages"].items()},
+    }
+    if trace_memory:
+        result["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def _child_env(github_url: str, llm_url: str, extra: Dict[str, str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "PYTHONUNBUFFERED": "1",
+        "GITHUB_API_URL": github_url,
+        "GITHUB_GRAPHQL_URL": github_url + "/graphql",
+        "GITHUB_TOKEN": "bench-token",
+        "GITHUB_TOKENS": "",
+        "GITHUB_PROXY": "",
+        "OPENROUTER_BASE_URL": llm_url + "/v1",
+        "OPENROUTER_API_KEY": "bench-key",
+        # 关闭所有跨运行的缓存，每个场景都是冷启动
+        "HTTP_CACHE_PATH": "",
+        "BLOB_CACHE_ENABLED": "0",
+        "LLM_CACHE_ENABLED": "0",
+        "AUDIT_STORE_ENABLED": "0",
+        "TELEMETRY_ENABLED": "1",
+        "TELEMETRY_MANIFEST_PATH": "",
+        "TELEMETRY_PROM_PATH": "",
+    })
+    env.update(extra)
+    return env
+
+
+def run_scenario(target: str, size: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """启动 mock 服务并在子进程中运行一个场景"""
+    from benchmarks.mock_github import MockGitHub
+    from benchmarks.mock_llm import MockLLM
+    from benchmarks.synthetic import SyntheticRepo
+
+    name = f"bench/repo{size}"
+    build_started = time.perf_counter()
+    repo = SyntheticRepo(size, file_bytes=args.file_bytes, seed=args.seed, name=name)
+    build_seconds = time.perf_counter() - build_started
+
+    github = MockGitHub(
+        {name: repo},
+        latency=args.gh_latency,
+        jitter=args.gh_jitter,
+        error_rate=args.gh_error_rate,
+        retry_after=args.retry_after,
+        max_tree_entries=args.max_tree_entries,
+        seed=args.seed,
+    ).start()
+    llm = MockLLM(
+        repo.core_paths,
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        tokens_per_second=args.llm_tokens_per_second,
+        completion_tokens=args.llm_completion_tokens,
+        error_rate=args.llm_error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    ).start()
+
+    scenario = {"target": target, "files": size, "synthetic_build_seconds": round(build_seconds, 3)}
+    try:
+        with tempfile.TemporaryDirectory(prefix="duediligai-bench-") as workdir:
+            cmd = [sys.executable, "-m", "benchmarks.run", "--child", target,
+                   "--repo-url", f"https://github.com/{name}"] + (["--tracemalloc"] if args.tracemalloc else [])
+            try:
+                proc = subprocess.run(
+                    cmd, cwd=workdir, env=_child_env(github.url, llm.url, {}),
+                    capture_output=True, text=True, timeout=args.timeout,
+                )
+            except subprocess.TimeoutExpired:
+                scenario.update(status="timeout")
+                return scenario
+
+        lines = [l for l in proc.stdout.splitlines() if l.startswith(_RESULT_MARKER)]
+        if proc.returncode != 0 or not lines:
+            tail = (proc.stderr or proc.stdout).strip().splitlines()[-15:]
+            scenario.update(status="error", returncode=proc.returncode, error="\n".join(tail))
+            return scenario
+        scenario.update(json.loads(lines[-1][len(_RESULT_MARKER):]))
+    finally:
+        github.stop()
+        llm.stop()
+
+    gh_stats, llm_stats = github.stats(), llm.stats()
+    scenario.update({
+        "github_requests": gh_stats.get("requests", 0),
+        "github_bytes": gh_stats.get("bytes", 0),
+        "github_rate_limited": gh_stats.get("rate_limited", 0),
+        "github_endpoints": {k.split(":", 1)[1]: v for k, v in gh_stats.items() if k.startswith("endpoint:")},
+        "llm_requests": llm_stats.get("requests", 0),
+        "llm_rate_limited": llm_stats.get("rate_limited", 0),
+        "llm_completion_tokens": llm_stats.get("completion_tokens", 0),
+    })
+    return scenario
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回回退描述列表"""
+    regressions = []
+    recorded = {(s["target"], s["files"]): s for s in baseline.get("scenarios", [])}
+    for scenario in results:
+        base = recorded.get((scenario["target"], scenario["files"]))
+        if scenario.get("status") not in ("ok", "skipped"):
+            regressions.append(f"{scenario['target']}/{scenario['files']}: 运行失败 ({scenario.get('status')})")
+            continue
+        if base is None or scenario.get("status") != "ok" or base.get("status") != "ok":
+            continue
+        for metric, slack in _COMPARED_METRICS:
+            if metric not in base or metric not in scenario:
+                continue
+            limit = base[metric] * (1 + tolerance) + slack
+            if scenario[metric] > limit:
+                regressions.append(
+                    f"{scenario['target']}/{scenario['files']}: {metric} {scenario[metric]} > {limit:.2f} "
+                    f"(基线 {base[metric]})"
+                )
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'target':<10}{'files':>8}{'status':>9}{'wall_s':>9}{'gh_req':>8}{'gh_MB':>8}{'llm_req':>9}{'peak_MB':>9}{'rss_MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for s in results:
+        if s.get("status") != "ok":
+            print(f"{s['target']:<10}{s['files']:>8}{s.get('status', '?'):>9}")
+            continue
+        print(
+            f"{s['target']:<10}{s['files']:>8}{'ok':>9}{s['wall_seconds']:>9.2f}{s['github_requests']:>8}"
+            f"{s['github_bytes'] / 2 ** 20:>8.1f}{s['llm_requests']:>9}{s['peak_memory_mb']:>9.1f}"
+            f"{s.get('max_rss_mb', 0):>8.0f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="代码分析师 - 端到端基准测试（本地 mock GitHub / LLM）")
+    parser.add_argument("--sizes", type=str, default="10,1000,10000,100000", help="合成仓库文件数，逗号分隔")
+    parser.add_argument("--targets", type=str, default="cli,langgraph", help="cli（run_code_analyst_role）和/或 langgraph")
+    parser.add_argument("--file-bytes", type=int, default=2000, help="合成文件的大致字节数")
+    parser.add_argument("--seed", type=int, default=0, help="合成仓库与 mock 服务的随机种子")
+    parser.add_argument("--gh-latency", type=float, default=0.0, help="mock GitHub 每个请求的基础延迟（秒）")
+    parser.add_argument("--gh-jitter", type=float, default=0.0, help="mock GitHub 延迟抖动上限（秒）")
+    parser.add_argument("--gh-error-rate", type=float, default=0.0, help="mock GitHub 返回 429 的概率")
+    parser.add_argument("--max-tree-entries", type=int, default=100000, help="递归 tree 的条目上限（超出即截断）")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="mock LLM 首 token 前的基础延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="mock LLM 延迟抖动上限（秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="mock LLM 返回 429 的概率")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="mock LLM 生成速率，0 为不限速")
+    parser.add_argument("--llm-completion-tokens", type=int, default=200, help="mock LLM 每个响应的 token 数")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="注入 429 时的 Retry-After（秒）")
+    parser.add_argument("--timeout", type=float, default=900, help="单个场景的超时（秒）")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="相对基线允许的增幅（0.25 即 25%%）")
+    parser.add_argument("--output", type=str, help="把本次结果写入 JSON 文件")
+    parser.add_argument("--tracemalloc", action="store_true", help="额外用 tracemalloc 记录 Python 分配峰值（显著拖慢运行，墙钟时间不可与基线比较）")
+    parser.add_argument("--child", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--repo-url", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # 子进程：流程自身的日志照常输出，结果单独一行
+        result = _run_child(args.child, args.repo_url, trace_memory=args.tracemalloc)
+        print(_RESULT_MARKER + json.dumps(result, ensure_ascii=False), flush=True)
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    results = []
+    for target in targets:
+        for size in sizes:
+            print(f"[BENCH] {target} / {size} 个文件 ...", flush=True)
+            scenario = run_scenario(target, size, args)
+            if scenario.get("status") == "error":
+                print(f"[BENCH] 失败:\n{scenario.get('error')}")
+            elif scenario.get("status") == "skipped":
+                print(f"[BENCH] 跳过: {scenario.get('reason')}")
+            results.append(scenario)
+
+    print()
+    print_table(results)
+    report = {
+        "python": sys.version.split()[0],
+        "settings": {k: getattr(args, k) for k in _SCENARIO_SETTINGS},
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已更新: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线 {args.baseline}，使用 --update-baseline 记录")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    changed = [k for k in _SCENARIO_SETTINGS if baseline.get("settings", {}).get(k) != getattr(args, k)]
+    if changed:
+        print(f"\n注意: 参数 {', '.join(changed)} 与基线记录时不同，比较结果仅供参考")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n性能回退:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n与基线相比未发现回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+合成仓库
+按文件数确定性地生成仓库结构与文件内容（同样的参数每次生成完全相同的仓库），
+供 mock GitHub 服务使用；文件内容按路径即时生成，10 万个文件也不需要常驻内存
+"""
+import hashlib
+import io
+import random
+import zipfile
+from typing import Dict, Iterator, List, Optional
+
+from utils.blob_cache import git_blob_sha
+
+# 每类文件在仓库中的占比（按序号取模分配）：源码 14/20、测试 3/20、文档 2/20、数据 1/20
+_KIND_CYCLE = ["src"] * 14 + ["tests"] * 3 + ["docs"] * 2 + ["data"]
+
+# 单个目录下的文件数上限，超过时继续分层
+_DIR_FANOUT = 50
+
+
+def _tree_sha(owner_repo: str, dirpath: str) -> str:
+    return hashlib.sha1(f"tree {owner_repo}:{dirpath}".encode("utf-8")).hexdigest()
+
+
+class SyntheticRepo:
+    """
+    Args:
+        num_files: 文件总数（含 README.md）
+        file_bytes: 每个源码文件的大致字节数
+        seed: 内容生成的随机种子
+        name: 仓库名（owner/repo），用于生成提交与 tree SHA
+    """
+
+    def __init__(self, num_files: int, file_bytes: int = 2000, seed: int = 0, name: str = "bench/repo"):
+        self.num_files = max(1, num_files)
+        self.file_bytes = file_bytes
+        self.seed = seed
+        self.name = name
+        self.commit_sha = hashlib.sha1(f"commit {name}:{num_files}:{seed}".encode("utf-8")).hexdigest()
+
+        self.paths: List[str] = ["README.md"] + [self._path_for(i) for i in range(self.num_files - 1)]
+        self._path_set = set(self.paths)
+        self._modules = [p for p in self.paths if p.startswith("src/")]
+
+        # 目录 -> 直接子项；tree SHA -> 目录
+        self.children: Dict[str, List[Dict]] = {"": []}
+        self.tree_dirs: Dict[str, str] = {self.tree_sha: ""}
+        for path in self.paths:
+            self._add(path)
+        for entries in self.children.values():
+            entries.sort(key=lambda e: e["path"])
+
+    @property
+    def tree_sha(self) -> str:
+        return _tree_sha(self.name, "")
+
+    @property
+    def core_paths(self) -> List[str]:
+        """mock LLM 作为 Strategist 的回答返回的核心文件"""
+        return (self._modules or self.paths)[:3]
+
+    def _path_for(self, index: int) -> str:
+        kind = _KIND_CYCLE[index % len(_KIND_CYCLE)]
+        k = index // len(_KIND_CYCLE) * _KIND_CYCLE.count(kind) + _KIND_CYCLE[: index % len(_KIND_CYCLE)].count(kind)
+        group, sub = k // (_DIR_FANOUT * _DIR_FANOUT), k // _DIR_FANOUT % _DIR_FANOUT
+        if kind == "src":
+            return f"src/pkg{group}/sub{sub}/module_{k}.py"
+        if kind == "tests":
+            return f"tests/pkg{group}/sub{sub}/test_module_{k}.py"
+        if kind == "docs":
+            return f"docs/section{group}/page_{k}.md"
+        return f"data/part{group}/sample_{k}.json"
+
+    def _add(self, path: str):
+        parts = path.split("/")
+        for depth in range(1, len(parts)):
+            dirpath = "/".join(parts[:depth])
+            if dirpath not in self.children:
+                self.children[dirpath] = []
+                sha = _tree_sha(self.name, dirpath)
+                self.tree_dirs[sha] = dirpath
+                self.children["/".join(parts[: depth - 1])].append(
+                    {"path": parts[depth - 1], "mode": "040000", "type": "tree", "sha": sha}
+                )
+        data = self.content(path)
+        self.children["/".join(parts[:-1])].append(
+            {"path": parts[-1], "mode": "100644", "type": "blob", "sha": git_blob_sha(data), "size": len(data)}
+        )
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._path_set
+
+    def content(self, path: str) -> bytes:
+        """按路径确定性地生成文件内容"""
+        rng = random.Random(f"{self.seed}:{path}")
+        if path == "README.md":
+            text = f"# {self.name}\n\n合成基准仓库，共 {self.num_files} 个文件。\n"
+        elif path.endswith(".py"):
+            text = self._python_source(path, rng)
+        elif path.endswith(".md"):
+            text = f"# {path}\n\n" + "文档内容。\n" * max(1, self.file_bytes // 40)
+        else:
+            text = "[" + ",".join(str(rng.randint(0, 1000)) for _ in range(max(1, self.file_bytes // 8))) + "]\n"
+        return text.encode("utf-8")
+
+    def _python_source(self, path: str, rng: random.Random) -> str:
+        lines = []
+        if self._modules:
+            for dep in rng.sample(self._modules, min(2, len(self._modules))):
+                if dep != path:
+                    lines.append(f"from {dep[:-3].rsplit('/', 1)[0].replace('/', '.')} import {dep[:-3].rsplit('/', 1)[1]}")
+        lines.append("")
+        i = 0
+        while sum(len(l) + 1 for l in lines) < self.file_bytes:
+            lines += [
+                f"def function_{i}(value):",
+                f"    result = value * {rng.randint(2, 99)} + {rng.randint(0, 9)}",
+                "    if result % 2:",
+                "        return result // 2",
+                "    return result",
+                "",
+            ]
+            i += 1
+        return "\n".join(lines) + "\n"
+
+    def walk(self, dirpath: str = "", prefix: str = "") -> Iterator[Dict]:
+        """按 git 的先序遍历顺序产出 dirpath 下的全部条目（路径相对 dirpath）"""
+        for entry in self.children.get(dirpath, []):
+            item = dict(entry, path=prefix + entry["path"])
+            yield item
+            if entry["type"] == "tree":
+                child = f"{dirpath}/{entry['path']}" if dirpath else entry["path"]
+                yield from self.walk(child, item["path"] + "/")
+
+    def zipball(self, ref: Optional[str] = None) -> bytes:
+        """与 GitHub zipball 相同的目录结构：所有文件位于 <owner>-<repo>-<sha>/ 之下"""
+        top = f"{self.name.replace('/', '-')}-{(ref or self.commit_sha)[:7]}/"
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in self.paths:
+                zf.writestr(top + path, self.content(path))
+        return buf.getvalue()
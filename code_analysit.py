@@ -5,55 +5,104 @@
 import os
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from scanner import analyze_repo
 from strategist import Strategist
 from auditor import CodeAnalyst
 from synthesizer import Synthesizer
 from configs.env_config import EnvConfig
 from configs.model_config import ModelConfig
+from configs.llmconfig import llm_manager
+from utils.repo_source import is_local_repo, open_reader, parse_repo_url
+from utils.repo_snapshot import RepoSnapshot
+from utils.audit_store import get_audit_store
+from utils.telemetry import bind, telemetry
+from utils.llm_budget import llm_budget
 
 
-def run_code_analyst_role(repo_url, github_token, model_config: ModelConfig = None):
+def run_due_diligence(repo_url, github_token, model_config: ModelConfig = None, scan_result=None,
+                      report_path=None):
     """
-    运行代码分析师角色
+    执行完整的尽调流程，返回各阶段产物
     Args:
-        repo_url: GitHub仓库URL
-        github_token: GitHub Token
+        repo_url: GitHub仓库URL，或本地仓库路径 / file:// URL
+        github_token: GitHub Token（本地仓库可为 None）
         model_config: 模型配置对象（可选）
+        scan_result: 预先获取的 Scanner 结果（可选，批量模式下可复用）
+        report_path: 报告输出路径（可选），提供时 Synthesizer 以流式方式边生成边写入
+    Returns:
+        {"scan_result": ..., "audit_plan": ..., "audit_data": ..., "final_report": ...,
+         "llm_spend": 本次审计按阶段的 token 与费用}
     """
     if model_config is None:
         model_config = ModelConfig()
     
-    print(f"\n{'='*20} 代码分析师角色：启动深度尽调 {'='*20}\n")
+    # 预算范围覆盖本次审计的全部阶段（批量模式下各仓库分别计算）
+    with telemetry.span("run_due_diligence", repo=repo_url), llm_budget.scope(repo_url) as budget_scope:
+        print(f"\n{'='*20} 代码分析师角色：启动深度尽调 {'='*20}\n")
 
-    # 1. Scanner 阶段：抓取 GitHub 宏观指标
-    print("步骤 1: 抓取 GitHub 宏观数据...")
-    scan_result = analyze_repo(repo_url, github_token)
+        # 0. 解析仓库快照：固定提交 SHA，后续各阶段共享同一份 tree / README
+        owner, repo = parse_repo_url(repo_url)
+        snapshot = RepoSnapshot.resolve(open_reader(repo_url, github_token), owner, repo)
+        print(f"仓库快照: {owner}/{repo}@{snapshot.commit_sha[:12]}")
 
-    # 2. Strategist 阶段：规划审计路径
-    print("步骤 2: 正在根据目录树规划核心审计路径...")
-    strat = Strategist(repo_url, github_token, model_config=model_config)
-    audit_plan = strat.create_audit_plan()
-    print(f"审计路径: {audit_plan}")
-    
-    # 3. Auditor 阶段：执行深度双轨审计 (并发执行)
-    print("步骤 3: 启动主辅双轨代码审计...")
-    analyst = CodeAnalyst(github_token, model_config=model_config)
-    audit_data = analyst.run_dual_track_audit(audit_plan)
+        strat = Strategist(repo_url, github_token, model_config=model_config, snapshot=snapshot)
+        analyst = CodeAnalyst(github_token, model_config=model_config)
 
-    
-    # 4. Synthesizer 阶段：跨维度逻辑对撞
-    print("步骤 4: 正在融合宏观数据与微观审计，生成最终报告...")
-    synthesizer_model = model_config.get_model_name("synthesizer")
-    synth = Synthesizer(model_name=synthesizer_model)
-    
-    # 将 Scanner 的初步报告和 Auditor 的原始报告一起喂给整合者
-    final_report = synth.generate_final_report(
-        github_data=scan_result, 
-        audit_results=audit_data
-    )
-    
-    return final_report
+        # Scanner 与随机轨道审计都只依赖快照，与 Strategist 的 LLM 调用并行执行
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # 1. Scanner 阶段：抓取 GitHub 宏观指标
+            print("步骤 1: 抓取 GitHub 宏观数据...")
+            scan_future = None
+            if scan_result is None:
+                scan_future = executor.submit(bind(analyze_repo), repo_url, github_token, snapshot=snapshot)
+            random_future = executor.submit(bind(analyst.run_dual_track_audit), strat.create_random_plan())
+
+            # 2. Strategist 阶段：规划审计路径
+            print("步骤 2: 正在根据目录树规划核心审计路径...")
+            audit_plan = strat.create_audit_plan()
+            print(f"审计路径: {audit_plan}")
+
+            if scan_future is not None:
+                scan_result = scan_future.result()
+            early_results = random_future.result()
+
+        # 3. Auditor 阶段：执行深度双轨审计 (并发执行)，已提前完成的随机轨道直接复用
+        print("步骤 3: 启动主辅双轨代码审计...")
+        audit_data = analyst.run_dual_track_audit(audit_plan, prior_results=early_results)
+
+
+        # 4. Synthesizer 阶段：跨维度逻辑对撞
+        print("步骤 4: 正在融合宏观数据与微观审计，生成最终报告...")
+        synthesizer_model = model_config.get_model_name("synthesizer")
+        synth = Synthesizer(model_name=synthesizer_model)
+
+        # 将 Scanner 的初步报告和 Auditor 的原始报告一起喂给整合者
+        final_report = synth.generate_final_report(
+            github_data=scan_result, 
+            audit_results=audit_data,
+            output_path=report_path
+        )
+
+        return {
+            "scan_result": scan_result,
+            "audit_plan": audit_plan,
+            "audit_data": audit_data,
+            "final_report": final_report,
+            "llm_spend": llm_budget.scope_stats(budget_scope),
+        }
+
+
+def run_code_analyst_role(repo_url, github_token, model_config: ModelConfig = None, report_path=None):
+    """
+    运行代码分析师角色
+    Args:
+        repo_url: GitHub仓库URL
+        github_token: GitHub Token
+        model_config: 模型配置对象（可选）
+        report_path: 报告输出路径（可选），提供时报告边生成边写入
+    """
+    return run_due_diligence(repo_url, github_token, model_config, report_path=report_path)["final_report"]
 
 
 if __name__ == "__main__":
@@ -61,7 +110,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--repo-url",
         type=str,
-        help="GitHub仓库URL（例如：https://github.com/owner/repo）"
+        help="GitHub仓库URL（例如：https://github.com/owner/repo），也可为本地仓库路径或 file:// URL"
     )
     parser.add_argument(
         "--config",
@@ -83,28 +132,46 @@ if __name__ == "__main__":
         type=str,
         help="策略规划使用的模型"
     )
+    parser.add_argument(
+        "--strategist-mode",
+        choices=["llm", "heuristic", "hybrid"],
+        help="核心文件选择方式：llm、heuristic（依赖图排序，不调用 LLM）或 hybrid（排序结果供 LLM 参考）"
+    )
     parser.add_argument(
         "--synthesizer-model",
         type=str,
         help="综合报告生成使用的模型"
     )
+    parser.add_argument(
+        "--scanner-backend",
+        type=str,
+        choices=["rest", "graphql"],
+        help="Scanner 后端（rest 或 graphql，graphql 只需一次请求）"
+    )
+    parser.add_argument(
+        "--budget-usd",
+        type=float,
+        help="本次审计的 LLM 费用上限（美元），超出时按 LLM_BUDGET_ACTION 降级、截断或跳过"
+    )
     
     args = parser.parse_args()
     
-    # 获取GitHub Token
-    try:
-        github_token = EnvConfig.get_github_token()
-    except ValueError as e:
-        print(f"错误: {e}")
-        print("请设置 GITHUB_TOKEN 环境变量或创建 .env 文件")
-        exit(1)
-    
     # 获取仓库URL
     repo_url = args.repo_url or os.getenv("REPO_URL")
     if not repo_url:
         print("错误: 请通过 --repo-url 参数或 REPO_URL 环境变量指定仓库URL")
         exit(1)
     
+    # 获取GitHub Token（本地仓库无需 Token）
+    try:
+        github_token = EnvConfig.get_github_token()
+    except ValueError as e:
+        if not is_local_repo(repo_url):
+            print(f"错误: {e}")
+            print("请设置 GITHUB_TOKEN 环境变量或创建 .env 文件")
+            exit(1)
+        github_token = None
+    
     # 创建模型配置
     model_config = ModelConfig(config_file=args.config)
     
@@ -115,18 +182,75 @@ if __name__ == "__main__":
         os.environ["RANDOM_AUDIT_MODEL"] = args.random_audit_model
     if args.strategist_model:
         os.environ["STRATEGIST_MODEL"] = args.strategist_model
+    if args.strategist_mode:
+        os.environ["STRATEGIST_MODE"] = args.strategist_mode
     if args.synthesizer_model:
         os.environ["SYNTHESIZER_MODEL"] = args.synthesizer_model
+    if args.scanner_backend:
+        os.environ["SCANNER_BACKEND"] = args.scanner_backend
+    if args.budget_usd is not None:
+        os.environ["LLM_BUDGET_USD"] = str(args.budget_usd)
     
     try:
-        final_md = run_code_analyst_role(repo_url, github_token, model_config)
-        
         output_file = "final_due_diligence_report.md"
+        final_md = run_code_analyst_role(repo_url, github_token, model_config, report_path=output_file)
+        
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(final_md)
         
         print(f"\n{'='*20} 尽调任务完成 {'='*20}")
         print(f"最终报告已生成: {output_file}")
+
+        for model, stats in llm_manager.stream_stats().items():
+            print(
+                f"LLM 流式指标 [{model}]: 首 token 延迟 {stats['avg_ttft_seconds']}s，"
+                f"生成速率 {stats['tokens_per_second']} tokens/s"
+            )
+
+        for model, stats in llm_manager.concurrency_stats().items():
+            print(
+                f"LLM 自适应并发 [{model}]: 当前上限 {stats['limit']}（峰值 {stats['peak_limit']}），"
+                f"成功 {stats['successes']} 次，过载 {stats['overloads']} 次"
+            )
+
+        for route, count in llm_manager.resilience_stats()["fallbacks"].items():
+            print(f"LLM 备用模型切换 [{route}]: {count} 次")
+
+        for model, stats in llm_manager.hedge_stats().items():
+            print(
+                f"LLM 对冲 [{model}]: {stats['calls']} 次调用中对冲 {stats['hedged']} 次，"
+                f"对冲胜出 {stats['hedge_wins']} 次，触发延迟 {stats['trigger_seconds']}s"
+            )
+
+        spend = llm_manager.budget_stats()
+        for stage, stats in spend["stages"].items():
+            print(
+                f"LLM 花费 [{stage}]: {stats['calls']} 次调用，{stats['prompt_tokens']} + "
+                f"{stats['completion_tokens']} tokens，约 ${stats['cost_usd']:.4f}"
+                + (f"（降级 {stats['downgraded']}、截断 {stats['truncated']}、跳过 {stats['skipped']}）"
+                   if stats['downgraded'] or stats['truncated'] or stats['skipped'] else "")
+            )
+        print(f"LLM 总花费: 约 ${spend['cost_usd']:.4f}（调用前估算 ${spend['estimated_usd']:.4f}）")
+
+        cache_stats = llm_manager.cache_stats()
+        if cache_stats:
+            print(
+                f"LLM 缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}，"
+                f"节省约 {cache_stats['saved_seconds']}s、{cache_stats['saved_tokens']} tokens"
+            )
+
+        audit_store = get_audit_store()
+        if audit_store is not None:
+            store_stats = audit_store.stats()
+            print(f"增量审计: 复用 {store_stats['reused']} 个文件的历史结论，新审计 {store_stats['audited']} 个")
+
+        manifest = telemetry.manifest()
+        for stage, stats in manifest["stages"].items():
+            print(f"阶段耗时 [{stage}]: {stats['count']} 次，共 {stats['seconds']}s（最长 {stats['max_seconds']}s）")
+        manifest_path = telemetry.write_manifest(repo_url=repo_url)
+        prom_path = telemetry.write_prometheus()
+        if manifest_path or prom_path:
+            print(f"运行清单: {manifest_path or '-'}，Prometheus 指标: {prom_path or '-'}")
         
     except Exception as e:
         print(f"\n{'='*20} 角色运行崩溃 {'='*20}")
@@ -3,7 +3,7 @@ import os
 import json
 import argparse
 from configs.env_config import EnvConfig
-from typing import TypedDict,TypedDict,Annotated,List,Dict,Any
+from typing import TypedDict,Dict,Any
 from configs.model_config import ModelConfig
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.sqlite import SqliteSaver
@@ -13,6 +13,10 @@ from scanner import analyze_repo
 from strategist import Strategist
 from auditor import CodeAnalyst
 from synthesizer import Synthesizer
+from utils.repo_source import is_local_repo, open_reader, parse_repo_url
+from utils.repo_snapshot import RepoSnapshot
+from utils.telemetry import telemetry
+from utils.llm_budget import llm_budget
 
 class AuditState(TypedDict):
     # 输入信息
@@ -21,47 +25,73 @@ class AuditState(TypedDict):
     model_name: str
 
     # 中间数据
+    snapshot: Dict[str,Any]  # RepoSnapshot.to_dict()，各节点共享同一提交
     scanner_data: Dict[str,Any]  # Scanner 的输出
     audit_plan: Dict[str,Any]  # Strategist 的输出
-    audit_results: Annotated[List[Dict[str, Any]], operator.add]  # Auditor 的输出
+    early_audit_results: Dict[str,Any]  # 与 Strategist 并行提前完成的随机轨道审计
+    audit_results: Dict[str,Any]  # Auditor 的输出：{"core": [...], "random": [...]}
 
     # 最终产物
     final_report: str
+def snapshot_node(state:AuditState):
+    print("正在解析仓库快照")
+    owner, repo = parse_repo_url(state['repo_url'])
+    snapshot=RepoSnapshot.resolve(open_reader(state['repo_url'], state['token']), owner, repo)
+    return {"snapshot": snapshot.to_dict()}
+
 def scanner_node(state:AuditState):
     print("Scanner 正在抓取宏观指标")
-    result=analyze_repo(state['repo_url'], state['token'])
+    snapshot=RepoSnapshot.from_dict(state['snapshot'])
+    result=analyze_repo(state['repo_url'], state['token'], snapshot=snapshot)
     return {"scanner_data": result}
 
 def strategist_node(state:AuditState):
     print("Strategist 正在生成审计计划")
-    result=Strategist(state['repo_url'], state['token']).create_audit_plan()
+    snapshot=RepoSnapshot.from_dict(state['snapshot'])
+    result=Strategist(state['repo_url'], state['token'], snapshot=snapshot).create_audit_plan()
     return {"audit_plan": result}
 
+def random_audit_node(state:AuditState):
+    print("Auditor 正在提前审计随机轨道")
+    snapshot=RepoSnapshot.from_dict(state['snapshot'])
+    plan=Strategist(state['repo_url'], state['token'], snapshot=snapshot).create_random_plan()
+    # 各节点使用独立的 CodeAnalyst，归档无法留给之后的审计节点复用，只按本节点读取的文件数判断
+    plan["metadata"].pop("planned_files", None)
+    result=CodeAnalyst(state["token"]).run_dual_track_audit(plan)
+    return {"early_audit_results": result}
+
 def auditor_node(state:AuditState):
     print("Auditor 正在执行双轨道审计")
     analyst=CodeAnalyst(state["token"])
-    result=analyst.run_dual_track_audit(state["audit_plan"])
+    result=analyst.run_dual_track_audit(state["audit_plan"], prior_results=state.get("early_audit_results"))
     return {"audit_results": result}
 
 def synthesizer_node(state:AuditState):
     print("Synthesizer 正在生成审计报告")
     synthesizer=Synthesizer(state["model_name"])
-    result=synthesizer.generate_final_report(state["scanner_data"],state["audit_results"])
+    result=synthesizer.generate_final_report(
+        state["scanner_data"], state["audit_results"], output_path="langgraph_report.md"
+    )
     return {"final_report": result}
 
 
 workflow = StateGraph(AuditState)
 
 
+workflow.add_node("snapshot_node", snapshot_node)
 workflow.add_node("scanner_node", scanner_node)
 workflow.add_node("strategist_node", strategist_node)
+workflow.add_node("random_audit_node", random_audit_node)
 workflow.add_node("auditor_node", auditor_node)
 workflow.add_node("synthesizer_node", synthesizer_node)
 
 
-workflow.set_entry_point("scanner_node")
-workflow.add_edge("scanner_node", "strategist_node")
-workflow.add_edge("strategist_node", "auditor_node")
+workflow.set_entry_point("snapshot_node")
+# 快照之后 Scanner、Strategist 与随机轨道审计互不依赖，并行执行；三者全部完成后才进入人工审查与 Auditor
+workflow.add_edge("snapshot_node", "scanner_node")
+workflow.add_edge("snapshot_node", "strategist_node")
+workflow.add_edge("snapshot_node", "random_audit_node")
+workflow.add_edge(["scanner_node", "strategist_node", "random_audit_node"], "auditor_node")
 workflow.add_edge("auditor_node", "synthesizer_node")
 workflow.add_edge("synthesizer_node", END)
 
@@ -76,7 +106,7 @@ if __name__ == "__main__":
     parser.add_argument(
         "--repo-url",
         type=str,
-        help="GitHub仓库URL（例如：https://github.com/owner/repo）"
+        help="GitHub仓库URL（例如：https://github.com/owner/repo），也可为本地仓库路径或 file:// URL"
     )
     parser.add_argument(
         "--config",
@@ -98,6 +128,11 @@ if __name__ == "__main__":
         type=str,
         help="策略规划使用的模型"
     )
+    parser.add_argument(
+        "--strategist-mode",
+        choices=["llm", "heuristic", "hybrid"],
+        help="核心文件选择方式：llm、heuristic（依赖图排序，不调用 LLM）或 hybrid（排序结果供 LLM 参考）"
+    )
     parser.add_argument(
         "--synthesizer-model",
         type=str,
@@ -106,20 +141,22 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     
-    # 获取GitHub Token
-    try:
-        github_token = EnvConfig.get_github_token()
-    except ValueError as e:
-        print(f"错误: {e}")
-        print("请设置 GITHUB_TOKEN 环境变量或创建 .env 文件")
-        exit(1)
-    
     # 获取仓库URL
     repo_url = args.repo_url or os.getenv("REPO_URL")
     if not repo_url:
         print("错误: 请通过 --repo-url 参数或 REPO_URL 环境变量指定仓库URL")
         exit(1)
     
+    # 获取GitHub Token（本地仓库无需 Token）
+    try:
+        github_token = EnvConfig.get_github_token()
+    except ValueError as e:
+        if not is_local_repo(repo_url):
+            print(f"错误: {e}")
+            print("请设置 GITHUB_TOKEN 环境变量或创建 .env 文件")
+            exit(1)
+        github_token = None
+    
     model_config = ModelConfig(config_file=args.config)
 
     # 应用命令行参数（如果提供）
@@ -129,6 +166,8 @@ if __name__ == "__main__":
         os.environ["RANDOM_AUDIT_MODEL"] = args.random_audit_model
     if args.strategist_model:
         os.environ["STRATEGIST_MODEL"] = args.strategist_model
+    if args.strategist_mode:
+        os.environ["STRATEGIST_MODE"] = args.strategist_mode
     if args.synthesizer_model:
         os.environ["SYNTHESIZER_MODEL"] = args.synthesizer_model
     
@@ -148,6 +187,9 @@ if __name__ == "__main__":
             print("🛑 任务暂停：请审查 Agent 拟定的审计计划")
             print(f"核心轨道 (Core Tracks): {current_plan.get('core_tracks', [])}")
             print(f"随机轨道 (Random Tracks): {current_plan.get('random_tracks', [])}")
+            early = snapshot.values.get("early_audit_results", {}).get("random", [])
+            if early:
+                print(f"已提前完成的随机轨道审计: {[r['path'] for r in early]}")
             print("=" * 30)
 
             user_choice = input(
@@ -185,6 +227,10 @@ if __name__ == "__main__":
         with open("langgraph_report.md", "w", encoding="utf-8") as f:
             f.write(final_state['final_report'])
         print("✅ 基于 LangGraph 的自动化审计任务圆满完成！")
+        spend = llm_budget.stats()
+        print(f"LLM 花费: {spend['prompt_tokens']} + {spend['completion_tokens']} tokens，约 ${spend['cost_usd']:.4f}")
+        telemetry.write_manifest(repo_url=repo_url)
+        telemetry.write_prometheus()
 
     except Exception as e:
         print(f"❌ 运行中途出错: {e}")
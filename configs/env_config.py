@@ -3,7 +3,7 @@
 所有敏感信息必须从此模块读取
 """
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class EnvConfig:
@@ -13,7 +13,7 @@ class EnvConfig:
     @staticmethod
     def get_github_token() -> str:
         """获取GitHub Token"""
-        token = os.getenv("GITHUB_TOKEN")
+        token = os.getenv("GITHUB_TOKEN") or next(iter(EnvConfig.get_github_tokens()), None)
         if not token:
             raise ValueError(
                 "GITHUB_TOKEN 环境变量未设置。"
@@ -112,3 +112,362 @@ class EnvConfig:
         return os.getenv("SYNTHESIZER_MODEL", "deepseek-v3")
 
 
+
+    # 缓存配置
+    @staticmethod
+    def get_blob_cache_enabled() -> bool:
+        """是否启用文件内容（blob）缓存，默认启用"""
+        return os.getenv("BLOB_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def get_blob_cache_dir() -> str:
+        """获取 blob 缓存目录"""
+        return os.getenv("BLOB_CACHE_DIR", os.path.join(".cache", "blobs"))
+
+    @staticmethod
+    def get_blob_cache_max_bytes() -> int:
+        """获取 blob 缓存总大小上限（字节），默认 512MB"""
+        return int(os.getenv("BLOB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    @staticmethod
+    def get_blob_cache_max_entries() -> int:
+        """获取 blob 缓存条目数上限，默认 50000"""
+        return int(os.getenv("BLOB_CACHE_MAX_ENTRIES", "50000"))
+
+    # HTTP 传输层配置
+    @staticmethod
+    def get_http_timeout() -> float:
+        """获取 HTTP 请求超时时间（秒）"""
+        return float(os.getenv("HTTP_TIMEOUT", "30"))
+
+    @staticmethod
+    def get_http_pool_connections() -> int:
+        """获取连接池数量（按主机划分）"""
+        return int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+
+    @staticmethod
+    def get_http_pool_maxsize() -> int:
+        """获取单个主机的最大保活连接数"""
+        return int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+
+    @staticmethod
+    def get_http_cache_path() -> str:
+        """获取 ETag 条件请求缓存路径，设置为空字符串则关闭"""
+        return os.getenv("HTTP_CACHE_PATH", os.path.join(".cache", "http_cache.db"))
+
+    # 并发配置
+    @staticmethod
+    def get_github_concurrency() -> int:
+        """获取全局同时在途的 GitHub 请求数上限"""
+        return int(os.getenv("GITHUB_CONCURRENCY", "16"))
+
+    @staticmethod
+    def get_llm_concurrency() -> int:
+        """获取全局同时在途的 LLM 请求数上限"""
+        return int(os.getenv("LLM_CONCURRENCY", "32"))
+
+    # GitHub API 端点配置
+    @staticmethod
+    def get_github_api_url() -> str:
+        """获取 GitHub REST API 根地址（可指向 GitHub Enterprise 或本地桩服务）"""
+        return os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+    @staticmethod
+    def get_github_graphql_url() -> str:
+        """获取 GitHub GraphQL API 地址"""
+        return os.getenv("GITHUB_GRAPHQL_URL") or f"{EnvConfig.get_github_api_url()}/graphql"
+
+    @staticmethod
+    def get_scanner_backend() -> str:
+        """获取 Scanner 后端：rest（默认）或 graphql"""
+        return os.getenv("SCANNER_BACKEND", "rest").lower()
+
+    @staticmethod
+    def get_graphql_batch_size() -> int:
+        """获取单个 GraphQL 查询中合并的仓库数"""
+        return int(os.getenv("GRAPHQL_BATCH_SIZE", "20"))
+
+    # LLM 响应缓存配置
+    @staticmethod
+    def get_llm_cache_enabled() -> bool:
+        """是否启用 LLM 响应缓存（默认关闭）"""
+        return os.getenv("LLM_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_llm_cache_path() -> str:
+        """获取 LLM 响应缓存路径"""
+        return os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.db"))
+
+    @staticmethod
+    def get_llm_cache_ttl() -> int:
+        """获取 LLM 响应缓存有效期（秒），0 表示永不过期，默认 7 天"""
+        return int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+    @staticmethod
+    def get_llm_cache_max_entries() -> int:
+        """获取 LLM 响应缓存条目数上限"""
+        return int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+    @staticmethod
+    def get_llm_cache_max_bytes() -> int:
+        """获取 LLM 响应缓存总大小上限（字节），0 表示不限制，默认 256MB"""
+        return int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    @staticmethod
+    def get_llm_cache_roles() -> List[str]:
+        """
+        获取启用缓存的角色列表（逗号分隔，如 strategist,synthesizer）
+        为空表示所有角色均启用
+        """
+        roles = os.getenv("LLM_CACHE_ROLES", "")
+        return [r.strip() for r in roles.split(",") if r.strip()]
+
+    # LLM 客户端连接配置
+    @staticmethod
+    def get_llm_max_connections() -> int:
+        """获取每个 LLM 客户端的最大连接数"""
+        return int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+
+    @staticmethod
+    def get_llm_max_keepalive_connections() -> int:
+        """获取每个 LLM 客户端的最大保活连接数"""
+        return int(os.getenv("LLM_MAX_KEEPALIVE", "32"))
+
+    @staticmethod
+    def get_llm_timeout() -> float:
+        """获取 LLM 请求超时时间（秒），推理模型耗时较长，默认 600"""
+        return float(os.getenv("LLM_TIMEOUT", "600"))
+
+    @staticmethod
+    def get_llm_connect_timeout() -> float:
+        """获取 LLM 建立连接的超时时间（秒）"""
+        return float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+
+    # 提示词配置
+    @staticmethod
+    def get_prompt_hot_reload() -> bool:
+        """是否在模板文件修改后自动重新加载（默认关闭）"""
+        return os.getenv("PROMPT_HOT_RELOAD", "0").lower() in ("1", "true", "yes")
+
+    # 审计分片配置
+    @staticmethod
+    def get_audit_chunk_tokens() -> int:
+        """获取单个审计片段的 token 上限；超出的大文件按函数/类边界切分后并发审计"""
+        return int(os.getenv("AUDIT_CHUNK_TOKENS", "12000"))
+
+    @staticmethod
+    def get_audit_chunk_workers() -> int:
+        """获取单个文件内并发审计的片段数上限"""
+        return int(os.getenv("AUDIT_CHUNK_WORKERS", "4"))
+
+    # 归档批量拉取配置
+    @staticmethod
+    def get_archive_threshold() -> int:
+        """
+        获取自动切换为归档拉取的待读取（未命中 blob 缓存）文件数阈值，0 表示关闭。
+        单次审计最多读取 5 个文件（3 个核心 + 2 个随机），默认值 5 即整个审计计划都需要拉取时才下载归档
+        """
+        return int(os.getenv("ARCHIVE_THRESHOLD", "5"))
+
+    @staticmethod
+    def get_archive_memory_limit() -> int:
+        """获取归档保存在内存中的大小上限（字节），超出后落盘到临时文件"""
+        return int(os.getenv("ARCHIVE_MEMORY_LIMIT", str(64 * 1024 * 1024)))
+
+    # 增量审计配置
+    @staticmethod
+    def get_audit_store_enabled() -> bool:
+        """是否复用文件内容、模型与提示词均未变化的历史审计结果（默认开启）"""
+        return os.getenv("AUDIT_STORE_ENABLED", "1").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_audit_store_path() -> str:
+        """获取审计结果存储（SQLite）路径"""
+        return os.getenv("AUDIT_STORE_PATH", ".cache/audit_store.db")
+
+    # GitHub 配额调度配置
+    @staticmethod
+    def get_github_tokens() -> List[str]:
+        """获取 GitHub token 池（GITHUB_TOKENS 逗号分隔，并包含 GITHUB_TOKEN），多个 token 分摊请求"""
+        tokens = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()]
+        single = os.getenv("GITHUB_TOKEN")
+        if single and single not in tokens:
+            tokens.insert(0, single)
+        return tokens
+
+    @staticmethod
+    def get_github_rate_limit_enabled() -> bool:
+        """是否按 X-RateLimit 响应头节流 GitHub 请求（默认开启）"""
+        return os.getenv("GITHUB_RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_github_rate_burst() -> int:
+        """获取令牌桶容量，即配额充足时允许的瞬时突发请求数"""
+        return int(os.getenv("GITHUB_RATE_BURST", "10"))
+
+    @staticmethod
+    def get_github_rate_reserve() -> float:
+        """获取每个配额桶保留不用的比例，为其他进程与在途请求留出余量"""
+        return float(os.getenv("GITHUB_RATE_RESERVE", "0.02"))
+
+    @staticmethod
+    def get_github_rate_limit_retries() -> int:
+        """获取被限流（403/429）后等待重试的次数上限"""
+        return int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))
+
+    # 自适应模型并发配置
+    @staticmethod
+    def get_llm_adaptive_initial() -> int:
+        """获取每个模型的初始并发上限"""
+        return int(os.getenv("LLM_ADAPTIVE_INITIAL", "4"))
+
+    @staticmethod
+    def get_llm_adaptive_min() -> int:
+        """获取每个模型并发上限的下限"""
+        return int(os.getenv("LLM_ADAPTIVE_MIN", "1"))
+
+    @staticmethod
+    def get_llm_adaptive_max() -> int:
+        """获取每个模型并发上限的上限"""
+        return int(os.getenv("LLM_ADAPTIVE_MAX", "32"))
+
+    @staticmethod
+    def get_audit_max_workers() -> int:
+        """获取单次审计提交文件任务的线程数上限（实际并发由各模型的自适应限制器决定）"""
+        return int(os.getenv("AUDIT_MAX_WORKERS", "32"))
+
+    # 模型熔断与备用模型配置
+    @staticmethod
+    def get_llm_fallback_enabled() -> bool:
+        """模型不可用时是否按 MODEL_CONFIGS 的 fallbacks 切换备用模型（默认开启）"""
+        return os.getenv("LLM_FALLBACK_ENABLED", "1").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_llm_retries_before_fallback() -> int:
+        """获取存在备用模型时，当前模型失败后的重试次数"""
+        return int(os.getenv("LLM_RETRIES_BEFORE_FALLBACK", "1"))
+
+    @staticmethod
+    def get_llm_max_retry_wait() -> float:
+        """获取单次重试的最长等待秒数；Retry-After 超过该值时直接熔断并切换备用模型"""
+        return float(os.getenv("LLM_MAX_RETRY_WAIT", "30"))
+
+    @staticmethod
+    def get_llm_circuit_failure_threshold() -> int:
+        """获取触发熔断的连续失败次数"""
+        return int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+
+    @staticmethod
+    def get_llm_circuit_reset_seconds() -> float:
+        """获取熔断后的冷却时间（秒），之后放行一个探测请求"""
+        return float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "60"))
+
+    # LLM 对冲请求配置
+    @staticmethod
+    def get_llm_hedge_enabled() -> bool:
+        """是否对慢调用发出对冲请求（默认关闭）"""
+        return os.getenv("LLM_HEDGE_ENABLED", "0").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_llm_hedge_percentile() -> float:
+        """获取触发对冲的延迟分位数（按模型统计）"""
+        return float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+
+    @staticmethod
+    def get_llm_hedge_max_fraction() -> float:
+        """获取允许对冲的调用比例上限"""
+        return float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.1"))
+
+    @staticmethod
+    def get_llm_hedge_min_samples() -> int:
+        """获取启用对冲前每个模型至少需要的延迟样本数"""
+        return int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+    @staticmethod
+    def get_llm_hedge_target() -> str:
+        """获取对冲请求的目标：same（同一模型）或 fallback（备用链中的健康模型）"""
+        return os.getenv("LLM_HEDGE_TARGET", "same").lower()
+
+    # 运行遥测配置
+    @staticmethod
+    def get_telemetry_enabled() -> bool:
+        """是否记录各阶段耗时、外部调用与 token 计数"""
+        return os.getenv("TELEMETRY_ENABLED", "1").lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def get_telemetry_manifest_path() -> str:
+        """获取 JSON 运行清单的输出路径；为空时不写出"""
+        return os.getenv("TELEMETRY_MANIFEST_PATH", "run_manifest.json")
+
+    @staticmethod
+    def get_telemetry_prom_path() -> str:
+        """获取 Prometheus textfile 的输出路径；为空时不写出"""
+        return os.getenv("TELEMETRY_PROM_PATH", "run_metrics.prom")
+
+    # LLM 花费预算配置（0 表示不限）
+    @staticmethod
+    def get_llm_budget_usd() -> float:
+        """获取单次审计的 LLM 费用上限（美元）"""
+        return float(os.getenv("LLM_BUDGET_USD", "0"))
+
+    @staticmethod
+    def get_llm_budget_tokens() -> int:
+        """获取单次审计的 LLM token 上限（输入 + 输出）"""
+        return int(os.getenv("LLM_BUDGET_TOKENS", "0"))
+
+    @staticmethod
+    def get_llm_budget_seconds() -> float:
+        """获取单次审计的 LLM 时限（秒，从第一次调用起算）；超出后的调用直接跳过"""
+        return float(os.getenv("LLM_BUDGET_SECONDS", "0"))
+
+    @staticmethod
+    def get_llm_stage_budgets_usd() -> Dict[str, float]:
+        """获取单次审计中各阶段的费用上限，格式：strategist=0.02,primary_audit=0.3"""
+        budgets = {}
+        for item in os.getenv("LLM_STAGE_BUDGETS_USD", "").split(","):
+            stage, _, value = item.partition("=")
+            if stage.strip() and value.strip():
+                budgets[stage.strip()] = float(value)
+        return budgets
+
+    @staticmethod
+    def get_llm_total_budget_usd() -> float:
+        """获取整个进程（如一次组合批量尽调）的 LLM 费用上限（美元）"""
+        return float(os.getenv("LLM_TOTAL_BUDGET_USD", "0"))
+
+    @staticmethod
+    def get_llm_budget_action() -> str:
+        """获取超出预算时的处理方式：downgrade（降级 -> 截断 -> 跳过）、truncate（截断 -> 跳过）或 skip"""
+        return os.getenv("LLM_BUDGET_ACTION", "downgrade").lower()
+
+    @staticmethod
+    def get_llm_expected_completion_tokens() -> int:
+        """获取调用前估算费用时假设的输出 token 数（调用未指定 max_tokens 时）"""
+        return int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1500"))
+
+    # 目录树配置
+    @staticmethod
+    def get_tree_fetch_workers() -> int:
+        """获取递归 tree 被截断时并发拉取子树的线程数"""
+        return max(1, int(os.getenv("TREE_FETCH_WORKERS", "8")))
+
+    @staticmethod
+    def get_strategist_tree_tokens() -> int:
+        """获取 Strategist 提示词中目录树的 token 预算（0 表示不限）；超出时折叠目录、限制每个目录列出的文件数"""
+        return int(os.getenv("STRATEGIST_TREE_TOKENS", "8000"))
+
+    # Strategist 核心文件选择配置
+    @staticmethod
+    def get_strategist_mode() -> str:
+        """获取核心文件选择方式：llm（默认）、heuristic（仅依赖图排序，不调用 LLM）或 hybrid（排序结果作为 LLM 的参考）"""
+        return os.getenv("STRATEGIST_MODE", "llm").lower()
+
+    @staticmethod
+    def get_strategist_rank_max_files() -> int:
+        """获取依赖图排序最多解析的文件数（0 表示不限）；超出时优先解析较大的文件"""
+        return int(os.getenv("STRATEGIST_RANK_MAX_FILES", "2000"))
+
+    @staticmethod
+    def get_strategist_rank_candidates() -> int:
+        """获取 hybrid 模式下提供给 LLM 的排序候选文件数"""
+        return int(os.getenv("STRATEGIST_RANK_CANDIDATES", "15"))
@@ -3,48 +3,185 @@
 支持多模型提供方，所有API密钥从环境变量读取
 """
 import json
+import atexit
+import threading
+import httpx
 import openai
 import os
 import time
 import random
-from typing import Optional, Dict, Any
+import socket
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from typing import Optional, Callable, Dict, Any, Iterator, List, Tuple
+from configs.env_config import EnvConfig
+from utils.scheduler import scheduler
+from utils.telemetry import bind, telemetry
+from utils.adaptive_limiter import model_limiters
+from utils.circuit_breaker import CLOSED, HALF_OPEN, circuit_breakers
+from utils.llm_cache import get_llm_cache, cache_enabled_for
+from utils.llm_budget import llm_budget
+from utils.chunker import estimate_tokens
+
+
+class _ModelUnavailable(Exception):
+    """单个模型暂不可用（熔断、重试用尽或模型不存在），调用方应切换备用模型"""
+
+    def __init__(self, model_config_name: str, cause: Exception):
+        super().__init__(f"{model_config_name}: {cause}")
+        self.model_config_name = model_config_name
+        self.cause = cause
+
+
+class _HedgeCancelled(Exception):
+    """对冲调用中落败的一方被取消"""
+
+
+class _HedgeAttempt:
+    """
+    对冲调用中一方的句柄：记录请求实际发出的时刻，并持有进行中的流式响应，
+    落败时直接断开底层连接，立即归还并发槽位与线程，而不必等到下一个流式分片
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        # 当前（成功后即最终）生成内容的模型，备用链切换时随之更新
+        self.model: Optional[str] = None
+        self._response = None
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """已拿到并发槽位、即将发出请求；已被取消时不再发出"""
+        self.started.set()
+        if self.cancelled.is_set():
+            raise _HedgeCancelled()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+        if self.cancelled.is_set():
+            _abort_response(response)
+
+    def detach(self):
+        with self._lock:
+            self._response = None
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            response = self._response
+        if response is not None:
+            _abort_response(response)
+
+
+def _abort_response(response):
+    """
+    从其他线程中止流式响应：关闭 socket 的读写两端，使阻塞在读取上的线程立即出错返回
+    （仅 close 不会唤醒正在 recv 的线程）；响应对象本身仍由读取方关闭
+    """
+    http_response = getattr(response, "response", None)
+    stream = getattr(http_response, "extensions", {}).get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+@dataclass
+class LLMResult:
+    """一次调用的结果：实际生成内容的模型，以及提示词是否因预算被截断"""
+    content: str
+    model: str
+    requested_model: str
+    truncated: bool = False
+
+    @property
+    def degraded(self) -> bool:
+        """结果不是按请求的模型与完整提示词生成的（降级、备用模型或截断）"""
+        return self.truncated or self.model != self.requested_model
+
+
+# 每个模型保留的延迟样本数
+_LATENCY_WINDOW = 256
+
+_EMPTY_HEDGE_STATS = {
+    "calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "cancelled": 0, "budget_exhausted": 0,
+    "over_budget": 0,
+}
 
 
 class LLMManager:
     """统一的LLM管理器，支持多模型提供方"""
 
-    # 模型配置模板
+    # 模型配置模板；input_price / output_price 为美元 / 百万 token（按 OpenRouter 标价，用于预算估算）
     MODEL_CONFIGS = {
         "gemini-3-flash": {
             "model_name": "gemini-3-flash-preview",
             "base_url": "https://openrouter.ai/api/v1/chat/completions",
             "temperature": 0.5,
+            "context_tokens": 1000000,
+            "input_price": 0.50,
+            "output_price": 3.00,
+            "fallbacks": ["gpt-4o-mini"],
         },
         "qwen-plus": {
             "model_name": "qwen-plus-2025-12-01",
             "base_url": "https://openrouter.ai/api/v1/chat/completions",
             "temperature": 0.5,
+            "context_tokens": 131072,
+            "input_price": 0.40,
+            "output_price": 1.20,
+            "fallbacks": ["gpt-4o-mini"],
         },
         "gpt-5-mini": {
             "model_name": "gpt-5-mini-2025-08-07",
             "base_url": "https://openrouter.ai/api/v1/chat/completions",
             "temperature": 0.5,
+            "context_tokens": 400000,
+            "input_price": 0.25,
+            "output_price": 2.00,
+            "fallbacks": ["gpt-4o-mini"],
         },
         "gpt-4o-mini": {
             "model_name": "gpt-4o-mini",
             "base_url": "https://openrouter.ai/api/v1/chat/completions",
             "temperature": 0.5,
+            "context_tokens": 128000,
+            "input_price": 0.15,
+            "output_price": 0.60,
+            "fallbacks": ["qwen-plus"],
         },
         "deepseek-v3": {
             "model_name": "deepseek-v3.2-thinking",
             "base_url": "https://openrouter.ai/api/v1/chat/completions",
             "temperature": 0.5,
+            "context_tokens": 128000,
+            "input_price": 0.28,
+            "output_price": 0.42,
+            "fallbacks": ["gpt-4o-mini"],
         },
     }
 
     def __init__(self):
         """初始化LLM管理器"""
-        pass
+        # (base_url, api_key) -> openai.OpenAI，跨调用、跨线程复用连接池
+        self._clients: Dict[Tuple[str, str], openai.OpenAI] = {}
+        # model_config_name -> 客户端配置，避免每次调用重复解析环境变量
+        self._client_configs: Dict[str, Dict[str, Any]] = {}
+        # model_config_name -> 流式调用的 TTFT / 生成速率累计值
+        self._stream_metrics: Dict[str, Dict[str, Any]] = {}
+        # "主模型->备用模型" -> 切换次数
+        self._fallbacks: Dict[str, int] = {}
+        # model_config_name -> 近期成功调用的耗时样本（用于对冲触发延迟）
+        self._latencies: Dict[str, deque] = {}
+        self._hedge_stats: Dict[str, Dict[str, int]] = {}
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
 
     def _get_client_config(self, model_config_name: str) -> Dict[str, Any]:
         """
@@ -54,6 +191,10 @@ class LLMManager:
         Returns:
             包含api_key和base_url的配置字典
         """
+        cached = self._client_configs.get(model_config_name)
+        if cached is not None:
+            return cached
+
         config = self.MODEL_CONFIGS.get(model_config_name)
         if not config:
             raise ValueError(
@@ -69,12 +210,57 @@ class LLMManager:
         # 从环境变量获取 Base URL（如果设置了）
         base_url = os.getenv("OPENROUTER_BASE_URL") or config.get("base_url")
 
-        return {
+        client_config = {
             "api_key": api_key,
             "base_url": base_url,
             "model_name": config["model_name"],
             "temperature": config.get("temperature", 0.5),
         }
+        with self._lock:
+            self._client_configs[model_config_name] = client_config
+        return client_config
+
+    def _get_client(self, client_config: Dict[str, Any]) -> openai.OpenAI:
+        """按 (base_url, api_key) 获取复用的客户端；openai.OpenAI 本身可跨线程共享"""
+        key = (client_config["base_url"], client_config["api_key"])
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=EnvConfig.get_llm_max_connections(),
+                        max_keepalive_connections=EnvConfig.get_llm_max_keepalive_connections(),
+                    ),
+                    timeout=httpx.Timeout(
+                        EnvConfig.get_llm_timeout(),
+                        connect=EnvConfig.get_llm_connect_timeout(),
+                    ),
+                )
+                # 重试统一由 call / stream 负责，SDK 内部不再静默重试 429，
+                # 以便自适应并发限制器及时感知过载
+                client = openai.OpenAI(
+                    api_key=client_config["api_key"],
+                    base_url=client_config["base_url"],
+                    http_client=http_client,
+                    max_retries=0,
+                )
+                self._clients[key] = client
+            return client
+
+    def close(self):
+        """关闭所有复用的客户端连接（进程退出时自动调用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._client_configs.clear()
+            pool, self._hedge_pool = self._hedge_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
 
     def call(
         self,
@@ -82,8 +268,25 @@ class LLMManager:
         system_prompt: str,
         user_prompt: str,
         max_retries: int = 5,
+        role: Optional[str] = None,
+        shrink: Optional[Callable[[float], str]] = None,
         **kwargs
     ) -> str:
+        """调用LLM模型，返回生成的文本；参数同 call_result"""
+        return self.call_result(
+            model_config_name, system_prompt, user_prompt, max_retries, role, shrink, **kwargs
+        ).content
+
+    def call_result(
+        self,
+        model_config_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int = 5,
+        role: Optional[str] = None,
+        shrink: Optional[Callable[[float], str]] = None,
+        **kwargs
+    ) -> LLMResult:
         """
         调用LLM模型
         Args:
@@ -91,65 +294,615 @@ class LLMManager:
             system_prompt: 系统提示词
             user_prompt: 用户提示词
             max_retries: 最大重试次数
+            role: 调用方角色（strategist / primary_audit / random_audit / synthesizer），
+                  用于按角色开关响应缓存
+            shrink: 按保留比例（0~1）截断提示词中的可变内容（文件内容、目录树、审计结果等）后重新渲染用户提示词，
+                    预算不足时用于截断；未提供时不截断
             **kwargs: 额外的生成参数（如temperature）
         Returns:
-            LLM返回的文本内容
+            LLMResult：生成的文本，以及实际使用的模型、提示词是否被截断（调用方据此判断结果能否长期复用）
+        说明:
+            模型熔断或持续不可用时，按 MODEL_CONFIGS 中的 fallbacks 依次切换到备用模型；
+            开启 LLM_HEDGE_ENABLED 时，超过该模型延迟分位数仍未返回的调用会发出对冲请求；
+            调用前按预算估算费用，超出时降级模型、截断提示词，或抛出 BudgetExceeded
         """
-        client_config = self._get_client_config(model_config_name)
+        ticket = llm_budget.plan(
+            role, model_config_name, system_prompt, user_prompt, self.MODEL_CONFIGS, kwargs.get("max_tokens"), shrink
+        )
+        try:
+            if EnvConfig.get_llm_hedge_enabled():
+                content, used = self._hedged_call(
+                    ticket.model, system_prompt, ticket.user_prompt, max_retries, role, kwargs, ticket
+                )
+            else:
+                content, used = self._call_chain(
+                    ticket.model, system_prompt, ticket.user_prompt, max_retries, role, kwargs
+                )
+        finally:
+            llm_budget.release(ticket)
+        return LLMResult(content, used, model_config_name, ticket.user_prompt != user_prompt)
+
+    def _call_chain(self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs) -> Tuple[str, str]:
+        """按备用链依次调用，返回第一个成功的结果及生成它的模型"""
+        last_exception = None
+        chain = self._fallback_chain(model_config_name)
+        for index, name in enumerate(chain):
+            try:
+                content = self._call_model(
+                    name, system_prompt, user_prompt,
+                    max_retries if index == len(chain) - 1 else self._retries_before_fallback(max_retries),
+                    role, kwargs,
+                )
+            except _ModelUnavailable as e:
+                last_exception = e.cause
+                continue
+            if name != model_config_name:
+                self._record_fallback(model_config_name, name)
+            return content, name
 
-        client = openai.OpenAI(
-            api_key=client_config["api_key"],
-            base_url=client_config["base_url"]
+        raise RuntimeError(
+            f"LLM 调用失败（{' -> '.join(chain)} 均不可用）: {model_config_name}\n"
+            f"最后错误: {last_exception}"
         )
 
-        # 合并生成参数
-        generate_args = {
-            "temperature": kwargs.get("temperature", client_config["temperature"]),
-            **{k: v for k, v in kwargs.items() if k != "temperature"}
-        }
+    def _call_model(self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs) -> str:
+        """在单个模型上调用（含重试）；模型不可用时抛出 _ModelUnavailable 以便切换备用模型"""
+        client_config, client, generate_args, cache, cache_key = self._prepare_request(
+            model_config_name, system_prompt, user_prompt, role, kwargs
+        )
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                telemetry.incr(llm_cache_hits=1)
+                return cached
 
+        breaker = circuit_breakers.get(model_config_name)
         last_exception = None
 
         for attempt in range(max_retries):
+            grant = breaker.acquire()
+            if grant is None:
+                raise _ModelUnavailable(model_config_name, last_exception or RuntimeError("熔断中"))
             try:
-                response = client.chat.completions.create(
-                    model=client_config["model_name"],
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    **generate_args
+                started = time.time()
+                with model_limiters.get(model_config_name).slot(self._is_overload), scheduler.slot("llm"):
+                    response = client.chat.completions.create(
+                        model=client_config["model_name"],
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        **generate_args
+                    )
+                breaker.record_success()
+                self._record_latency(model_config_name, time.time() - started)
+                content = response.choices[0].message.content
+                prompt_tokens, completion_tokens = self._usage_tokens(
+                    getattr(response, "usage", None), system_prompt, user_prompt, content
+                )
+                telemetry.record_call(
+                    "llm", model_config_name, time.time() - started, llm_calls=1,
+                    prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                    cost_usd=self._settle(role, model_config_name, prompt_tokens, completion_tokens),
                 )
-                return response.choices[0].message.content
+                if cache is not None and content:
+                    cache.put(
+                        cache_key, client_config["model_name"], content, time.time() - started,
+                        prompt_tokens, completion_tokens,
+                    )
+                return content
 
             except Exception as e:
                 last_exception = e
-                err_msg = str(e)
+                telemetry.record_call("llm", model_config_name, time.time() - started, error=True, llm_calls=1)
+                self._backoff_or_raise(model_config_name, attempt, max_retries, e)
+            finally:
+                if grant == HALF_OPEN:
+                    breaker.release_probe()
 
-                is_retryable = (
-                    "429" in err_msg
-                    or "负载" in err_msg
-                    or "model_not_found" in err_msg
-                    or "rate limit" in err_msg.lower()
-                )
+        raise _ModelUnavailable(model_config_name, last_exception)
 
-                if not is_retryable:
-                    raise
+    def stream(
+        self,
+        model_config_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_retries: int = 5,
+        role: Optional[str] = None,
+        shrink: Optional[Callable[[float], str]] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        流式调用LLM模型，逐段产出生成的文本
+        参数同 call；首个 token 延迟（TTFT）与生成速率按模型记录，可通过 stream_stats 查看。
+        已经产出部分内容后出错不再重试、也不切换备用模型，直接抛出异常
+        """
+        ticket = llm_budget.plan(
+            role, model_config_name, system_prompt, user_prompt, self.MODEL_CONFIGS, kwargs.get("max_tokens"), shrink
+        )
+        try:
+            yield from self._stream_chain(ticket.model, system_prompt, ticket.user_prompt, max_retries, role, kwargs)
+        finally:
+            llm_budget.release(ticket)
 
-                sleep_time = (2 ** attempt) + random.uniform(0, 1)
-                print(
-                    f"[LLM RETRY] {model_config_name} | "
-                    f"第 {attempt + 1}/{max_retries} 次失败，"
-                    f"{sleep_time:.2f}s 后重试\n"
-                    f"原因: {err_msg}"
+    def _stream_chain(
+        self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs,
+        hedge: Optional[_HedgeAttempt] = None,
+    ) -> Iterator[str]:
+        """按备用链依次流式调用；hedge 为对冲调用中该请求的句柄"""
+        last_exception = None
+        chain = self._fallback_chain(model_config_name)
+        for index, name in enumerate(chain):
+            if hedge is not None:
+                hedge.model = name
+            try:
+                yield from self._stream_model(
+                    name, system_prompt, user_prompt,
+                    max_retries if index == len(chain) - 1 else self._retries_before_fallback(max_retries),
+                    role, kwargs, hedge,
                 )
-                time.sleep(sleep_time)
+            except _ModelUnavailable as e:
+                last_exception = e.cause
+                continue
+            if name != model_config_name:
+                self._record_fallback(model_config_name, name)
+            return
 
         raise RuntimeError(
-            f"LLM 调用失败（重试 {max_retries} 次仍失败）: {model_config_name}\n"
+            f"LLM 调用失败（{' -> '.join(chain)} 均不可用）: {model_config_name}\n"
             f"最后错误: {last_exception}"
         )
 
+    def _stream_model(
+        self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs,
+        hedge: Optional[_HedgeAttempt] = None,
+    ) -> Iterator[str]:
+        client_config, client, generate_args, cache, cache_key = self._prepare_request(
+            model_config_name, system_prompt, user_prompt, role, kwargs
+        )
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                telemetry.incr(llm_cache_hits=1)
+                yield cached
+                return
+
+        breaker = circuit_breakers.get(model_config_name)
+        last_exception = None
+
+        for attempt in range(max_retries):
+            grant = breaker.acquire()
+            if grant is None:
+                raise _ModelUnavailable(model_config_name, last_exception or RuntimeError("熔断中"))
+            pieces = []
+            usage = None
+            response = None
+            started = time.time()
+            first_token_at = None
+            try:
+                with model_limiters.get(model_config_name).slot(self._is_overload), scheduler.slot("llm"):
+                    if hedge is not None:
+                        hedge.begin()
+                    response = client.chat.completions.create(
+                        model=client_config["model_name"],
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **generate_args
+                    )
+                    if hedge is not None:
+                        hedge.attach(response)
+                    try:
+                        for chunk in response:
+                            if getattr(chunk, "usage", None):
+                                usage = chunk.usage
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                if first_token_at is None:
+                                    first_token_at = time.time()
+                                pieces.append(delta)
+                                yield delta
+                    finally:
+                        # 消费方提前停止时立即断开连接
+                        if hedge is not None:
+                            hedge.detach()
+                        response.close()
+            except GeneratorExit:
+                # 消费方放弃（含对冲落败在分片间被取消）
+                self._settle_abandoned(role, model_config_name, system_prompt, user_prompt, pieces, usage, started)
+                raise
+            except Exception as e:
+                if hedge is not None and hedge.cancelled.is_set():
+                    # 对冲落败、连接被主动断开：与模型健康无关，不计入熔断与重试
+                    if response is not None:
+                        self._settle_abandoned(
+                            role, model_config_name, system_prompt, user_prompt, pieces, usage, started
+                        )
+                    raise _HedgeCancelled(model_config_name) from e
+                telemetry.record_call("llm", model_config_name, time.time() - started, error=True, llm_calls=1)
+                if pieces:
+                    breaker.record_failure()
+                    raise
+                last_exception = e
+                self._backoff_or_raise(model_config_name, attempt, max_retries, e)
+                continue
+            else:
+                breaker.record_success()
+            finally:
+                # 覆盖 fatal 错误与 GeneratorExit（对冲取消、消费方放弃）：探测未得出结论时放开名额
+                if grant == HALF_OPEN:
+                    breaker.release_probe()
+
+            finished = time.time()
+            self._record_latency(model_config_name, finished - started)
+            content = "".join(pieces)
+            prompt_tokens, completion_tokens = self._usage_tokens(usage, system_prompt, user_prompt, content)
+            self._record_stream(model_config_name, started, first_token_at, finished, completion_tokens)
+            telemetry.record_call(
+                "llm", model_config_name, finished - started, llm_calls=1,
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                cost_usd=self._settle(role, model_config_name, prompt_tokens, completion_tokens),
+            )
+            if cache is not None and content:
+                cache.put(
+                    cache_key, client_config["model_name"], content, finished - started,
+                    prompt_tokens, completion_tokens,
+                )
+            return
+
+        raise _ModelUnavailable(model_config_name, last_exception)
+
+    def _hedged_call(
+        self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs, ticket
+    ) -> Tuple[str, str]:
+        """
+        对冲调用：主请求超过该模型延迟分位数仍未返回时，向同一模型或备用模型再发一个请求，
+        先成功的结果胜出，另一个立即断开连接。对冲比例受 LLM_HEDGE_MAX_FRACTION 限制，
+        对冲请求的预计费用同样在预算中预留（ticket 为主请求的预留），放不下时不对冲；
+        触发延迟从主请求实际发出时开始计时，线程池与并发槽位中的排队时间不计入
+        """
+        delay = self._hedge_delay(model_config_name)
+        if delay is None:
+            # 延迟样本不足：按普通调用执行，同时积累样本
+            return self._call_chain(model_config_name, system_prompt, user_prompt, max_retries, role, kwargs)
+
+        with self._lock:
+            stats = self._hedge_stats.setdefault(model_config_name, dict(_EMPTY_HEDGE_STATS))
+            stats["calls"] += 1
+
+        pool = self._get_hedge_pool()
+        attempts = [_HedgeAttempt(), _HedgeAttempt()]
+        primary = pool.submit(
+            bind(self._collect_stream), model_config_name, system_prompt, user_prompt,
+            max_retries, role, kwargs, attempts[0],
+        )
+        attempts[0].started.wait()
+        try:
+            return primary.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+
+        target = self._hedge_target(model_config_name)
+        hedge_ticket = self._reserve_hedge(model_config_name, target, ticket)
+        if hedge_ticket is None:
+            return primary.result()
+
+        telemetry.incr(llm_hedges=1)
+        try:
+            hedge = pool.submit(
+                bind(self._collect_stream), target, system_prompt, user_prompt,
+                max_retries, role, kwargs, attempts[1],
+            )
+            futures = {primary: 0, hedge: 1}
+            pending = set(futures)
+            first_error = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        first_error = first_error or e
+                        continue
+                    for other, index in futures.items():
+                        if other is not future:
+                            other.cancel()
+                            attempts[index].cancel()
+                    self._record_hedge_outcome(model_config_name, futures[future] == 1, bool(pending))
+                    return result
+            raise first_error
+        finally:
+            llm_budget.release(hedge_ticket)
+
+    def _collect_stream(
+        self, model_config_name, system_prompt, user_prompt, max_retries, role, kwargs, hedge: _HedgeAttempt
+    ) -> Tuple[str, str]:
+        """以流式方式完成一次调用，返回拼接的结果及生成它的模型；hedge 被取消时连接随即断开"""
+        pieces = []
+        # 预算已由 call 统一预留，这里不再重复检查
+        gen = self._stream_chain(model_config_name, system_prompt, user_prompt, max_retries, role, kwargs, hedge)
+        try:
+            for delta in gen:
+                if hedge.cancelled.is_set():
+                    raise _HedgeCancelled(model_config_name)
+                pieces.append(delta)
+        finally:
+            # 未真正发出请求就结束（缓存命中、熔断拒绝、出错）时也唤醒等待计时的一方
+            hedge.started.set()
+            gen.close()
+        return "".join(pieces), hedge.model
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=EnvConfig.get_llm_concurrency() * 2, thread_name_prefix="llm-hedge"
+                )
+            return self._hedge_pool
+
+    def _record_latency(self, model_config_name: str, seconds: float):
+        with self._lock:
+            samples = self._latencies.get(model_config_name)
+            if samples is None:
+                samples = self._latencies[model_config_name] = deque(maxlen=_LATENCY_WINDOW)
+            samples.append(seconds)
+
+    def _hedge_delay(self, model_config_name: str) -> Optional[float]:
+        """该模型近期成功调用延迟的分位数；样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._latencies.get(model_config_name, ()))
+        if len(samples) < EnvConfig.get_llm_hedge_min_samples():
+            return None
+        percentile = EnvConfig.get_llm_hedge_percentile()
+        return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+    def _reserve_hedge(self, model_config_name: str, target: str, ticket):
+        """
+        对冲次数不超过调用次数的 LLM_HEDGE_MAX_FRACTION，且对冲请求的预计费用放得进预算
+        Returns:
+            对冲请求的 BudgetTicket；不应对冲时返回 None
+        """
+        with self._lock:
+            stats = self._hedge_stats[model_config_name]
+            if stats["hedged"] + 1 > stats["calls"] * EnvConfig.get_llm_hedge_max_fraction():
+                stats["budget_exhausted"] += 1
+                return None
+            hedge_ticket = llm_budget.reserve_hedge(ticket, target, self.MODEL_CONFIGS)
+            if hedge_ticket is None:
+                stats["over_budget"] += 1
+                return None
+            stats["hedged"] += 1
+            return hedge_ticket
+
+    def _hedge_target(self, model_config_name: str) -> str:
+        """对冲请求发往同一模型，或（LLM_HEDGE_TARGET=fallback 时）备用链中下一个健康的模型"""
+        if EnvConfig.get_llm_hedge_target() == "fallback":
+            for name in self._fallback_chain(model_config_name)[1:]:
+                if circuit_breakers.get(name).state == CLOSED:
+                    return name
+        return model_config_name
+
+    def _record_hedge_outcome(self, model_config_name: str, hedge_won: bool, cancelled: bool):
+        with self._lock:
+            stats = self._hedge_stats[model_config_name]
+            stats["hedge_wins" if hedge_won else "primary_wins"] += 1
+            if cancelled:
+                stats["cancelled"] += 1
+
+    def hedge_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按模型返回对冲调用统计，以及当前的对冲触发延迟（秒）"""
+        with self._lock:
+            stats = {k: dict(v) for k, v in self._hedge_stats.items()}
+        for model, m in stats.items():
+            delay = self._hedge_delay(model)
+            m["trigger_seconds"] = round(delay, 3) if delay is not None else None
+        return stats
+
+    def _fallback_chain(self, model_config_name: str) -> List[str]:
+        """主模型 + MODEL_CONFIGS 中配置的备用模型（去重，保持顺序）"""
+        chain = [model_config_name]
+        if EnvConfig.get_llm_fallback_enabled():
+            for name in self.MODEL_CONFIGS.get(model_config_name, {}).get("fallbacks", []):
+                if name in self.MODEL_CONFIGS and name not in chain:
+                    chain.append(name)
+        return chain
+
+    @staticmethod
+    def _retries_before_fallback(max_retries: int) -> int:
+        """还有备用模型时，当前模型只重试少量次数，避免在故障模型上耗费时间"""
+        return max(1, min(max_retries, EnvConfig.get_llm_retries_before_fallback() + 1))
+
+    def _record_fallback(self, primary: str, used: str):
+        key = f"{primary}->{used}"
+        with self._lock:
+            self._fallbacks[key] = self._fallbacks.get(key, 0) + 1
+            first = self._fallbacks[key] == 1
+        telemetry.incr(llm_fallbacks=1)
+        if first:
+            print(f"[LLM FALLBACK] {primary} 不可用，已切换到 {used}（后续同类切换不再提示）")
+
+    def _prepare_request(self, model_config_name, system_prompt, user_prompt, role, kwargs):
+        """解析客户端、生成参数与缓存键，call / stream 共用"""
+        client_config = self._get_client_config(model_config_name)
+
+        client = self._get_client(client_config)
+
+        # 合并生成参数
+        generate_args = {
+            "temperature": kwargs.get("temperature", client_config["temperature"]),
+            **{k: v for k, v in kwargs.items() if k != "temperature"}
+        }
+
+        cache = get_llm_cache() if cache_enabled_for(role) else None
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(
+                client_config["model_name"], client_config["base_url"],
+                system_prompt, user_prompt, generate_args
+            )
+        return client_config, client, generate_args, cache, cache_key
+
+    @staticmethod
+    def _classify_error(error: Exception) -> Tuple[str, Optional[float]]:
+        """
+        结构化错误分类
+        Returns:
+            (类别, Retry-After 秒数)；类别为 rate_limit / overloaded / connection / not_found / fatal
+        """
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+
+        if isinstance(error, openai.RateLimitError):
+            return "rate_limit", retry_after
+        if isinstance(error, openai.NotFoundError):
+            return "not_found", retry_after
+        if isinstance(error, openai.APIConnectionError):
+            return "connection", retry_after
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code == 429:
+                return "rate_limit", retry_after
+            if error.status_code >= 500:
+                return "overloaded", retry_after
+            return "fatal", retry_after
+
+        # 非 SDK 异常（如网关包装的错误）：退回按错误信息判断
+        err_msg = str(error)
+        if "429" in err_msg or "rate limit" in err_msg.lower():
+            return "rate_limit", retry_after
+        if "负载" in err_msg or "overloaded" in err_msg.lower():
+            return "overloaded", retry_after
+        if "model_not_found" in err_msg:
+            return "not_found", retry_after
+        return "fatal", retry_after
+
+    @classmethod
+    def _is_overload(cls, error: Exception) -> bool:
+        """是否为限流 / 过载类错误（用于收紧模型并发上限）"""
+        return cls._classify_error(error)[0] in ("rate_limit", "overloaded")
+
+    def _backoff_or_raise(self, model_config_name, attempt, max_retries, error):
+        """
+        按错误类别处理失败：
+        - fatal（参数、鉴权等）直接抛出
+        - not_found 或 Retry-After 过长：熔断该模型并立即切换备用模型
+        - 其余可重试错误计入熔断器，按 Retry-After 或指数退避休眠；
+          已熔断或重试次数用尽时切换备用模型
+        """
+        kind, retry_after = self._classify_error(error)
+        if kind == "fatal":
+            raise error
+
+        breaker = circuit_breakers.get(model_config_name)
+        if kind == "not_found":
+            breaker.trip()
+            raise _ModelUnavailable(model_config_name, error)
+        if retry_after is not None and retry_after > EnvConfig.get_llm_max_retry_wait():
+            breaker.trip(retry_after)
+            raise _ModelUnavailable(model_config_name, error)
+
+        breaker.record_failure()
+        if attempt + 1 >= max_retries or breaker.state != CLOSED:
+            raise _ModelUnavailable(model_config_name, error)
+
+        if retry_after is not None:
+            sleep_time = retry_after
+        else:
+            sleep_time = min((2 ** attempt) + random.uniform(0, 1), EnvConfig.get_llm_max_retry_wait())
+        print(
+            f"[LLM RETRY] {model_config_name} | "
+            f"第 {attempt + 1}/{max_retries} 次失败（{kind}），"
+            f"{sleep_time:.2f}s 后重试\n"
+            f"原因: {error}"
+        )
+        telemetry.incr(llm_retries=1)
+        time.sleep(sleep_time)
+
+    @staticmethod
+    def _usage_tokens(usage, system_prompt, user_prompt, content) -> Tuple[int, int]:
+        """响应中的 (prompt_tokens, completion_tokens)；服务端未返回 usage 时按文本长度估算"""
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or estimate_tokens(system_prompt + user_prompt)
+        completion_tokens = getattr(usage, "completion_tokens", 0) or estimate_tokens(content or "")
+        return prompt_tokens, completion_tokens
+
+    def _settle(self, role, model_config_name, prompt_tokens, completion_tokens) -> float:
+        """按实际 usage 计入预算账本，返回本次费用（美元）"""
+        return llm_budget.record(role, self.MODEL_CONFIGS.get(model_config_name, {}), prompt_tokens, completion_tokens)
+
+    def _settle_abandoned(self, role, model_config_name, system_prompt, user_prompt, pieces, usage, started):
+        """
+        已发出但被取消或放弃的流式请求：服务端仍按输入与已生成的部分计费，
+        没有 usage 时按提示词与已收到内容的长度估算后结算
+        """
+        prompt_tokens, completion_tokens = self._usage_tokens(usage, system_prompt, user_prompt, "".join(pieces))
+        telemetry.record_call(
+            "llm", model_config_name, time.time() - started, llm_calls=1,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            cost_usd=self._settle(role, model_config_name, prompt_tokens, completion_tokens),
+        )
+
+    def budget_stats(self) -> Dict[str, Any]:
+        """返回整个进程按阶段的 token 与费用统计，以及预算设置"""
+        return llm_budget.stats()
+
+    def _record_stream(self, model_config_name, started, first_token_at, finished, completion_tokens):
+        with self._lock:
+            m = self._stream_metrics.setdefault(
+                model_config_name,
+                {"calls": 0, "ttft_seconds": 0.0, "generation_seconds": 0.0, "completion_tokens": 0},
+            )
+            m["calls"] += 1
+            if first_token_at is not None:
+                m["ttft_seconds"] += first_token_at - started
+                m["generation_seconds"] += finished - first_token_at
+            m["completion_tokens"] += completion_tokens
+
+    def stream_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按模型返回流式调用的平均首 token 延迟（秒）与生成速率（tokens/s）"""
+        with self._lock:
+            metrics = {k: dict(v) for k, v in self._stream_metrics.items()}
+        return {
+            model: {
+                "calls": m["calls"],
+                "avg_ttft_seconds": round(m["ttft_seconds"] / m["calls"], 3) if m["calls"] else None,
+                "tokens_per_second": (
+                    round(m["completion_tokens"] / m["generation_seconds"], 2)
+                    if m["generation_seconds"] > 0 else None
+                ),
+            }
+            for model, m in metrics.items()
+        }
+
+    def concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按模型返回自适应并发上限、峰值在途数与成功 / 过载次数"""
+        return model_limiters.stats()
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """返回各模型熔断器状态与备用模型切换次数"""
+        with self._lock:
+            fallbacks = dict(self._fallbacks)
+        return {"circuit_breakers": circuit_breakers.stats(), "fallbacks": fallbacks}
+
+    def get_context_tokens(self, model_config_name: str) -> int:
+        """获取模型的上下文窗口大小（token 数），未配置时按 32k 处理"""
+        config = self.MODEL_CONFIGS.get(model_config_name, {})
+        return config.get("context_tokens", 32000)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """返回响应缓存的命中/未命中次数及节省的耗时与 token 数；未启用缓存时返回空字典"""
+        cache = get_llm_cache()
+        return cache.stats() if cache is not None else {}
+
 
 # 全局LLM管理器实例
 llm_manager = LLMManager()
+atexit.register(llm_manager.close)
@@ -0,0 +1,314 @@
+"""
+组合批量尽调主程序
+在单个进程内并发审计多个仓库，所有仓库共享连接池与 GitHub / LLM 并发配额
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from code_analysit import run_due_diligence
+from scanner import analyze_repos_graphql
+from utils.repo_source import is_local_repo, parse_repo_url
+from configs.env_config import EnvConfig
+from configs.model_config import ModelConfig
+from configs.llmconfig import llm_manager
+from utils.scheduler import scheduler
+from utils.rate_limiter import get_rate_limiter
+from utils.audit_store import get_audit_store
+from utils.telemetry import telemetry
+
+
+def load_repo_urls(repo_urls: Optional[List[str]] = None, repo_file: Optional[str] = None) -> List[str]:
+    """
+    合并命令行与文件中的仓库列表（去重并保持顺序）
+    文件格式：每行一个 URL，空行与 # 开头的注释行会被忽略
+    """
+    urls = list(repo_urls or [])
+    if repo_file:
+        with open(repo_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    urls.append(line)
+
+    seen = set()
+    unique = []
+    for url in urls:
+        key = url.rstrip("/")
+        if key not in seen:
+            seen.add(key)
+            unique.append(key)
+    return unique
+
+
+def _report_filename(repo_url: str) -> str:
+    owner, repo = parse_repo_url(repo_url)
+    return f"{owner}__{repo}.md"
+
+
+def _audit_one(repo_url, github_token, model_config, output_dir, scan_result=None):
+    """审计单个仓库并写出报告，返回索引条目；异常不会中断整个批次"""
+    started = time.time()
+    entry = {"repo_url": repo_url, "status": "ok"}
+    try:
+        report_file = _report_filename(repo_url)
+        report_path = os.path.join(output_dir, report_file)
+        result = run_due_diligence(
+            repo_url, github_token, model_config, scan_result=scan_result, report_path=report_path
+        )
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(result["final_report"])
+
+        scan_report = result["scan_result"].get("report", {})
+        entry.update({
+            "report_file": report_file,
+            "score": scan_report.get("score"),
+            "verdict": scan_report.get("verdict"),
+            "core_tracks": result["audit_plan"].get("core_tracks", []),
+            "random_tracks": result["audit_plan"].get("random_tracks", []),
+            "llm_tokens": result["llm_spend"]["prompt_tokens"] + result["llm_spend"]["completion_tokens"],
+            "llm_cost_usd": result["llm_spend"]["cost_usd"],
+            "llm_budget_skipped": result["llm_spend"]["skipped"],
+        })
+    except Exception as e:
+        entry.update({"status": "failed", "error": str(e)})
+    entry["elapsed_seconds"] = round(time.time() - started, 2)
+    return entry
+
+
+def write_index(entries, output_dir, total_seconds):
+    """写出汇总索引（index.json + index.md）"""
+    run_manifest = telemetry.manifest()
+    summary = {
+        "total": len(entries),
+        "succeeded": sum(1 for e in entries if e["status"] == "ok"),
+        "failed": sum(1 for e in entries if e["status"] != "ok"),
+        "wall_clock_seconds": round(total_seconds, 2),
+        "concurrency_limits": scheduler.limits(),
+        "github_rate_limit": get_rate_limiter().snapshot() if get_rate_limiter() is not None else {},
+        "llm_cache": llm_manager.cache_stats(),
+        "llm_streaming": llm_manager.stream_stats(),
+        "llm_concurrency": llm_manager.concurrency_stats(),
+        "llm_resilience": llm_manager.resilience_stats(),
+        "llm_hedging": llm_manager.hedge_stats(),
+        "llm_spend": llm_manager.budget_stats(),
+        "audit_store": get_audit_store().stats() if get_audit_store() is not None else {},
+        "telemetry": {key: run_manifest[key] for key in ("totals", "stages", "calls")},
+        "repos": entries,
+    }
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    lines = [
+        "# 组合尽调汇总",
+        "",
+        f"共 {summary['total']} 个仓库，成功 {summary['succeeded']}，失败 {summary['failed']}，"
+        f"总耗时 {summary['wall_clock_seconds']}s，LLM 花费约 ${summary['llm_spend']['cost_usd']:.4f}",
+        "",
+        "| 仓库 | 状态 | 健康评分 | 结论 | 耗时(s) | LLM 费用($) | 报告 |",
+        "| --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for e in entries:
+        report_link = f"[{e['report_file']}]({e['report_file']})" if e.get("report_file") else e.get("error", "")
+        lines.append(
+            f"| {e['repo_url']} | {e['status']} | {e.get('score', '')} | {e.get('verdict', '')} "
+            f"| {e['elapsed_seconds']} | {e.get('llm_cost_usd', '')} | {report_link} |"
+        )
+    with open(os.path.join(output_dir, "index.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    # 相对路径写到报告目录下；绝对路径（如 node_exporter 的 textfile 目录）保持不变
+    manifest_path = EnvConfig.get_telemetry_manifest_path()
+    if manifest_path:
+        telemetry.write_manifest(os.path.join(output_dir, manifest_path), repos=len(entries))
+    prom_path = EnvConfig.get_telemetry_prom_path()
+    if prom_path:
+        telemetry.write_prometheus(os.path.join(output_dir, prom_path))
+    return summary
+
+
+def run_portfolio(
+    repo_urls: List[str],
+    github_token: str,
+    model_config: ModelConfig = None,
+    output_dir: str = "portfolio_reports",
+    max_parallel_repos: int = 8,
+):
+    """
+    批量运行尽调
+    Args:
+        repo_urls: 仓库 URL 列表
+        github_token: GitHub Token
+        model_config: 模型配置对象（可选）
+        output_dir: 报告输出目录
+        max_parallel_repos: 同时处理的仓库数；实际吞吐由 GitHub / LLM 并发配额决定
+    Returns:
+        汇总索引字典
+    """
+    if model_config is None:
+        model_config = ModelConfig()
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.time()
+
+    # GraphQL 后端：先用少量批量查询拿到全部仓库的宏观指标
+    scan_results = {}
+    remote_urls = [url for url in repo_urls if not is_local_repo(url)]
+    if EnvConfig.get_scanner_backend() == "graphql" and remote_urls:
+        print(f"[PORTFOLIO] 使用 GraphQL 批量扫描 {len(remote_urls)} 个仓库...")
+        for url, result in analyze_repos_graphql(remote_urls, github_token).items():
+            if "error" not in result:
+                scan_results[url] = result
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_repos)) as executor:
+        futures = {
+            executor.submit(_audit_one, url, github_token, model_config, output_dir, scan_results.get(url)): url
+            for url in repo_urls
+        }
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            print(f"[PORTFOLIO] {len(entries)}/{len(repo_urls)} {entry['repo_url']} -> {entry['status']}")
+
+    # 按输入顺序输出索引
+    order = {url: i for i, url in enumerate(repo_urls)}
+    entries.sort(key=lambda e: order.get(e["repo_url"], len(order)))
+    return write_index(entries, output_dir, time.time() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="代码分析师 - 组合批量尽调工具")
+    parser.add_argument(
+        "--repo-urls",
+        type=str,
+        nargs="*",
+        help="GitHub仓库URL列表（空格分隔），也可为本地仓库路径或 file:// URL"
+    )
+    parser.add_argument(
+        "--repo-file",
+        type=str,
+        help="仓库列表文件（每行一个URL）"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default="portfolio_reports",
+        help="报告输出目录（默认：portfolio_reports）"
+    )
+    parser.add_argument(
+        "--max-parallel-repos",
+        type=int,
+        default=8,
+        help="同时处理的仓库数（默认：8）"
+    )
+    parser.add_argument(
+        "--github-concurrency",
+        type=int,
+        help="全局同时在途的 GitHub 请求数上限"
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        help="全局同时在途的 LLM 请求数上限"
+    )
+    parser.add_argument(
+        "--scanner-backend",
+        type=str,
+        choices=["rest", "graphql"],
+        help="Scanner 后端（rest 或 graphql，graphql 会将多个仓库合并到一次查询）"
+    )
+    parser.add_argument(
+        "--config",
+        type=str,
+        help="模型配置文件路径（JSON格式）"
+    )
+    parser.add_argument(
+        "--primary-audit-model",
+        type=str,
+        help="主审计轨道使用的模型"
+    )
+    parser.add_argument(
+        "--random-audit-model",
+        type=str,
+        help="随机审计轨道使用的模型"
+    )
+    parser.add_argument(
+        "--strategist-model",
+        type=str,
+        help="策略规划使用的模型"
+    )
+    parser.add_argument(
+        "--strategist-mode",
+        choices=["llm", "heuristic", "hybrid"],
+        help="核心文件选择方式：llm、heuristic（依赖图排序，不调用 LLM）或 hybrid（排序结果供 LLM 参考）"
+    )
+    parser.add_argument(
+        "--synthesizer-model",
+        type=str,
+        help="综合报告生成使用的模型"
+    )
+    parser.add_argument(
+        "--budget-usd",
+        type=float,
+        help="每个仓库的 LLM 费用上限（美元）"
+    )
+    parser.add_argument(
+        "--total-budget-usd",
+        type=float,
+        help="整个批次的 LLM 费用上限（美元）"
+    )
+
+    args = parser.parse_args()
+
+    repo_urls = load_repo_urls(args.repo_urls, args.repo_file)
+    if not repo_urls:
+        print("错误: 请通过 --repo-urls 或 --repo-file 指定至少一个仓库")
+        exit(1)
+
+    # 获取GitHub Token（全部为本地仓库时无需 Token）
+    try:
+        github_token = EnvConfig.get_github_token()
+    except ValueError as e:
+        if not all(is_local_repo(url) for url in repo_urls):
+            print(f"错误: {e}")
+            print("请设置 GITHUB_TOKEN 环境变量或创建 .env 文件")
+            exit(1)
+        github_token = None
+
+    model_config = ModelConfig(config_file=args.config)
+
+    # 应用命令行参数（如果提供）
+    if args.primary_audit_model:
+        os.environ["PRIMARY_AUDIT_MODEL"] = args.primary_audit_model
+    if args.random_audit_model:
+        os.environ["RANDOM_AUDIT_MODEL"] = args.random_audit_model
+    if args.strategist_model:
+        os.environ["STRATEGIST_MODEL"] = args.strategist_model
+    if args.strategist_mode:
+        os.environ["STRATEGIST_MODE"] = args.strategist_mode
+    if args.synthesizer_model:
+        os.environ["SYNTHESIZER_MODEL"] = args.synthesizer_model
+    if args.scanner_backend:
+        os.environ["SCANNER_BACKEND"] = args.scanner_backend
+    if args.budget_usd is not None:
+        os.environ["LLM_BUDGET_USD"] = str(args.budget_usd)
+    if args.total_budget_usd is not None:
+        os.environ["LLM_TOTAL_BUDGET_USD"] = str(args.total_budget_usd)
+
+    scheduler.configure(github=args.github_concurrency, llm=args.llm_concurrency)
+
+    summary = run_portfolio(
+        repo_urls,
+        github_token,
+        model_config=model_config,
+        output_dir=args.output_dir,
+        max_parallel_repos=args.max_parallel_repos,
+    )
+
+    print(f"\n{'='*20} 组合尽调完成 {'='*20}")
+    print(f"成功 {summary['succeeded']} / {summary['total']}，总耗时 {summary['wall_clock_seconds']}s")
+    print(f"汇总索引: {os.path.join(args.output_dir, 'index.md')}")
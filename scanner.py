@@ -1,8 +1,14 @@
-import requests
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from dateutil.parser import parse
 from requests.exceptions import RequestException, HTTPError
+from configs.env_config import EnvConfig
+from utils.http_transport import get_transport
+from utils.local_reader import LocalRepoReader
+from utils.repo_source import is_local_repo, local_repo_path, parse_github_url, parse_repo_url
+from utils.telemetry import telemetry
 
 def github_get(url, token, params=None, timeout=10):
     """Wrapper for GitHub API GET requests with timeout and rate limit handling"""
@@ -12,7 +18,7 @@ def github_get(url, token, params=None, timeout=10):
         "X-GitHub-Api-Version": "2022-11-28"  
     }
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=timeout)
+        r = get_transport().get(url, headers=headers, params=params, timeout=timeout)
         r.raise_for_status()
         return r.json()
     except HTTPError as e:
@@ -27,90 +33,98 @@ def github_get(url, token, params=None, timeout=10):
     except RequestException as e:
         raise Exception(f"Network request error: {e}") from e
 
-def parse_github_url(url: str):
-    """Parse GitHub repository URL with validity checks"""
-    url = url.rstrip("/")
-    if not url.startswith(("https://github.com/", "http://github.com/")):
-        raise ValueError("Only GitHub repository URLs are supported (e.g. https://github.com/owner/repo)")
-    
-    parts = url.split("/")
-    if len(parts) < 5:
-        raise ValueError(f"Invalid GitHub repository URL: {url}")
-    
-    owner, repo = parts[-2], parts[-1]
-    if not owner or not repo:
-        raise ValueError(f"Failed to parse owner/repo from: {url}")
-    return owner, repo
+def github_graphql(query, variables, token, timeout=10):
+    """Wrapper for GitHub GraphQL requests; returns (data, errors)"""
+    headers = {
+        "Authorization": f"bearer {token}",
+        "Content-Type": "application/json",
+    }
+    try:
+        r = get_transport().post(
+            EnvConfig.get_github_graphql_url(),
+            json_body={"query": query, "variables": variables},
+            headers=headers,
+            timeout=timeout,
+        )
+        r.raise_for_status()
+        payload = r.json()
+    except HTTPError as e:
+        if r.status_code in (403, 429) and "rate limit" in r.text.lower():
+            raise Exception(f"GitHub GraphQL rate limit exceeded! Reset time: {r.headers.get('X-RateLimit-Reset')}") from e
+        elif r.status_code == 401:
+            raise Exception("Token authentication failed. Please check token validity.") from e
+        else:
+            raise Exception(f"GraphQL request failed: {e}") from e
+    except RequestException as e:
+        raise Exception(f"Network request error: {e}") from e
+    return payload.get("data") or {}, payload.get("errors") or []
 
 def fetch_repo_info(owner, repo, token):
     """Retrieve basic repository information"""
-    url = f"https://api.github.com/repos/{owner}/{repo}"
+    url = f"{EnvConfig.get_github_api_url()}/repos/{owner}/{repo}"
     return github_get(url, token)
 
+def _days_since(commit_time_str):
+    commit_time = parse(commit_time_str).astimezone(timezone.utc)
+    now = datetime.now(timezone.utc)
+    return (now - commit_time).days
+
 def fetch_last_commit_days(owner, repo, token):
     """Get days since last commit, handle empty commit history"""
-    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    url = f"{EnvConfig.get_github_api_url()}/repos/{owner}/{repo}/commits"
     commits = github_get(url, token, params={"per_page": 1})
     
     if not commits:  
         return None
     
     try:
-        commit_time_str = commits[0]["commit"]["committer"]["date"]
-        commit_time = parse(commit_time_str).astimezone(timezone.utc)  
-        now = datetime.now(timezone.utc)
-        days_diff = (now - commit_time).days
-        return days_diff
+        return _days_since(commits[0]["commit"]["committer"]["date"])
     except (KeyError, IndexError) as e:
         raise Exception("Failed to parse commit time. API response format may have changed.") from e
     except Exception as e:
         raise Exception(f"Time parsing error: {e}") from e
 
+def _issue_search_params(owner, repo, state=None):
+    q = f"repo:{owner}/{repo} is:issue"
+    if state:
+        q += f" is:{state}"
+    # Only need total count, no need for full issue details
+    return {"q": q, "per_page": 1}
+
+def _build_issue_stats(total_issues, open_issues):
+    if total_issues == 0:
+        return {"open": 0, "closed": 0, "resolution_rate": None}
+    closed_issues = total_issues - open_issues
+    return {
+        "open": open_issues,
+        "closed": closed_issues,
+        "resolution_rate": round(closed_issues / total_issues, 4) if total_issues else None
+    }
+
 def fetch_issue_stats(owner, repo, token):
     """Optimized: Get issue statistics with single search request (reduce API calls)"""
-    base = "https://api.github.com/search/issues"
-    params = {
-        "q": f"repo:{owner}/{repo} is:issue",
-        "per_page": 1  # Only need total count, no need for full issue details
-    }
+    base = f"{EnvConfig.get_github_api_url()}/search/issues"
     try:
-        resp = github_get(base, token, params=params)
+        resp = github_get(base, token, params=_issue_search_params(owner, repo))
         total_issues = resp["total_count"]
         if total_issues == 0:
-            return {"open": 0, "closed": 0, "resolution_rate": None}
-        open_params = {
-            "q": f"repo:{owner}/{repo} is:issue is:open",
-            "per_page": 1
-        }
-        open_resp = github_get(base, token, params=open_params)
-        open_issues = open_resp["total_count"]
-        closed_issues = total_issues - open_issues
-        
-        return {
-            "open": open_issues,
-            "closed": closed_issues,
-            "resolution_rate": round(closed_issues / total_issues, 4) if total_issues else None
-        }
+            return _build_issue_stats(0, 0)
+        open_resp = github_get(base, token, params=_issue_search_params(owner, repo, "open"))
+        return _build_issue_stats(total_issues, open_resp["total_count"])
     except Exception as e:
         raise Exception(f"Failed to retrieve issue statistics: {e}") from e
 
-def analyze_repo(url, token):
-    """Main repository analysis function"""
+async def fetch_issue_stats_async(owner, repo, token):
+    """Concurrent variant: total and open issue searches are issued at the same time"""
+    base = f"{EnvConfig.get_github_api_url()}/search/issues"
     try:
-        owner, repo = parse_github_url(url)
-        info = fetch_repo_info(owner, repo, token)
-        last_commit_days = fetch_last_commit_days(owner, repo, token)
-        issues = fetch_issue_stats(owner, repo, token)
-        
-        return {
-            "repo": f"{owner}/{repo}",
-            "stars": info["stargazers_count"],
-            "forks": info["forks_count"],
-            "last_commit_days_ago": last_commit_days,
-            "issues": issues
-        }
+        total_resp, open_resp = await asyncio.gather(
+            asyncio.to_thread(github_get, base, token, params=_issue_search_params(owner, repo)),
+            asyncio.to_thread(github_get, base, token, params=_issue_search_params(owner, repo, "open")),
+        )
+        return _build_issue_stats(total_resp["total_count"], open_resp["total_count"])
     except Exception as e:
-        raise Exception(f"Repository analysis failed: {e}") from e
+        raise Exception(f"Failed to retrieve issue statistics: {e}") from e
 
 def derive_signals(metrics):
     positives = []
@@ -162,7 +176,9 @@ def derive_signals(metrics):
 
 def compute_health_score(metrics):
 
-    last_commit_days = metrics.get("last_commit_days_ago", 999)
+    last_commit_days = metrics.get("last_commit_days_ago")
+    if last_commit_days is None:
+        last_commit_days = 999
     if last_commit_days <= 7:
         activity_score = 1.0
     elif last_commit_days <= 30:
@@ -182,7 +198,8 @@ def compute_health_score(metrics):
 
     stars = metrics.get("stars", 0)
     forks = metrics.get("forks", 0)
-    popularity_score = min(stars / 10000, 1)  
+    # 本地仓库没有 star 数据，按中性分处理
+    popularity_score = 0.5 if stars is None else min(stars / 10000, 1)
 
 
     risk_flags = metrics.get("risk_flags", [])
@@ -227,20 +244,114 @@ def generate_report(metrics):
         "positives": positives,
         "negatives": negatives
     }
-def analyze_repo(url, token):
-    """主仓库分析函数：对齐代码分析师接口"""
+def _build_metrics(owner, repo, info, last_commit_days, issues):
+    return {
+        "repo": f"{owner}/{repo}",
+        "stars": info["stargazers_count"],
+        "forks": info["forks_count"],
+        "last_commit_days_ago": last_commit_days,
+        "issues": issues
+    }
+
+_GRAPHQL_REPO_FIELDS = """
+    stargazerCount
+    forkCount
+    defaultBranchRef { target { ... on Commit { committedDate } } }
+    openIssues: issues(states: OPEN) { totalCount }
+    closedIssues: issues(states: CLOSED) { totalCount }
+"""
+
+def _build_graphql_query(repos):
+    """Build one aliased query (r0, r1, ...) covering several repositories"""
+    var_defs = []
+    fields = []
+    variables = {}
+    for i, (owner, repo) in enumerate(repos):
+        var_defs.append(f"$o{i}: String!, $n{i}: String!")
+        fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{{_GRAPHQL_REPO_FIELDS}}}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+    query = f"query({', '.join(var_defs)}) {{\n" + "\n".join(fields) + "\n}"
+    return query, variables
+
+def _metrics_from_graphql(owner, repo, node):
+    target = (node.get("defaultBranchRef") or {}).get("target") or {}
+    committed_date = target.get("committedDate")
+    open_issues = node["openIssues"]["totalCount"]
+    closed_issues = node["closedIssues"]["totalCount"]
+    info = {"stargazers_count": node["stargazerCount"], "forks_count": node["forkCount"]}
+    return _build_metrics(
+        owner, repo, info,
+        _days_since(committed_date) if committed_date else None,
+        _build_issue_stats(open_issues + closed_issues, open_issues),
+    )
+
+def analyze_repos_graphql(urls, token, batch_size=None):
+    """
+    GraphQL 批量扫描：每个查询用别名合并多个仓库，单次往返即可拿到全部指标，
+    且不消耗 Search API 的配额
+    Returns:
+        {url: {"metrics": ..., "report": ...}}；失败的仓库对应 {"error": "..."}
+    """
+    batch_size = batch_size or EnvConfig.get_graphql_batch_size()
+    results = {}
+    parsed = []
+    for url in urls:
+        try:
+            parsed.append((url, parse_github_url(url)))
+        except ValueError as e:
+            results[url] = {"error": str(e)}
+
+    for start in range(0, len(parsed), batch_size):
+        batch = parsed[start:start + batch_size]
+        query, variables = _build_graphql_query([repo for _, repo in batch])
+        try:
+            data, errors = github_graphql(query, variables, token)
+        except Exception as e:
+            for url, _ in batch:
+                results[url] = {"error": str(e)}
+            continue
+
+        error_by_alias = {}
+        for err in errors:
+            path = err.get("path") or []
+            if path:
+                error_by_alias[path[0]] = err.get("message", "unknown error")
+
+        for i, (url, (owner, repo)) in enumerate(batch):
+            alias = f"r{i}"
+            node = data.get(alias)
+            if not node:
+                results[url] = {"error": error_by_alias.get(alias, f"Resource not found: {owner}/{repo}")}
+                continue
+            try:
+                metrics = _metrics_from_graphql(owner, repo, node)
+            except (KeyError, TypeError) as e:
+                results[url] = {"error": f"Failed to parse GraphQL response: {e}"}
+                continue
+            results[url] = {"metrics": metrics, "report": generate_report(metrics)}
+    return results
+
+async def _last_commit_days_async(owner, repo, token, snapshot=None):
+    # 快照已固定到默认分支的最新提交，直接复用其提交时间
+    if snapshot is not None and snapshot.committed_at:
+        return _days_since(snapshot.committed_at)
+    return await asyncio.to_thread(fetch_last_commit_days, owner, repo, token)
+
+async def analyze_repo_async(url, token, snapshot=None):
+    """
+    异步仓库分析：相互独立的 GitHub 请求并发发出，延迟接近单次往返
+    Args:
+        snapshot: 已解析的 RepoSnapshot（可选），提供时省去最新提交的查询
+    """
     try:
         owner, repo = parse_github_url(url)
-        info = fetch_repo_info(owner, repo, token)
-        last_commit_days = fetch_last_commit_days(owner, repo, token)
-        issues = fetch_issue_stats(owner, repo, token)
-        metrics = {
-            "repo": f"{owner}/{repo}",
-            "stars": info["stargazers_count"],
-            "forks": info["forks_count"],
-            "last_commit_days_ago": last_commit_days,
-            "issues": issues
-        }
+        info, last_commit_days, issues = await asyncio.gather(
+            asyncio.to_thread(fetch_repo_info, owner, repo, token),
+            _last_commit_days_async(owner, repo, token, snapshot),
+            fetch_issue_stats_async(owner, repo, token),
+        )
+        metrics = _build_metrics(owner, repo, info, last_commit_days, issues)
         report_data = generate_report(metrics)
         return {
             "metrics": metrics,
@@ -249,3 +360,48 @@ def analyze_repo(url, token):
     except Exception as e:
         raise Exception(f"Repository analysis failed: {e}")
 
+def _run_sync(coro):
+    """在同步上下文中运行协程；若当前线程已有事件循环，则放到独立线程中执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+def analyze_local_repo(url, snapshot=None):
+    """
+    本地仓库分析：只有提交时间可用，star / fork / issue 指标留空
+    """
+    owner, repo = parse_repo_url(url)
+    committed_at = snapshot.committed_at if snapshot is not None else None
+    if committed_at is None:
+        committed_at = LocalRepoReader(local_repo_path(url)).get_commit(owner, repo)["committed_at"]
+    metrics = {
+        "repo": f"{owner}/{repo}",
+        "source": "local",
+        "stars": None,
+        "forks": None,
+        "last_commit_days_ago": _days_since(committed_at) if committed_at else None,
+        "issues": {"open": None, "closed": None, "resolution_rate": None},
+    }
+    return {"metrics": metrics, "report": generate_report(metrics)}
+
+@telemetry.traced("analyze_repo")
+def analyze_repo(url, token, backend=None, snapshot=None):
+    """
+    主仓库分析函数：对齐代码分析师接口
+    Args:
+        backend: "rest"（analyze_repo_async 的同步包装）或 "graphql"（单次往返），
+                 默认读取 SCANNER_BACKEND 环境变量
+        snapshot: 已解析的 RepoSnapshot（可选，仅 rest 后端使用）
+    """
+    if is_local_repo(url):
+        return analyze_local_repo(url, snapshot=snapshot)
+    backend = backend or EnvConfig.get_scanner_backend()
+    if backend == "graphql":
+        result = analyze_repos_graphql([url], token)[url]
+        if "error" in result:
+            raise Exception(f"Repository analysis failed: {result['error']}")
+        return result
+    return _run_sync(analyze_repo_async(url, token, snapshot=snapshot))
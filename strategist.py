@@ -1,11 +1,22 @@
 import random
 import re
-import yaml
-from utils.github_reader import GitHubReader
-from jinja2 import Template
+from utils.repo_source import is_local_repo, open_reader, parse_repo_url
+from utils.prompt_registry import prompt_registry
 from configs.llmconfig import llm_manager
+from utils.repo_snapshot import RepoSnapshot
+from utils.telemetry import telemetry, bind
+from utils.llm_budget import BudgetExceeded, truncate_content
+from utils.archive_reader import ArchiveReader
+from utils.import_graph import ImportGraph, RankedFile
+from configs.env_config import EnvConfig
+from concurrent.futures import ThreadPoolExecutor
 import os
-from urllib.parse import urlparse
+from typing import List, Optional
+
+# 选出的核心文件数
+CORE_FILE_COUNT = 3
+# 超过该大小的文件（多为生成代码）不解析导入，只参与大小打分
+RANK_MAX_FILE_BYTES = 512 * 1024
 
 class Strategist:
     CORE_CODE_EXTENSIONS = {
@@ -40,6 +51,15 @@ class Strategist:
         "experiment", "analysis",
         "benchmark", "report",
     }
+    # 选择核心文件时折叠为一行（如 "tests/ (412 个 .py 文件)"）的目录
+    COLLAPSED_DIRS = {
+        "test", "tests", "testing", "unittests", "__tests__",
+        "example", "examples", "sample", "samples", "demo", "demos",
+        "doc", "docs", "tutorial", "tutorials",
+        "fixture", "fixtures", "mock", "mocks",
+        "bench", "benchmarks",
+        "vendor", "third_party", "thirdparty", "3rdparty", "external", "extern",
+    }
     RANDOM_ALLOWED_EXTENSIONS = {
         ".py", ".cpp", ".cc", ".c", ".h", ".hpp",
         ".rs", ".go", ".java", ".ts", ".js",
@@ -53,42 +73,34 @@ class Strategist:
         "node_modules", "dist", "build",
         "__pycache__", ".git", ".github"
     }
-    def __init__(self, repo_url, github_token, model_config=None):
+    def __init__(self, repo_url, github_token, model_config=None, snapshot: Optional[RepoSnapshot] = None):
         self.repo_url = repo_url
         self.tree_structure = ""
         self.readme_content = ""
-        self.reader = GitHubReader(github_token)
+        self.tree_all = []
+        self.snapshot = snapshot
+        self.ranking: Optional[List[RankedFile]] = None
+        self.reader = open_reader(repo_url, github_token)
         from configs.model_config import ModelConfig
         self.model_config = model_config or ModelConfig()
 
     def _load_prompt_template(self):
-        with open("prompts/strategist.yaml", "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        role="core_file_selector"
-        data=data[role]
-        return data['system'], data['user']
+        return prompt_registry.get("strategist", "core_file_selector")
 
     def _parse_repo(self):
-        path = urlparse(self.repo_url).path.strip("/")
-        owner, repo = path.split("/")[:2]
-        return owner, repo
+        return parse_repo_url(self.repo_url)
 
-    def fetch_repo_overview(self):
-        owner, repo = self._parse_repo()
-        tree = self.reader.get_repo_tree(owner, repo)
-        self.tree_structure = tree
-        readme_candidates = [
-            "README.md", "readme.md", "README.MD"
-        ]
-        readme_text = ""
-        for path in readme_candidates:
-            try:
-                readme_text = self.reader.get_file_raw(owner, repo, path)
-                break
-            except Exception:
-                continue
+    def get_snapshot(self) -> RepoSnapshot:
+        """获取仓库快照；未由调用方传入时自行解析一次"""
+        if self.snapshot is None:
+            owner, repo = self._parse_repo()
+            self.snapshot = RepoSnapshot.resolve(self.reader, owner, repo)
+        return self.snapshot
 
-        self.readme_content = readme_text
+    def fetch_repo_overview(self):
+        snapshot = self.get_snapshot()
+        self.tree_structure = self.summarize_tree(snapshot)
+        self.readme_content = snapshot.readme
         return self.tree_structure
 
     def _is_valid_core_candidate(self, path: str) -> bool:
@@ -128,40 +140,120 @@ class Strategist:
                 return False
 
         return True
-    def _filter_tree_for_core_candidates(self, tree_text: str) -> str:
+    def _is_excluded_dir(self, name: str) -> bool:
+        return name.lower() in self.EXCLUDED_KEYWORDS
+
+    def _is_collapsed_dir(self, name: str) -> bool:
+        return name.lower() in self.COLLAPSED_DIRS
+
+    def summarize_tree(self, snapshot: RepoSnapshot) -> str:
         """
-        在不破坏树结构（缩进）的前提下，
-        仅保留通过 _is_valid_core_candidate 的文件
+        供 LLM 选择核心文件的精简目录树：只保留核心代码候选文件，剪掉空目录与排除目录，
+        测试 / 示例等目录折叠为一行，并压缩到 STRATEGIST_TREE_TOKENS 的预算内
         """
-        lines = tree_text.splitlines()
-        kept_lines = []
-
-        for line in lines:
-            stripped = line.strip()
+        return snapshot.index.summarize(
+            max_tokens=EnvConfig.get_strategist_tree_tokens(),
+            keep_file=self._is_valid_core_candidate,
+            skip_dir=self._is_excluded_dir,
+            collapse_dir=self._is_collapsed_dir,
+        )
 
-            if not stripped:
+    def _ranking_candidates(self, snapshot: RepoSnapshot) -> List[dict]:
+        """参与依赖图排序的文件：核心代码候选，且不在排除 / 折叠（测试、示例等）目录中"""
+        candidates = []
+        for item in snapshot.index.entries():
+            *dirs, name = item["path"].split("/")
+            if not self._is_valid_core_candidate(name):
                 continue
-
-            # 目录行：先保留（是否“空目录”可后续再优化）
-            if stripped.endswith("/"):
-                kept_lines.append(line)
+            if any(self._is_excluded_dir(d) or self._is_collapsed_dir(d) for d in dirs):
                 continue
+            candidates.append(item)
+        limit = EnvConfig.get_strategist_rank_max_files()
+        if limit and len(candidates) > limit:
+            # 文件过多时只解析较大的文件，其余文件不进入排序
+            candidates = sorted(candidates, key=lambda item: -item.get("size", 0))[:limit]
+        return candidates
+
+    def _read_sources(self, snapshot: RepoSnapshot, paths: List[str]) -> dict:
+        """读取待解析的源码：未命中 blob 缓存的文件较多时一次下载提交归档，否则逐个并发读取（命中缓存则不发请求）"""
+        owner, repo = self._parse_repo()
+        reader = self.reader
+        archive = None
+        threshold = EnvConfig.get_archive_threshold()
+        cache = getattr(self.reader, "blob_cache", None)
+        missing = [p for p in paths if not (cache and snapshot.blob_sha(p) in cache)]
+        if not is_local_repo(self.repo_url) and threshold and len(missing) >= threshold:
+            try:
+                archive = reader = ArchiveReader.download(self.reader, owner, repo, snapshot.commit_sha)
+            except Exception as e:
+                print(f"⚠️ 归档下载失败，改为逐个读取文件: {e}")
+
+        def read(path):
+            try:
+                return reader.get_file_raw(owner, repo, path, sha=snapshot.blob_sha(path), ref=snapshot.commit_sha)
+            except Exception:
+                return None
 
-            filename = stripped
-            if self._is_valid_core_candidate(filename):
-                kept_lines.append(line)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, EnvConfig.get_github_concurrency())) as executor:
+                return {path: source for path, source in zip(paths, executor.map(bind(read), paths)) if source}
+        finally:
+            if archive is not None:
+                archive.close()
 
-        return "\n".join(kept_lines)
+    def rank_core_candidates(self) -> List[RankedFile]:
+        """
+        基于导入 / 依赖图为核心代码候选文件打分排序（不调用 LLM），结果按快照缓存
+        """
+        if self.ranking is None:
+            with telemetry.span("rank_core_files"):
+                snapshot = self.get_snapshot()
+                candidates = self._ranking_candidates(snapshot)
+                graph = ImportGraph()
+                for item in candidates:
+                    graph.add_file(item["path"], item.get("size", 0))
+                parsed = [item["path"] for item in candidates if item.get("size", 0) <= RANK_MAX_FILE_BYTES]
+                for path, source in self._read_sources(snapshot, parsed).items():
+                    graph.add_source(path, source)
+                self.ranking = graph.rank()
+                edges = sum(len(targets) for targets in graph.edges.values())
+                print(f"依赖图排序: {len(candidates)} 个候选文件、{edges} 条依赖")
+        return self.ranking
 
     def select_core_files(self):
+        """
+        按 STRATEGIST_MODE 选择核心文件：
+        llm：由 LLM 根据精简目录树与 README 选择；heuristic：直接取依赖图排序的前几名，不调用 LLM；
+        hybrid：把依赖图排序结果作为参考提供给 LLM，LLM 的选择中不存在于仓库的路径由排序结果补足
+        """
+        mode = EnvConfig.get_strategist_mode()
+        ranking = self.rank_core_candidates() if mode in ("heuristic", "hybrid") else []
+        ranked_paths = [r.path for r in ranking]
+        if mode == "heuristic":
+            return ranked_paths[:CORE_FILE_COUNT]
+
         sys_p, usr_t = self._load_prompt_template()
-        filtered_tree = self._filter_tree_for_core_candidates(self.tree_structure)
-        usr_p = Template(usr_t).render(
-            tree_structure=filtered_tree,
-            readme_content=self.readme_content[:30000]
+        readme = self.readme_content[:30000]
+        ranked_candidates = "\n".join(
+            f"- {r.describe()}" for r in ranking[:EnvConfig.get_strategist_rank_candidates()]
         )
+
+        def render(ratio=1.0):
+            # 预算不足时目录树与 README 按同一比例截断，输出格式说明保持完整
+            return usr_t.render(
+                tree_structure=truncate_content(self.tree_structure, ratio),
+                readme_content=truncate_content(readme, ratio),
+                ranked_candidates=ranked_candidates,
+            )
+
+        usr_p = render()
         model_name = self.model_config.get_model_name("strategist")
-        response = llm_manager.call(model_name, sys_p, usr_p)
+        try:
+            response = llm_manager.call(model_name, sys_p, usr_p, role="strategist", shrink=render)
+        except BudgetExceeded as e:
+            # 没有核心轨道时仍会完成随机轨道审计与综合报告
+            print(f"⚠️ 预算不足，跳过核心文件选择: {e}")
+            return ranked_paths[:CORE_FILE_COUNT]
         core_paths = []
         pattern = r'-.*?:\s*(.+)'
         lines = response.split('\n')
@@ -174,15 +266,18 @@ class Strategist:
                 path = match.group(1).strip()
                 if path and ('/' in path or '.' in path):
                     core_paths.append(path)
-        return core_paths[:3]
+        if mode == "hybrid":
+            snapshot = self.get_snapshot()
+            core_paths = [p for p in dict.fromkeys(core_paths) if p in snapshot.index]
+            core_paths += [p for p in ranked_paths if p not in core_paths]
+        return core_paths[:CORE_FILE_COUNT]
 
-    def select_random_files(self, exclude_paths):
+    def select_random_files(self, exclude_paths, sample_size=2):
         """
-        从 GitHub API 原始 tree 中随机抽取代码文件
+        从仓库快照的原始 tree 中随机抽取代码文件（同一 tree 的抽样结果固定）
         """
-        owner, repo = self._parse_repo()
-
-        tree_all = self.reader.get_repo_tree_all(owner, repo)
+        tree_all = self.get_snapshot().tree
+        self.tree_all = tree_all
 
         candidates = []
         for item in tree_all:
@@ -195,9 +290,40 @@ class Strategist:
 
             candidates.append(path)
 
-        sample_size = min(2, len(candidates))
-        return random.sample(candidates, sample_size) if sample_size > 0 else []
+        sample_size = min(sample_size, len(candidates))
+        # 以 tree SHA 为种子：仓库内容未变化时抽到同一批文件，可复用历史审计结论
+        rng = random.Random(self.get_snapshot().tree_sha)
+        return rng.sample(candidates, sample_size) if sample_size > 0 else []
+
+    def _blob_shas(self, paths):
+        # 记录待审计文件的 blob SHA，Auditor 按同一版本读取并命中内容缓存
+        snapshot = self.get_snapshot()
+        blob_shas = {}
+        for path in paths:
+            sha = snapshot.blob_sha(path)
+            if sha:
+                blob_shas[path] = sha
+        return blob_shas
+
+    def create_random_plan(self):
+        """
+        只含随机轨道的审计计划：抽样不依赖核心文件的 LLM 选择，
+        可在 select_core_files 运行期间提前审计。与核心文件重复的部分由 create_audit_plan 剔除
+        """
+        random_files = self.select_random_files(exclude_paths=())
+        return {
+            "repo_url": self.repo_url,
+            "core_tracks": [],
+            "random_tracks": random_files,
+            "metadata": {
+                "commit_sha": self.get_snapshot().commit_sha,
+                "blob_shas": self._blob_shas(random_files),
+                # 整个审计（含之后规划的核心轨道）读取的文件数，Auditor 据此决定是否下载归档
+                "planned_files": len(random_files) + CORE_FILE_COUNT,
+            }
+        }
 
+    @telemetry.traced("create_audit_plan")
     def create_audit_plan(self):
         print(f"扫描仓库结构: {self.repo_url}...")
         self.fetch_repo_overview()
@@ -206,14 +332,26 @@ class Strategist:
         core_files = self.select_core_files()
 
         print("规划辅助抽检轨道 (Random Tracks)...")
-        random_files = self.select_random_files(exclude_paths=core_files)
-
+        # 与 create_random_plan 抽到同一批文件，提前完成的随机审计可直接复用；
+        # 与核心文件重复的剔除后再从剩余候选中补足
+        sampled = self.select_random_files(exclude_paths=())
+        random_files = [p for p in sampled if p not in core_files]
+        if len(random_files) < len(sampled):
+            random_files += self.select_random_files(
+                exclude_paths=set(core_files) | set(sampled),
+                sample_size=len(sampled) - len(random_files),
+            )
+
+        snapshot = self.get_snapshot()
         return {
             "repo_url": self.repo_url,
             "core_tracks": core_files,
             "random_tracks": random_files,
             "metadata": {
                 "tree": self.tree_structure,
-                "readme": self.readme_content[:10000]
+                "readme": self.readme_content[:10000],
+                "commit_sha": snapshot.commit_sha,
+                "blob_shas": self._blob_shas(list(core_files) + list(random_files)),
+                "planned_files": len(core_files) + len(random_files),
             }
         }
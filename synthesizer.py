@@ -1,33 +1,59 @@
-import yaml
-from jinja2 import Template
 from configs.llmconfig import llm_manager
+from utils.prompt_registry import prompt_registry
+from utils.telemetry import telemetry
+from utils.llm_budget import BudgetExceeded, truncate_content
 
 class Synthesizer:
     def __init__(self, model_name="deepseek-v3"):
         self.model_name = model_name
 
     def _load_prompt(self, **kwargs):
-        with open("prompts/synthesizer.yaml", "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        
-        sys_p = data['synthesizer']['system']
-        usr_p = Template(data['synthesizer']['user']).render(**kwargs)
-        return sys_p, usr_p
+        return prompt_registry.render("synthesizer", "synthesizer", **kwargs)
 
-    def generate_final_report(self, github_data, audit_results):
+    @telemetry.traced("generate_final_report")
+    def generate_final_report(self, github_data, audit_results, output_path=None):
         """
         核心接口：接收 Scanner JSON 和 Auditor 字典结果
+        Args:
+            output_path: 报告输出路径（可选）。提供时以流式方式生成，边生成边写入文件
         """
         print("正在启动跨维度融合分析 (Synthesizing)...")
         
-        sys_p, usr_p = self._load_prompt(
-            github_json=github_data,
-            core_audit_results=audit_results.get('core', []),
-            random_audit_results=audit_results.get('random', [])
-        )
+        def render(ratio=1.0):
+            # 预算不足时按同一比例截断每份审计报告，报告结构说明保持完整
+            return self._load_prompt(
+                github_json=github_data,
+                core_audit_results=self._shrink_results(audit_results.get('core', []), ratio),
+                random_audit_results=self._shrink_results(audit_results.get('random', []), ratio)
+            )
+
+        sys_p, usr_p = render()
+        shrink = lambda ratio: render(ratio)[1]
 
         try:
-            report = llm_manager.call(self.model_name, sys_p, usr_p)
+            if output_path:
+                return self._stream_to_file(sys_p, usr_p, output_path, shrink)
+            report = llm_manager.call(self.model_name, sys_p, usr_p, role="synthesizer", shrink=shrink)
             return report
+        except BudgetExceeded as e:
+            return f"因 LLM 预算限制未生成综合报告：{str(e)}"
         except Exception as e:
-            return f"Error during synthesis: {str(e)}"
\ No newline at end of file
+            return f"Error during synthesis: {str(e)}"
+
+    @staticmethod
+    def _shrink_results(results, ratio):
+        if ratio >= 1:
+            return results
+        return [
+            {**r, "report": truncate_content(r["report"], ratio)} if isinstance(r, dict) and "report" in r else r
+            for r in results
+        ]
+
+    def _stream_to_file(self, sys_p, usr_p, output_path, shrink=None):
+        pieces = []
+        with open(output_path, "w", encoding="utf-8") as f:
+            for piece in llm_manager.stream(self.model_name, sys_p, usr_p, role="synthesizer", shrink=shrink):
+                pieces.append(piece)
+                f.write(piece)
+                f.flush()
+        return "".join(pieces)
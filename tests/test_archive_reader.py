@@ -0,0 +1,142 @@
+"""
+提交归档读取：去掉 zipball 顶层目录、超出内存上限时落盘、归档缺失的文件回退到 contents 接口，
+以及按整个审计计划的文件数判断是否下载归档
+"""
+import io
+import zipfile
+
+import pytest
+
+import auditor
+from utils.archive_reader import ArchiveReader
+
+SHA = "c" * 40
+FILES = {"README.md": "# demo\n", "src/app.py": "print('app')\n", "src/lib/util.py": "X = 1\n"}
+
+
+def _zipball(files=FILES):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("acme-demo-ccccccc/", "")
+        for path, content in files.items():
+            zf.writestr(f"acme-demo-ccccccc/{path}", content)
+    return buf.getvalue()
+
+
+class _Response:
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+    def close(self):
+        self.closed = True
+
+
+class _Transport:
+    def __init__(self, body):
+        self.response = _Response(body)
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return self.response
+
+
+class _Reader:
+    """GitHubReader 替身：提供下载所需的属性，并记录回退到 contents 接口的读取"""
+
+    api_url = "https://api.github.test"
+    headers = {}
+    proxies = None
+    blob_cache = None
+
+    def __init__(self, body=b""):
+        self.transport = _Transport(body)
+        self.fallback_reads = []
+
+    def get_file_raw(self, owner, repo, path, sha=None, ref=None):
+        self.fallback_reads.append(path)
+        return f"contents:{path}"
+
+
+def test_strips_top_level_directory():
+    with ArchiveReader(io.BytesIO(_zipball())) as archive:
+        assert sorted(archive.paths()) == sorted(FILES)
+        assert "src/lib/util.py" in archive
+        assert archive.get_file_raw("acme", "demo", "src/app.py") == FILES["src/app.py"]
+
+
+def test_missing_entry_falls_back_to_reader():
+    reader = _Reader()
+    with ArchiveReader(io.BytesIO(_zipball()), fallback=reader) as archive:
+        assert archive.get_file_raw("acme", "demo", "README.md") == FILES["README.md"]
+        assert archive.get_file_raw("acme", "demo", "docs/new.md") == "contents:docs/new.md"
+    assert reader.fallback_reads == ["docs/new.md"]
+
+
+def test_missing_entry_without_fallback_raises():
+    with ArchiveReader(io.BytesIO(_zipball())) as archive:
+        with pytest.raises(FileNotFoundError):
+            archive.get_file_raw("acme", "demo", "docs/new.md")
+
+
+@pytest.mark.parametrize("memory_limit, in_memory", [("67108864", True), ("16", False)])
+def test_download_spools_above_memory_limit(monkeypatch, memory_limit, in_memory):
+    monkeypatch.setenv("ARCHIVE_MEMORY_LIMIT", memory_limit)
+    reader = _Reader(_zipball())
+    archive = ArchiveReader.download(reader, "acme", "demo", SHA)
+    try:
+        assert reader.transport.urls == [f"{reader.api_url}/repos/acme/demo/zipball/{SHA}"]
+        assert reader.transport.response.closed
+        assert isinstance(archive._fileobj, io.BytesIO) is in_memory
+        assert archive.get_file_raw("acme", "demo", "src/lib/util.py") == FILES["src/lib/util.py"]
+    finally:
+        archive.close()
+
+
+@pytest.fixture
+def analyst(monkeypatch):
+    monkeypatch.setenv("ARCHIVE_THRESHOLD", "5")
+    analyst = auditor.CodeAnalyst("token")
+    analyst.reader.blob_cache = None
+    downloads = []
+
+    def download(reader, owner, repo, ref):
+        downloads.append(ref)
+        return ArchiveReader(io.BytesIO(_zipball()))
+
+    monkeypatch.setattr(auditor.ArchiveReader, "download", staticmethod(download))
+    monkeypatch.setattr(
+        analyst, "_audit_single_file",
+        lambda repo_url, path, role, model, sha=None, ref=None, reader=None: {"path": path, "archived": reader is not None},
+    )
+    analyst.downloads = downloads
+    yield analyst
+    analyst.close()
+
+
+def _plan(random_tracks, planned_files=None):
+    metadata = {"commit_sha": SHA, "blob_shas": {}}
+    if planned_files is not None:
+        metadata["planned_files"] = planned_files
+    return {"repo_url": "https://github.com/acme/demo", "core_tracks": [], "random_tracks": random_tracks, "metadata": metadata}
+
+
+def test_small_batch_reads_files_individually(analyst):
+    reports = analyst.run_dual_track_audit(_plan(["README.md", "src/app.py"]))
+    assert analyst.downloads == []
+    assert not any(r["archived"] for r in reports["random"])
+
+
+def test_planned_files_count_towards_threshold(analyst):
+    # 本批只有 2 个文件，但整个审计计划共读取 6 个文件，达到阈值 5
+    reports = analyst.run_dual_track_audit(_plan(["README.md", "src/app.py"], planned_files=6))
+    assert analyst.downloads == [SHA]
+    assert all(r["archived"] for r in reports["random"])
@@ -0,0 +1,62 @@
+"""
+审计结果存储只保存按完整提示词生成的结论，并按实际生成结论的模型存储
+"""
+import pytest
+
+import auditor
+from configs.llmconfig import LLMResult
+from utils.audit_store import AuditResultStore
+from utils.prompt_registry import prompt_registry
+
+SHA = "a" * 40
+REQUESTED = "deepseek-v3"
+
+
+class _Reader:
+    def get_file_raw(self, owner, repo, path, sha=None, ref=None):
+        return "def f():\n    return 1\n"
+
+
+@pytest.fixture
+def analyst(monkeypatch, tmp_path):
+    store = AuditResultStore(str(tmp_path / "audit.db"))
+    monkeypatch.setattr(auditor, "get_audit_store", lambda: store)
+    analyst = auditor.CodeAnalyst("token")
+    analyst.store = store
+    return analyst
+
+
+def _reply(monkeypatch, **fields):
+    result = LLMResult(content="报告", requested_model=REQUESTED, **fields)
+    monkeypatch.setattr(auditor.llm_manager, "call_result", lambda *a, **k: result)
+
+
+def _audit(analyst):
+    return analyst._audit_single_file(
+        "https://github.com/o/r", "m.py", "primary_auditor", REQUESTED, sha=SHA, reader=_Reader()
+    )
+
+
+def _stored(analyst, model):
+    return analyst.store.get(SHA, "primary_auditor", model, prompt_registry.version("auditor", "primary_auditor"))
+
+
+def test_full_result_stored_under_requested_model(monkeypatch, analyst):
+    _reply(monkeypatch, model=REQUESTED)
+    _audit(analyst)
+    assert _stored(analyst, REQUESTED)["report"] == "报告"
+
+
+def test_downgraded_result_stored_under_actual_model(monkeypatch, analyst):
+    _reply(monkeypatch, model="gpt-4o-mini")
+    result = _audit(analyst)
+    assert result["model"] == "gpt-4o-mini"
+    assert _stored(analyst, REQUESTED) is None
+    assert _stored(analyst, "gpt-4o-mini") is not None
+
+
+def test_truncated_result_not_stored(monkeypatch, analyst):
+    _reply(monkeypatch, model=REQUESTED, truncated=True)
+    result = _audit(analyst)
+    assert result["truncated"]
+    assert _stored(analyst, REQUESTED) is None
@@ -0,0 +1,78 @@
+"""
+源码分片：Python 按 ast 的函数/类边界切分，其他语言（及无法解析的 Python）按正则识别的定义行切分；
+片段互不重叠、按顺序覆盖全文，且不超过 token 预算（单行超长时除外）
+"""
+from utils.chunker import CHARS_PER_TOKEN, chunk_source, estimate_tokens, number_lines
+
+
+def _function(name, body_lines=20):
+    return f"def {name}():\n" + "".join(f"    x_{i} = {i}\n" for i in range(body_lines)) + "\n\n"
+
+
+def _assert_covers(chunks, content):
+    lines = content.splitlines(keepends=True)
+    assert chunks[0].start_line == 1
+    assert chunks[-1].end_line == len(lines)
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur.start_line == prev.end_line + 1
+    assert "".join(c.text for c in chunks) == content
+    assert [c.index for c in chunks] == list(range(1, len(chunks) + 1))
+
+
+def test_python_splits_on_definition_boundaries():
+    content = "import os\n\n\n" + "".join(_function(f"f{i}") for i in range(6))
+    budget = estimate_tokens(_function("f0")) * 2
+    chunks = chunk_source("m.py", content, budget)
+    assert len(chunks) > 1
+    _assert_covers(chunks, content)
+    for chunk in chunks:
+        assert len(chunk.text) <= budget * CHARS_PER_TOKEN
+        # 除第一个片段（含模块头）外，每个片段都从函数定义开始
+        if chunk.index > 1:
+            assert chunk.text.startswith("def ")
+
+
+def test_large_class_split_into_methods_with_decorators():
+    methods = "".join(
+        f"    @property\n    def m{i}(self):\n" + "".join(f"        y_{j} = {j}\n" for j in range(15)) + "\n"
+        for i in range(6)
+    )
+    content = "class Big:\n" + methods
+    budget = estimate_tokens(content) // 3
+    chunks = chunk_source("big.py", content, budget)
+    assert len(chunks) > 1
+    _assert_covers(chunks, content)
+    # 装饰器与方法留在同一片段
+    for chunk in chunks[1:]:
+        assert chunk.text.startswith("    @property\n")
+
+
+def test_invalid_python_falls_back_to_regex_boundaries():
+    content = "def broken(:\n    pass\n\n" + "".join(_function(f"g{i}") for i in range(4))
+    budget = estimate_tokens(_function("g0")) + 5
+    chunks = chunk_source("broken.py", content, budget)
+    _assert_covers(chunks, content)
+    assert any(c.text.startswith("def g") for c in chunks[1:])
+
+
+def test_generic_language_boundaries():
+    func = "func Handle{}() {{\n" + "".join(f"\tv{i} := {i}\n" for i in range(20)) + "}}\n\n"
+    content = "package main\n\n" + "".join(func.format(i) for i in range(5))
+    budget = estimate_tokens(func.format(0)) + 5
+    chunks = chunk_source("main.go", content, budget)
+    assert len(chunks) > 1
+    _assert_covers(chunks, content)
+    assert all(c.text.startswith("func Handle") for c in chunks[1:])
+
+
+def test_oversized_definition_hard_split_by_lines():
+    content = _function("huge", body_lines=300)
+    budget = 100
+    chunks = chunk_source("huge.py", content, budget)
+    assert len(chunks) > 1
+    _assert_covers(chunks, content)
+    assert all(len(c.text) <= budget * CHARS_PER_TOKEN for c in chunks)
+
+
+def test_number_lines_uses_original_line_numbers():
+    assert number_lines("a\nb\n", 99) == " 99 | a\n100 | b"
@@ -0,0 +1,131 @@
+"""
+熔断器半开探测请求的释放：探测请求以 fatal 错误结束或流被提前关闭时，不能让熔断器永久卡在"探测中"
+"""
+import json
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+import configs.llmconfig as llmconfig
+from benchmarks.mock_llm import MockLLM
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry
+
+MODEL = "gpt-4o-mini"
+
+
+class _BadRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps({"error": {"message": "invalid request", "type": "invalid_request_error"}}).encode()
+        self.send_response(400)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    """每个用例使用独立的熔断器注册表：失败一次即熔断，冷却时间为 0"""
+    monkeypatch.setenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "1")
+    monkeypatch.setenv("LLM_CIRCUIT_RESET_SECONDS", "0")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("LLM_FALLBACK_ENABLED", "0")
+    monkeypatch.setenv("LLM_HEDGE_ENABLED", "0")
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    registry = CircuitBreakerRegistry()
+    monkeypatch.setattr(llmconfig, "circuit_breakers", registry)
+    return registry
+
+
+def _half_open(breaker: CircuitBreaker):
+    breaker.trip(0)
+    assert breaker.state == HALF_OPEN
+
+
+def _manager(monkeypatch, base_url: str) -> llmconfig.LLMManager:
+    monkeypatch.setenv("OPENROUTER_BASE_URL", base_url)
+    return llmconfig.LLMManager()
+
+
+def test_probe_grant_and_release():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout=0)
+    assert breaker.acquire() == CLOSED
+    _half_open(breaker)
+    assert breaker.acquire() == HALF_OPEN
+    # 探测进行中，其余请求被拒绝
+    assert breaker.acquire() is None
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def test_release_after_verdict_is_noop():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout=60)
+    breaker.trip(0)
+    assert breaker.acquire() == HALF_OPEN
+    breaker.record_failure()
+    breaker.release_probe()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_fatal_error_releases_probe(monkeypatch, breakers):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BadRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    manager = _manager(monkeypatch, f"http://127.0.0.1:{server.server_port}/v1")
+    try:
+        breaker = breakers.get(MODEL)
+        _half_open(breaker)
+        with pytest.raises(openai.BadRequestError):
+            manager.call(MODEL, "system", "user", max_retries=1)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+    finally:
+        manager.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_closed_stream_releases_probe(monkeypatch, breakers):
+    llm = MockLLM(completion_tokens=50).start()
+    manager = _manager(monkeypatch, llm.url + "/v1")
+    try:
+        breaker = breakers.get(MODEL)
+        _half_open(breaker)
+        gen = manager.stream(MODEL, "system", "user", max_retries=1)
+        assert next(gen)
+        gen.close()
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+    finally:
+        manager.close()
+        llm.stop()
+
+
+@pytest.mark.parametrize("hedged", [False, True])
+def test_fallback_result_reports_actual_model(monkeypatch, breakers, hedged):
+    monkeypatch.setenv("LLM_FALLBACK_ENABLED", "1")
+    monkeypatch.setenv("LLM_HEDGE_ENABLED", "1" if hedged else "0")
+    llm = MockLLM(completion_tokens=20).start()
+    manager = _manager(monkeypatch, llm.url + "/v1")
+    if hedged:
+        # 延迟样本足够但触发延迟很长：主请求在对冲触发前完成
+        manager._latencies[MODEL] = deque([30.0] * 50)
+    try:
+        breakers.get(MODEL).trip(60)
+        result = manager.call_result(MODEL, "system", "user", max_retries=1)
+        fallback = manager.MODEL_CONFIGS[MODEL]["fallbacks"][0]
+        assert result.model == fallback
+        assert result.degraded
+    finally:
+        manager.close()
+        llm.stop()
@@ -0,0 +1,67 @@
+"""
+条件请求缓存按 token 隔离：一个 token 缓存的响应体不能凭 304 被另一个 token 读到
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.http_transport import ConditionalCache, HttpTransport
+
+
+class _PerTokenHandler(BaseHTTPRequestHandler):
+    """响应体因 token 而异，但 ETag 相同，且不校验 token 是否匹配就返回 304"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f"visible to {self.headers.get('Authorization')}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def transport(monkeypatch, tmp_path):
+    monkeypatch.setenv("GITHUB_RATE_LIMIT_ENABLED", "0")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PerTokenHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    transport = HttpTransport(cache_path=str(tmp_path / "http_cache.db"))
+    transport.url = f"http://127.0.0.1:{server.server_port}/repos/o/private"
+    try:
+        yield transport
+    finally:
+        transport.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_key_depends_on_token_not_scheme():
+    url = "https://api.github.com/repos/o/r"
+    key_a = ConditionalCache.make_key(url, None, {"Authorization": "token A"})
+    assert key_a == ConditionalCache.make_key(url, None, {"Authorization": "bearer A"})
+    assert key_a != ConditionalCache.make_key(url, None, {"Authorization": "token B"})
+    assert key_a != ConditionalCache.make_key(url, None, {})
+
+
+def test_cached_body_not_shared_across_tokens(transport):
+    first = transport.get(transport.url, headers={"Authorization": "token A"})
+    assert first.text == "visible to token A"
+    again = transport.get(transport.url, headers={"Authorization": "token A"})
+    assert again.text == "visible to token A"
+    assert transport.stats["not_modified"] == 1
+
+    other = transport.get(transport.url, headers={"Authorization": "token B"})
+    assert other.text == "visible to token B"
+    assert transport.stats["not_modified"] == 1
@@ -0,0 +1,114 @@
+"""
+依赖图排序：Python 导入解析（相对导入、包 __init__、同名模块就近匹配），
+以及 Strategist 的 heuristic / hybrid 模式如何组合 LLM 选择与排序结果
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import strategist as strategist_module
+from strategist import CORE_FILE_COUNT, Strategist
+from utils.import_graph import ImportGraph, RankedFile
+from utils.tree_index import PathIndex
+
+SOURCES = {
+    "pkg/__init__.py": "from .core import run\nVERSION = '1'\n",
+    "pkg/core.py": "from . import util\nfrom .models import User\nfrom .. import setup_helpers\n",
+    "pkg/util.py": "import os\n",
+    "pkg/models.py": "from pkg import util\n",
+    "pkg/sub/__init__.py": "",
+    "pkg/sub/handler.py": "from ..core import run\nfrom .. import VERSION\nfrom ...outside import x\n",
+    "pkg/sub/util.py": "",
+    "app.py": "import pkg\nimport pkg.sub.handler\nfrom pkg.sub import handler\n",
+    "setup_helpers.py": "",
+}
+
+
+@pytest.fixture
+def graph():
+    graph = ImportGraph()
+    for path, source in SOURCES.items():
+        graph.add_file(path, len(source))
+    for path, source in SOURCES.items():
+        graph.add_source(path, source)
+    return graph
+
+
+def _targets(graph, path):
+    return set(graph.edges.get(path, {}))
+
+
+def test_relative_imports(graph):
+    # from . import util 解析为同目录的子模块；from .models import User 中 User 不是模块，回退到 models
+    assert _targets(graph, "pkg/core.py") == {"pkg/util.py", "pkg/models.py", "setup_helpers.py"}
+    # 上两级的相对导入；from .. import VERSION 指向上级包的 __init__；超出仓库根目录的导入被忽略
+    assert _targets(graph, "pkg/sub/handler.py") == {"pkg/core.py", "pkg/__init__.py"}
+
+
+def test_package_imports_resolve_to_init_or_submodule(graph):
+    assert _targets(graph, "pkg/__init__.py") == {"pkg/core.py"}
+    # import pkg -> 包的 __init__；import pkg.sub.handler 与 from pkg.sub import handler -> 子模块
+    assert _targets(graph, "app.py") == {"pkg/__init__.py", "pkg/sub/handler.py"}
+    assert graph.edges["app.py"]["pkg/sub/handler.py"] == 2.0
+
+
+def test_same_module_name_prefers_closest_package(graph):
+    # models.py 的 from pkg import util 是绝对导入，解析为 pkg/util.py 而非 pkg/sub/util.py
+    assert _targets(graph, "pkg/models.py") == {"pkg/util.py"}
+    assert graph._python_module("pkg/sub/handler.py", "util") == "pkg/sub/util.py"
+    assert graph._python_module("pkg/core.py", "util") == "pkg/util.py"
+
+
+def test_rank_prefers_depended_on_modules(graph):
+    ranking = graph.rank()
+    paths = [r.path for r in ranking]
+    assert set(paths) == set(SOURCES)
+    assert paths.index("pkg/core.py") < paths.index("pkg/sub/util.py")
+    # __init__.py 多为重新导出，得分打折
+    assert paths.index("pkg/core.py") < paths.index("pkg/__init__.py")
+    core = next(r for r in ranking if r.path == "pkg/core.py")
+    assert core.imported_by == 2
+    assert next(r for r in ranking if r.path == "app.py").entry_point
+
+
+RANKED = ["src/engine.py", "src/planner.py", "src/io.py", "src/cli.py"]
+
+
+@pytest.fixture
+def strategist(monkeypatch):
+    s = Strategist("https://github.com/acme/demo", "token")
+    s.snapshot = SimpleNamespace(index=PathIndex.from_paths(RANKED + ["src/extra.py"]))
+    s.ranking = [RankedFile(path, 1.0 / (i + 1), 3 - i, 4096, False) for i, path in enumerate(RANKED)]
+    s.calls = []
+
+    def call(model_name, sys_p, usr_p, **kwargs):
+        s.calls.append(usr_p)
+        return s.reply
+
+    monkeypatch.setattr(strategist_module.llm_manager, "call", call)
+    return s
+
+
+def test_heuristic_mode_skips_llm(monkeypatch, strategist):
+    monkeypatch.setenv("STRATEGIST_MODE", "heuristic")
+    assert strategist.select_core_files() == RANKED[:CORE_FILE_COUNT]
+    assert strategist.calls == []
+
+
+def test_hybrid_keeps_llm_picks_and_fills_from_ranking(monkeypatch, strategist):
+    monkeypatch.setenv("STRATEGIST_MODE", "hybrid")
+    # LLM 选中排序靠后的 src/extra.py，另外一个路径在仓库中不存在，还有一个重复
+    strategist.reply = (
+        "- file_path_1: src/extra.py\n"
+        "- file_path_2: src/hallucinated.py\n"
+        "- file_path_3: src/extra.py\n"
+    )
+    assert strategist.select_core_files() == ["src/extra.py", "src/engine.py", "src/planner.py"]
+    # 排序结果作为参考出现在提示词中
+    assert strategist.ranking[0].describe() in strategist.calls[0]
+
+
+def test_hybrid_llm_order_wins_over_ranking(monkeypatch, strategist):
+    monkeypatch.setenv("STRATEGIST_MODE", "hybrid")
+    strategist.reply = "- file_path_1: src/cli.py\n- file_path_2: src/io.py\n- file_path_3: src/engine.py\n"
+    assert strategist.select_core_files() == ["src/cli.py", "src/io.py", "src/engine.py"]
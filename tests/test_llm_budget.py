@@ -0,0 +1,54 @@
+"""
+预算截断只缩减提示词中的可变内容，可变内容之后的说明（检查清单、输出格式）保持完整
+"""
+import pytest
+
+from utils.chunker import estimate_tokens
+from utils.llm_budget import BudgetExceeded, LLMBudget, truncate_content
+
+CATALOG = {"m": {"input_price": 1.0, "output_price": 1.0, "context_tokens": 128000}}
+INSTRUCTIONS = "### 请按以下格式输出：\n- file_path_1: <路径>"
+
+
+def render(content):
+    return f"### 文件内容：\n{content}\n\n{INSTRUCTIONS}"
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setenv("LLM_BUDGET_ACTION", "truncate")
+    monkeypatch.setenv("LLM_BUDGET_TOKENS", "2000")
+    return LLMBudget()
+
+
+def test_truncate_keeps_instructions(budget):
+    content = "x" * 20000
+    user_prompt = render(content)
+    ticket = budget.plan(
+        "primary_audit", "m", "system", user_prompt, CATALOG, 500,
+        shrink=lambda ratio: render(truncate_content(content, ratio)),
+    )
+    try:
+        assert ticket.user_prompt.endswith(INSTRUCTIONS)
+        assert len(ticket.user_prompt) < len(user_prompt)
+        assert estimate_tokens("system") + estimate_tokens(ticket.user_prompt) + 500 <= 2000
+    finally:
+        budget.release(ticket)
+
+
+def test_no_shrink_skips_instead_of_cutting(budget):
+    with pytest.raises(BudgetExceeded):
+        budget.plan("primary_audit", "m", "system", render("x" * 20000), CATALOG, 500)
+
+
+def test_hedge_reserved_only_when_it_fits(budget):
+    ticket = budget.plan("primary_audit", "m", "system", "x" * 1400, CATALOG, 500)
+    try:
+        # 主请求约 970 tokens，预算 2000 tokens 只够再预留一次
+        hedge = budget.reserve_hedge(ticket, "m", CATALOG)
+        assert hedge is not None
+        assert budget.reserve_hedge(ticket, "m", CATALOG) is None
+        budget.release(hedge)
+    finally:
+        budget.release(ticket)
+    assert budget._root.reserved_tokens == 0
@@ -0,0 +1,62 @@
+"""
+LLM 响应缓存按总大小淘汰：超出 LLM_CACHE_MAX_BYTES 时从最久未访问的条目开始删除
+"""
+import sqlite3
+import time
+
+from utils.llm_cache import LLMResponseCache
+
+
+def _cache(tmp_path, max_bytes):
+    return LLMResponseCache(str(tmp_path / "llm.db"), ttl_seconds=0, max_entries=100, max_bytes=max_bytes)
+
+
+def test_evicts_least_recently_used_until_under_cap(tmp_path):
+    cache = _cache(tmp_path, max_bytes=250)
+    try:
+        cache.put("a", "m", "x" * 100, 1.0)
+        time.sleep(0.01)
+        cache.put("b", "m", "y" * 100, 1.0)
+        time.sleep(0.01)
+        # 访问 a 之后 b 成为最久未访问的条目
+        assert cache.get("a") == "x" * 100
+        time.sleep(0.01)
+        cache.put("c", "m", "z" * 100, 1.0)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+    finally:
+        cache.close()
+
+
+def test_size_counts_utf8_bytes_and_skips_oversized(tmp_path):
+    cache = _cache(tmp_path, max_bytes=250)
+    try:
+        # 每个汉字 3 字节：100 个汉字已超出上限，不写入
+        cache.put("big", "m", "审" * 100, 1.0)
+        assert cache.get("big") is None
+        cache.put("small", "m", "审" * 50, 1.0)
+        assert cache.get("small") == "审" * 50
+    finally:
+        cache.close()
+
+
+def test_migrates_cache_without_size_column(tmp_path):
+    path = str(tmp_path / "llm.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE llm_cache (key TEXT PRIMARY KEY, model TEXT, response TEXT, latency REAL, "
+        "prompt_tokens INTEGER, completion_tokens INTEGER, created_at REAL, accessed_at REAL)"
+    )
+    conn.execute("INSERT INTO llm_cache VALUES ('old', 'm', ?, 1.0, 0, 0, ?, ?)", ("x" * 200, time.time(), 0.0))
+    conn.commit()
+    conn.close()
+
+    cache = LLMResponseCache(path, ttl_seconds=0, max_entries=100, max_bytes=250)
+    try:
+        cache.put("new", "m", "y" * 100, 1.0)
+        # 回填后的旧条目计入总大小，且最久未访问，被优先淘汰
+        assert cache.get("old") is None
+        assert cache.get("new") == "y" * 100
+    finally:
+        cache.close()
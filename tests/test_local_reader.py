@@ -0,0 +1,68 @@
+"""
+本地仓库读取：git 仓库返回的内容必须与提交中的 blob SHA 一致，
+工作区有未提交的修改时读取 git 对象，未修改时直接读磁盘（大文件走 mmap）
+"""
+import subprocess
+
+import pytest
+
+from utils.blob_cache import git_blob_sha
+from utils.local_reader import _MMAP_THRESHOLD, LocalRepoReader
+
+SMALL = "def f():\n    return 1\n"
+LARGE = "# 审计\n" + "x = 1\n" * (_MMAP_THRESHOLD // 6 + 1)
+
+
+def _git(root, *args):
+    subprocess.run(
+        ["git", "-C", str(root), "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        check=True, capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "small.py").write_text(SMALL, encoding="utf-8")
+    (tmp_path / "large.py").write_text(LARGE, encoding="utf-8")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "init")
+    reader = LocalRepoReader(str(tmp_path))
+    commit = reader.get_commit("local", "repo")
+    index = reader.get_tree_index("local", "repo", commit["tree_sha"])["index"]
+    return tmp_path, reader, index
+
+
+@pytest.mark.parametrize("name, content", [("small.py", SMALL), ("large.py", LARGE)], ids=["small", "mmap"])
+def test_clean_file_read_from_disk(monkeypatch, repo, name, content):
+    root, reader, index = repo
+
+    def no_git(*args):
+        raise AssertionError("未修改的文件不应读取 git 对象")
+
+    monkeypatch.setattr(reader, "_git_bytes", no_git)
+    assert reader.get_file_raw("local", "repo", name) == content
+    assert git_blob_sha(content.encode("utf-8")) == index.sha(name)
+
+
+@pytest.mark.parametrize("name, content", [("small.py", SMALL), ("large.py", LARGE)], ids=["small", "mmap"])
+def test_dirty_file_read_from_head(repo, name, content):
+    root, reader, index = repo
+    (root / name).write_text("# 未提交的修改\n" + content, encoding="utf-8")
+    assert reader.get_file_raw("local", "repo", name) == content
+    assert reader.get_file_raw("local", "repo", name, sha=index.sha(name)) == content
+
+
+def test_deleted_file_read_from_head(repo):
+    root, reader, index = repo
+    (root / "small.py").unlink()
+    assert reader.get_file_raw("local", "repo", "small.py") == SMALL
+
+
+def test_plain_directory_reads_disk(tmp_path):
+    (tmp_path / "a.py").write_text(SMALL, encoding="utf-8")
+    reader = LocalRepoReader(str(tmp_path))
+    assert not reader.is_git
+    assert reader.get_file_raw("local", "repo", "a.py") == SMALL
+    with pytest.raises(FileNotFoundError):
+        reader.get_file_raw("local", "repo", "missing.py")
@@ -0,0 +1,69 @@
+"""
+GitHub 配额调度：304 不扣配额；没有在途请求时以服务端的剩余配额为准
+"""
+import time
+
+from requests.structures import CaseInsensitiveDict
+
+from utils.rate_limiter import GitHubRateLimiter
+
+TOKEN = "t1"
+
+
+class _Response:
+    def __init__(self, status_code, remaining, reset_at, limit=5000):
+        self.status_code = status_code
+        self.url = "https://api.github.com/repos/o/r"
+        self.text = ""
+        self.headers = CaseInsensitiveDict({
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset_at),
+            "X-RateLimit-Resource": "core",
+        })
+
+
+def _limiter():
+    return GitHubRateLimiter(tokens=[TOKEN], burst=5, reserve_ratio=0.01)
+
+
+def _bucket(limiter):
+    return limiter._buckets[(TOKEN, "core")]
+
+
+def test_not_modified_refunds_token():
+    limiter = _limiter()
+    reset_at = time.time() + 3600
+    limiter.acquire("core", TOKEN)
+    limiter.update(TOKEN, "core", _Response(200, 4000, reset_at))
+
+    limiter.acquire("core", TOKEN)
+    bucket = _bucket(limiter)
+    assert bucket.remaining == 3999
+    tokens = bucket.tokens
+    limiter.update(TOKEN, "core", _Response(304, 4000, reset_at))
+    assert bucket.remaining == 4000
+    assert bucket.tokens == min(bucket._capacity(), tokens + 1)
+    assert _bucket(limiter).in_flight == 0
+
+
+def test_remaining_recovers_to_server_value_within_window():
+    limiter = _limiter()
+    reset_at = time.time() + 3600
+    limiter.acquire("core", TOKEN)
+    limiter.update(TOKEN, "core", _Response(200, 3000, reset_at))
+    limiter.acquire("core", TOKEN)
+    # 同一时间窗内服务端给出更高的剩余配额（如其他进程的请求计费有误差），应以服务端为准
+    limiter.update(TOKEN, "core", _Response(200, 4500, reset_at))
+    assert _bucket(limiter).remaining == 4500
+
+
+def test_in_flight_requests_still_deducted():
+    limiter = _limiter()
+    reset_at = time.time() + 3600
+    limiter.acquire("core", TOKEN)
+    limiter.acquire("core", TOKEN)
+    limiter.update(TOKEN, "core", _Response(200, 4998, reset_at))
+    assert _bucket(limiter).remaining == 4997
+    limiter.release("core", TOKEN)
+    assert _bucket(limiter).in_flight == 0
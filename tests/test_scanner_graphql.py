@@ -0,0 +1,66 @@
+"""
+GraphQL 批量扫描：别名响应按仓库映射回各自的 URL，单个仓库出错不影响同批的其他仓库
+"""
+import pytest
+
+import scanner
+import utils.http_transport as http_transport
+import utils.rate_limiter as rate_limiter
+from benchmarks.mock_github import MockGitHub
+from benchmarks.synthetic import SyntheticRepo
+
+
+@pytest.fixture
+def github(monkeypatch):
+    mock = MockGitHub({
+        "acme/small": SyntheticRepo(20, name="acme/small"),
+        "acme/large": SyntheticRepo(50, name="acme/large"),
+        "other/tiny": SyntheticRepo(10, name="other/tiny"),
+    }).start()
+    monkeypatch.setenv("GITHUB_API_URL", mock.url)
+    monkeypatch.setenv("GITHUB_GRAPHQL_URL", mock.url + "/graphql")
+    monkeypatch.setenv("HTTP_CACHE_PATH", "")
+    # 传输层与配额调度器是进程级单例，每个用例重新按上面的环境变量创建
+    monkeypatch.setattr(http_transport, "_transport", None)
+    monkeypatch.setattr(rate_limiter, "_limiter", None)
+    try:
+        yield mock
+    finally:
+        if http_transport._transport is not None:
+            http_transport._transport.close()
+        mock.stop()
+
+
+def test_aliases_map_back_to_each_repo(github):
+    urls = [
+        "https://github.com/acme/small",
+        "https://github.com/acme/large",
+        "https://github.com/other/tiny",
+    ]
+    # 每批 2 个仓库：第二批的 r0 对应第三个 URL
+    results = scanner.analyze_repos_graphql(urls, "token", batch_size=2)
+    assert github.stats()["endpoint:graphql"] == 2
+    assert {url: results[url]["metrics"]["repo"] for url in urls} == {
+        urls[0]: "acme/small",
+        urls[1]: "acme/large",
+        urls[2]: "other/tiny",
+    }
+    assert results[urls[0]]["metrics"]["stars"] == 20
+    assert results[urls[1]]["metrics"]["stars"] == 50
+    assert results[urls[2]]["metrics"]["stars"] == 10
+    assert results[urls[1]]["metrics"]["issues"]["open"] == 10
+
+
+def test_partial_error_only_fails_that_repo(github):
+    urls = [
+        "https://github.com/acme/small",
+        "https://github.com/acme/missing",
+        "https://github.com/other/tiny",
+        "not-a-github-url",
+    ]
+    results = scanner.analyze_repos_graphql(urls, "token", batch_size=10)
+    assert github.stats()["endpoint:graphql"] == 1
+    assert "Could not resolve" in results[urls[1]]["error"]
+    assert results[urls[0]]["metrics"]["repo"] == "acme/small"
+    assert results[urls[2]]["metrics"]["repo"] == "other/tiny"
+    assert "error" in results[urls[3]]
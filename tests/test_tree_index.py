@@ -0,0 +1,106 @@
+"""
+精简目录树：按过滤条件剪枝、折叠测试等目录、超出 token 预算时限制每个目录列出的文件数并自深向浅折叠；
+无论怎样截断，输出中列出、合并与折叠的文件数之和都等于保留的文件总数
+"""
+import re
+
+from utils.chunker import CHARS_PER_TOKEN
+from utils.tree_index import PathIndex
+
+KEEP = dict(
+    keep_file=lambda name: not name.endswith(".md"),
+    skip_dir=lambda name: name == "node_modules",
+    collapse_dir=lambda name: name == "tests",
+)
+
+
+def _index():
+    index = PathIndex()
+    for i in range(4):
+        for j in range(10):
+            index.add(f"src/pkg{i}/mod{j}.py", size=100 * j)
+        for j in range(6):
+            index.add(f"src/pkg{i}/sub/deep/x{j}.py", size=10)
+    for k in range(12):
+        index.add(f"tests/unit/test_{k}.py", size=5)
+    for k in range(3):
+        index.add(f"tests/fixtures/data{k}.json", size=5)
+    index.add("node_modules/lib/index.js", size=1)
+    index.add("README.md", size=1)
+    return index
+
+
+KEPT_FILES = 4 * 16 + 15
+
+
+def _counted_files(summary):
+    """列出的文件行 + "另有 N 个文件" + 折叠行中的各类文件数"""
+    total = 0
+    for line in summary.splitlines():
+        line = line.strip()
+        more = re.fullmatch(r"\.\.\. \(另有 (\d+) 个文件\)", line)
+        if more:
+            total += int(more.group(1))
+        elif line.endswith(" 文件)"):
+            total += sum(int(n) for n in re.findall(r"(\d+) 个", line))
+        elif not line.endswith("/"):
+            total += 1
+    return total
+
+
+def test_unbounded_summary_prunes_and_collapses():
+    summary = _index().summarize(**KEEP)
+    assert "node_modules" not in summary
+    assert "README.md" not in summary
+    # 折叠行统计 tests/ 下所有层级的文件
+    assert "tests/ (12 个 .py、3 个 .json 文件)" in summary.splitlines()
+    assert "                x5.py" in summary.splitlines()
+    assert _counted_files(summary) == KEPT_FILES
+
+
+def test_without_filters_matches_render():
+    index = _index()
+    assert index.summarize() == index.render()
+
+
+def test_budget_collapses_deepest_directories_first():
+    summary = _index().summarize(300, **KEEP)
+    lines = summary.splitlines()
+    assert len(summary) <= 300 * CHARS_PER_TOKEN
+    assert lines.count("            deep/ (6 个 .py 文件)") == 4
+    assert "        mod9.py" in lines
+    assert _counted_files(summary) == KEPT_FILES
+
+
+def test_tighter_budgets_collapse_shallower_levels():
+    index = _index()
+    for max_tokens in (150, 80, 20):
+        summary = index.summarize(max_tokens, **KEEP)
+        assert len(summary) <= max_tokens * CHARS_PER_TOKEN
+        assert "目录树过大" not in summary
+        assert _counted_files(summary) == KEPT_FILES
+    assert index.summarize(20, **KEEP).splitlines() == [
+        "src/ (64 个 .py 文件)",
+        "tests/ (12 个 .py、3 个 .json 文件)",
+    ]
+
+
+def test_file_cap_keeps_largest_files_in_original_order():
+    index = PathIndex()
+    for i in range(40):
+        index.add(f"lib/file_{i:02d}.c", size=i)
+    summary = index.summarize(60)
+    lines = summary.splitlines()
+    assert len(summary) <= 60 * CHARS_PER_TOKEN
+    listed = [line.strip() for line in lines[1:-1]]
+    assert listed == sorted(listed)
+    assert listed[-1] == "file_39.c"
+    assert re.fullmatch(r"    \.\.\. \(另有 \d+ 个文件\)", lines[-1])
+    assert _counted_files(summary) == 40
+
+
+def test_line_truncation_as_last_resort():
+    index = PathIndex.from_paths(f"top{i}/file.py" for i in range(50))
+    summary = index.summarize(10)
+    assert len(summary) <= 10 * CHARS_PER_TOKEN + 40
+    assert summary.splitlines()[-1].startswith("... (目录树过大，已省略其余")
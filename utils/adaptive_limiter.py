@@ -0,0 +1,138 @@
+"""
+自适应并发限制（AIMD）
+每个模型一个进程级限制器：延迟稳定时加性增大并发上限，出现 429 / 过载错误时乘性减小，
+所有并行运行的审计共享同一组限制，快模型不被慢模型拖住，也不会引发重试风暴
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from configs.env_config import EnvConfig
+
+# 延迟 EWMA 的平滑系数：短期反映当前负载，长期作为基线
+_SHORT_ALPHA = 0.3
+_LONG_ALPHA = 0.05
+
+
+class AdaptiveLimiter:
+    """AIMD 并发限制器，线程安全"""
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float = 0.5,
+        latency_tolerance: float = 1.5,
+    ):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self._stats = {"successes": 0, "overloads": 0, "peak_limit": int(self.limit), "peak_inflight": 0}
+
+    def acquire(self):
+        with self._cond:
+            while self._inflight >= int(self.limit):
+                self._cond.wait()
+            self._inflight += 1
+            self._stats["peak_inflight"] = max(self._stats["peak_inflight"], self._inflight)
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        """
+        释放槽位并据结果调整上限
+        Args:
+            latency: 成功请求的耗时；失败时为 None
+            overloaded: 是否为限流 / 过载错误
+        """
+        now = time.time()
+        with self._cond:
+            self._inflight -= 1
+            if overloaded:
+                self._stats["overloads"] += 1
+                # 同一波在途请求接连失败只减一次，冷却时间约为一个请求的耗时
+                cooldown = self._short_latency or 1.0
+                if now - self._last_decrease >= cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.backoff)
+                    self._last_decrease = now
+            elif latency is not None:
+                self._stats["successes"] += 1
+                if self._short_latency is None:
+                    self._short_latency = self._long_latency = latency
+                else:
+                    self._short_latency += _SHORT_ALPHA * (latency - self._short_latency)
+                    self._long_latency += _LONG_ALPHA * (latency - self._long_latency)
+                # 延迟稳定且上限已被用满时才增大，每轮（约 limit 次成功）+1
+                if (
+                    self._short_latency <= self.latency_tolerance * self._long_latency
+                    and self._inflight + 1 >= int(self.limit)
+                ):
+                    self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+                    self._stats["peak_limit"] = max(self._stats["peak_limit"], int(self.limit))
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, is_overload: Optional[Callable[[Exception], bool]] = None):
+        """
+        占用一个槽位；正常退出记为成功，异常时由 is_overload 判断是否为过载
+        """
+        self.acquire()
+        started = time.time()
+        succeeded = False
+        overloaded = False
+        try:
+            yield
+            succeeded = True
+        except Exception as e:
+            overloaded = bool(is_overload and is_overload(e))
+            raise
+        finally:
+            self.release(latency=time.time() - started if succeeded else None, overloaded=overloaded)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "inflight": self._inflight,
+                "avg_latency_seconds": round(self._long_latency, 3) if self._long_latency else None,
+                **self._stats,
+            }
+
+
+class AdaptiveLimiterRegistry:
+    """按名称（模型）管理的限制器集合"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, name: str) -> AdaptiveLimiter:
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = AdaptiveLimiter(
+                    name,
+                    initial=EnvConfig.get_llm_adaptive_initial(),
+                    minimum=EnvConfig.get_llm_adaptive_min(),
+                    maximum=EnvConfig.get_llm_adaptive_max(),
+                )
+                self._limiters[name] = limiter
+            return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+# 全局模型并发限制器
+model_limiters = AdaptiveLimiterRegistry()
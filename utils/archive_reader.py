@@ -0,0 +1,118 @@
+"""
+基于仓库归档的批量读取
+待读取文件较多时，一次下载固定提交的 zipball，之后所有文件直接从归档中读取，
+避免逐个调用 contents 接口；读取到的内容同时写入 blob 缓存供后续运行复用
+"""
+import io
+import tempfile
+import threading
+import zipfile
+from typing import Dict, List, Optional
+
+from configs.env_config import EnvConfig
+from utils.blob_cache import git_blob_sha
+
+_DOWNLOAD_CHUNK = 1024 * 1024
+
+
+class ArchiveReader:
+    """
+    GitHubReader 兼容的只读文件源（get_file_raw）
+    归档较小时保存在内存中，超出 ARCHIVE_MEMORY_LIMIT 时落盘到临时文件按需读取；
+    归档中不存在的路径回退到 fallback 读取器
+    """
+
+    def __init__(self, fileobj, fallback=None, blob_cache=None):
+        self.fallback = fallback
+        self.blob_cache = blob_cache
+        self._fileobj = fileobj
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(fileobj)
+        # 去掉 zipball 的顶层目录（<owner>-<repo>-<sha>/）后的路径 -> ZipInfo
+        self._index: Dict[str, zipfile.ZipInfo] = {}
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            _, _, path = info.filename.partition("/")
+            if path:
+                self._index[path] = info
+
+    @classmethod
+    def download(cls, reader, owner: str, repo: str, ref: str) -> "ArchiveReader":
+        """
+        下载指定提交的 zipball 并建立索引
+        Args:
+            reader: GitHubReader，提供 api_url / transport / headers，并作为缺失文件的回退
+            ref: 提交 SHA（应为固定提交，保证与快照一致）
+        """
+        url = f"{reader.api_url}/repos/{owner}/{repo}/zipball/{ref}"
+        resp = reader.transport.get(
+            url, headers=reader.headers, proxies=reader.proxies, conditional=False, stream=True
+        )
+        resp.raise_for_status()
+
+        memory_limit = EnvConfig.get_archive_memory_limit()
+        spool = io.BytesIO()
+        total = 0
+        try:
+            for block in resp.iter_content(_DOWNLOAD_CHUNK):
+                total += len(block)
+                if isinstance(spool, io.BytesIO) and total > memory_limit:
+                    # 超出内存上限：改写到临时文件
+                    tmp = tempfile.TemporaryFile()
+                    tmp.write(spool.getvalue())
+                    spool = tmp
+                spool.write(block)
+        finally:
+            resp.close()
+
+        spool.seek(0)
+        where = "内存" if isinstance(spool, io.BytesIO) else "临时文件"
+        print(f"📦 已下载归档 {owner}/{repo}@{ref[:7]}（{total // 1024} KB，{where}）")
+        return cls(spool, fallback=reader, blob_cache=reader.blob_cache)
+
+    @classmethod
+    def from_file(cls, path: str, fallback=None, blob_cache=None) -> "ArchiveReader":
+        """从本地 zip 文件（如 git archive 导出）构建"""
+        return cls(open(path, "rb"), fallback=fallback, blob_cache=blob_cache)
+
+    def paths(self) -> List[str]:
+        return list(self._index)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._index
+
+    def read_bytes(self, path: str) -> Optional[bytes]:
+        info = self._index.get(path)
+        if info is None:
+            return None
+        # ZipFile 共享底层文件指针，并发读取需串行化
+        with self._lock:
+            return self._zip.read(info)
+
+    def get_file_raw(self, owner, repo, path, sha: Optional[str] = None, ref: Optional[str] = None):
+        """与 GitHubReader.get_file_raw 签名一致；优先 blob 缓存，其次归档，最后回退"""
+        if self.blob_cache and sha:
+            cached = self.blob_cache.get(sha)
+            if cached is not None:
+                return cached.decode('utf-8')
+
+        data = self.read_bytes(path)
+        if data is None:
+            if self.fallback is None:
+                raise FileNotFoundError(f"归档中不存在文件: {path}")
+            return self.fallback.get_file_raw(owner, repo, path, sha=sha, ref=ref)
+
+        if self.blob_cache:
+            self.blob_cache.put(sha or git_blob_sha(data), data)
+        return data.decode('utf-8')
+
+    def close(self):
+        self._zip.close()
+        self._fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,89 @@
+"""
+增量审计结果存储
+以 (blob SHA, 审计角色, 模型, 提示词版本) 为键持久化单文件审计结果；
+文件内容、模型与提示词都未变化时，重复审计直接复用历史结论，不再调用 LLM
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from configs.env_config import EnvConfig
+from utils.telemetry import telemetry
+
+
+class AuditResultStore:
+    """基于 SQLite 的审计结果存储，线程安全"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audit_results (
+                blob_sha TEXT,
+                role TEXT,
+                model TEXT,
+                prompt_version TEXT,
+                path TEXT,
+                result TEXT,
+                created_at REAL,
+                PRIMARY KEY (blob_sha, role, model, prompt_version)
+            )
+            """
+        )
+        self._conn.commit()
+        self._stats = {"reused": 0, "audited": 0}
+
+    def get(self, blob_sha: str, role: str, model: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM audit_results "
+                "WHERE blob_sha = ? AND role = ? AND model = ? AND prompt_version = ?",
+                (blob_sha, role, model, prompt_version),
+            ).fetchone()
+            if row is None:
+                return None
+            self._stats["reused"] += 1
+        telemetry.incr(audit_store_hits=1)
+        return json.loads(row[0])
+
+    def put(self, blob_sha: str, role: str, model: str, prompt_version: str, result: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO audit_results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    blob_sha, role, model, prompt_version, result.get("path"),
+                    json.dumps(result, ensure_ascii=False), time.time(),
+                ),
+            )
+            self._conn.commit()
+            self._stats["audited"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[AuditResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_audit_store() -> Optional[AuditResultStore]:
+    """获取进程级共享存储；通过 AUDIT_STORE_ENABLED=0 关闭"""
+    global _store
+    if not EnvConfig.get_audit_store_enabled():
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = AuditResultStore(EnvConfig.get_audit_store_path())
+        return _store
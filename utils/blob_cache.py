@@ -0,0 +1,179 @@
+"""
+基于 git blob SHA 的内容寻址磁盘缓存
+同一个 blob SHA 对应的文件内容永远不变，因此缓存无需失效，只需按 LRU 与总大小淘汰
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from configs.env_config import EnvConfig
+from utils.telemetry import telemetry
+
+
+def git_blob_sha(data: bytes) -> str:
+    """按 git 的规则计算 blob SHA：sha1(b"blob <len>\\0" + data)"""
+    digest = hashlib.sha1(f"blob {len(data)}\0".encode("utf-8"))
+    # 分两次 update，data 可以是 mmap / memoryview，无需先拼接出一份完整拷贝
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class BlobCache:
+    """
+    线程安全的 blob 缓存
+    文件按 <root>/<sha[:2]>/<sha> 存放，访问时间用 mtime 记录，
+    以便进程重启后仍能恢复 LRU 顺序
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.root = root or EnvConfig.get_blob_cache_dir()
+        self.max_bytes = max_bytes if max_bytes is not None else EnvConfig.get_blob_cache_max_bytes()
+        self.max_entries = max_entries if max_entries is not None else EnvConfig.get_blob_cache_max_entries()
+        self._lock = threading.Lock()
+        # sha -> size，顺序即 LRU 顺序（最早访问的在前）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha)
+
+    def _load_index(self):
+        """扫描缓存目录，按 mtime 重建 LRU 索引"""
+        entries = []
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if len(sub) != 2 or not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                if name.startswith("."):
+                    continue
+                try:
+                    st = os.stat(os.path.join(sub_dir, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+
+        entries.sort()
+        for _, sha, size in entries:
+            self._index[sha] = size
+            self._total_bytes += size
+
+    def __contains__(self, sha: str) -> bool:
+        with self._lock:
+            return sha in self._index
+
+    def get(self, sha: str) -> Optional[bytes]:
+        """读取缓存内容，未命中返回 None"""
+        if not sha:
+            return None
+        with self._lock:
+            if sha not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(sha)
+
+        path = self._path(sha)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)
+        except OSError:
+            # 文件被外部删除：同步清理索引
+            with self._lock:
+                size = self._index.pop(sha, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        telemetry.incr(blob_cache_hits=1)
+        return data
+
+    def put(self, sha: str, data: bytes) -> bool:
+        """
+        写入缓存；内容与 SHA 不匹配时拒绝写入，避免缓存被污染
+        Returns:
+            是否写入成功
+        """
+        if not sha or git_blob_sha(data) != sha:
+            return False
+        if self.max_bytes and len(data) > self.max_bytes:
+            return False
+
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，保证并发读者不会读到半截内容
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        with self._lock:
+            old_size = self._index.pop(sha, None)
+            if old_size is not None:
+                self._total_bytes -= old_size
+            self._index[sha] = len(data)
+            self._total_bytes += len(data)
+            evicted = self._evict_locked()
+
+        for old_sha in evicted:
+            try:
+                os.remove(self._path(old_sha))
+            except OSError:
+                pass
+        return True
+
+    def _evict_locked(self):
+        """按 LRU 淘汰超出容量的条目，调用方需持有锁"""
+        evicted = []
+        while self._index and (
+            (self.max_bytes and self._total_bytes > self.max_bytes)
+            or (self.max_entries and len(self._index) > self.max_entries)
+        ):
+            sha, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(sha)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_default_cache: Optional[BlobCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_blob_cache() -> Optional[BlobCache]:
+    """获取进程级共享缓存实例；通过 BLOB_CACHE_ENABLED=0 关闭"""
+    global _default_cache
+    if not EnvConfig.get_blob_cache_enabled():
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = BlobCache()
+        return _default_cache
@@ -0,0 +1,132 @@
+"""
+源码分片工具
+按函数 / 类边界把大文件切成不超过 token 预算的片段，每个片段保留原文件行号，
+以便分片审计的结论仍能准确引用行号
+"""
+import ast
+import re
+from dataclasses import dataclass
+from typing import List, Set
+
+# 代码文本的粗略估算：平均每个 token 约 3 个字符
+CHARS_PER_TOKEN = 3
+
+# 非 Python 语言中常见的顶层定义起始（函数、类、结构体、实现块等）
+_DEFINITION_PATTERN = re.compile(
+    r"^(?:template\s*<|class\s|struct\s|union\s|enum\s|namespace\s|interface\s|trait\s|impl[\s<]|"
+    r"fn\s|pub\s|func\s|def\s|public\s|private\s|protected\s|static\s|inline\s|export\s|"
+    r"async\s|function\s|object\s|module\s|mod\s|type\s|[A-Za-z_][\w:<>,\s\*&]*\s+\**[A-Za-z_][\w:~]*\s*\()"
+)
+
+
+@dataclass
+class Chunk:
+    index: int
+    start_line: int  # 1-based，含
+    end_line: int    # 1-based，含
+    text: str
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _python_boundaries(source: str, lines: List[str], max_tokens: int) -> Set[int]:
+    """Python：顶层定义的起始行；超出预算的类再细分到方法"""
+    tree = ast.parse(source)
+    boundaries = set()
+
+    def start_of(node):
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [d.lineno for d in decorators])
+
+    stack = [tree.body]
+    while stack:
+        body = stack.pop()
+        for node in body:
+            boundaries.add(start_of(node))
+            if isinstance(node, ast.ClassDef):
+                span = "".join(lines[start_of(node) - 1:node.end_lineno])
+                if estimate_tokens(span) > max_tokens:
+                    stack.append(node.body)
+    return boundaries
+
+
+def _generic_boundaries(lines: List[str]) -> Set[int]:
+    """其他语言：顶格书写、且紧跟空行或右花括号之后的定义行"""
+    boundaries = set()
+    prev = ""
+    for i, line in enumerate(lines, start=1):
+        stripped_prev = prev.strip()
+        if (
+            line[:1] not in ("", " ", "\t", "\n", "}", ")", "#", "/", "*")
+            and (not stripped_prev or stripped_prev.endswith(("}", "};", "*/")))
+            and _DEFINITION_PATTERN.match(line)
+        ):
+            boundaries.add(i)
+        prev = line
+    return boundaries
+
+
+def _segments(lines: List[str], boundaries: Set[int]) -> List[range]:
+    starts = sorted(b for b in boundaries if 1 < b <= len(lines))
+    edges = [1] + starts + [len(lines) + 1]
+    return [range(edges[i], edges[i + 1]) for i in range(len(edges) - 1) if edges[i] < edges[i + 1]]
+
+
+def chunk_source(path: str, content: str, max_tokens: int) -> List[Chunk]:
+    """
+    将源码切分为不超过 max_tokens 的片段
+    优先在函数 / 类边界切分；单个定义本身超出预算时按行硬切
+    """
+    lines = content.splitlines(keepends=True)
+    if not lines:
+        return [Chunk(1, 1, 1, content)]
+
+    boundaries: Set[int] = set()
+    if path.endswith((".py", ".pyi")):
+        try:
+            boundaries = _python_boundaries(content, lines, max_tokens)
+        except (SyntaxError, ValueError):
+            boundaries = set()
+    if not boundaries:
+        boundaries = _generic_boundaries(lines)
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces: List[range] = []
+    for seg in _segments(lines, boundaries):
+        seg_chars = sum(len(lines[i - 1]) for i in seg)
+        if seg_chars <= max_chars:
+            pieces.append(seg)
+            continue
+        # 超大定义：按行累计硬切
+        start, size = seg.start, 0
+        for i in seg:
+            size += len(lines[i - 1])
+            if size > max_chars and i > start:
+                pieces.append(range(start, i))
+                start, size = i, len(lines[i - 1])
+        pieces.append(range(start, seg.stop))
+
+    # 贪心合并相邻片段直至接近预算
+    chunks: List[Chunk] = []
+    cur_start, cur_end, cur_size = None, None, 0
+    for piece in pieces:
+        size = sum(len(lines[i - 1]) for i in piece)
+        if cur_start is not None and cur_size + size > max_chars:
+            chunks.append(Chunk(len(chunks) + 1, cur_start, cur_end, "".join(lines[cur_start - 1:cur_end])))
+            cur_start, cur_size = None, 0
+        if cur_start is None:
+            cur_start = piece.start
+        cur_end = piece.stop - 1
+        cur_size += size
+    if cur_start is not None:
+        chunks.append(Chunk(len(chunks) + 1, cur_start, cur_end, "".join(lines[cur_start - 1:cur_end])))
+    return chunks
+
+
+def number_lines(text: str, start_line: int) -> str:
+    """为片段加上原文件行号前缀"""
+    lines = text.splitlines()
+    width = len(str(start_line + len(lines)))
+    return "\n".join(f"{start_line + i:>{width}} | {line}" for i, line in enumerate(lines))
@@ -0,0 +1,128 @@
+"""
+模型熔断器
+连续失败达到阈值后熔断（open），冷却期内对该模型的调用直接失败并转向备用模型；
+冷却结束后进入半开（half_open）状态，只放行一个探测请求，成功则恢复，失败则重新熔断；
+探测请求未得出结论就结束时（如参数错误、流被提前关闭）重新放开探测名额
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from configs.env_config import EnvConfig
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个模型的熔断状态，线程安全"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._stats = {"trips": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """当前是否允许向该模型发出请求"""
+        return self.acquire() is not None
+
+    def acquire(self) -> Optional[str]:
+        """
+        申请发出一个请求
+        Returns:
+            CLOSED（正常放行）、HALF_OPEN（本请求即探测请求，结束后须调用 release_probe）或 None（拒绝）
+        """
+        now = time.time()
+        with self._lock:
+            if self._state == OPEN and now >= self._open_until:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == CLOSED:
+                return CLOSED
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return HALF_OPEN
+            self._stats["rejected"] += 1
+            return None
+
+    def release_probe(self):
+        """
+        探测请求结束时调用：已由 record_success / record_failure / trip 得出结论时不做任何事；
+        未得出结论就结束（参数 / 鉴权等与模型健康无关的错误、流被提前关闭）时放开探测名额，由下一个请求重新探测
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._trip_locked(self.reset_timeout)
+
+    def trip(self, seconds: Optional[float] = None):
+        """立即熔断，例如服务端给出较长的 Retry-After 或模型不存在"""
+        with self._lock:
+            self._trip_locked(self.reset_timeout if seconds is None else seconds)
+
+    def _trip_locked(self, seconds: float):
+        if self._state != OPEN:
+            self._stats["trips"] += 1
+            print(f"[LLM CIRCUIT] {self.name} 熔断 {seconds:.0f}s")
+        self._state = OPEN
+        self._open_until = max(self._open_until, time.time() + seconds)
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.time() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures, **self._stats}
+
+
+class CircuitBreakerRegistry:
+    """按模型名管理的熔断器集合"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=EnvConfig.get_llm_circuit_failure_threshold(),
+                    reset_timeout=EnvConfig.get_llm_circuit_reset_seconds(),
+                )
+                self._breakers[name] = breaker
+            return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+# 全局熔断器
+circuit_breakers = CircuitBreakerRegistry()
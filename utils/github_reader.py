@@ -1,8 +1,12 @@
-import requests
 import base64
 import os
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
 from configs.env_config import EnvConfig
+from utils.blob_cache import get_blob_cache
+from utils.http_transport import get_transport
+from utils.telemetry import bind
+from utils.tree_index import PathIndex, render_tree
 
 class GitHubReader:
     def __init__(self, token, proxy: Optional[str] = None):
@@ -14,55 +18,181 @@ class GitHubReader:
             self.proxies = {"http": proxy, "https": proxy}
         else:
             self.proxies = None
+        self.api_url = EnvConfig.get_github_api_url()
+        self.transport = get_transport()
+        self.blob_cache = get_blob_cache()
+        # (owner, repo) -> PathIndex，由 get_tree_index 填充，用于按路径查找 blob SHA
+        self._indexes = {}
 
     def get_repo_tree(self, owner, repo):
-        url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/main?recursive=1"
-        res = requests.get(url, headers=self.headers, proxies=self.proxies).json()
-        if "tree" not in res:
-            url = url.replace("main", "master")
-            res = requests.get(url, headers=self.headers, proxies=self.proxies).json()
-        files = [item['path'] for item in res.get('tree', []) if item['type'] == 'blob']
-
-        # 构建树状缩进文本
-        tree_dict = {}
-        for f in files:
-            parts = f.split("/")
-            current = tree_dict
-            for p in parts[:-1]:
-                current = current.setdefault(p + "/", {})
-            current[parts[-1]] = None
-
-        def render_tree(d, indent=0):
-            lines = []
-            for k, v in d.items():
-                lines.append("    " * indent + k)
-                if isinstance(v, dict):
-                    lines.extend(render_tree(v, indent + 1))
-            return lines
-
-        return "\n".join(render_tree(tree_dict))
+        try:
+            index = self.get_tree_index(owner, repo, "main")["index"]
+        except Exception:
+            index = self.get_tree_index(owner, repo, "master")["index"]
+        return index.render()
 
     def get_repo_tree_all(self, owner, repo, branch="main"):
         """
-        返回 GitHub API 原始 tree 结构（扁平）
+        返回扁平 tree 结构（只含 blob 条目）
         """
-        url_ref = f"https://api.github.com/repos/{owner}/{repo}/git/ref/heads/{branch}"
-        ref_resp = requests.get(url_ref, headers=self.headers, proxies=self.proxies)
+        url_ref = f"{self.api_url}/repos/{owner}/{repo}/git/ref/heads/{branch}"
+        ref_resp = self.transport.get(url_ref, headers=self.headers, proxies=self.proxies)
         ref_resp.raise_for_status()
         commit_sha = ref_resp.json()["object"]["sha"]
 
-        url_commit = f"https://api.github.com/repos/{owner}/{repo}/git/commits/{commit_sha}"
-        commit_resp = requests.get(url_commit, headers=self.headers, proxies=self.proxies)
+        url_commit = f"{self.api_url}/repos/{owner}/{repo}/git/commits/{commit_sha}"
+        commit_resp = self.transport.get(url_commit, headers=self.headers, proxies=self.proxies)
         commit_resp.raise_for_status()
         tree_sha = commit_resp.json()["tree"]["sha"]
 
-        url_tree = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}?recursive=1"
-        tree_resp = requests.get(url_tree, headers=self.headers, proxies=self.proxies)
-        tree_resp.raise_for_status()
+        return list(self.get_tree_index(owner, repo, tree_sha)["index"].entries())
+
+    def get_commit(self, owner, repo, ref="HEAD"):
+        """
+        将 ref（分支名、tag 或 HEAD）解析为固定的提交
+        Returns:
+            {"sha": 提交 SHA, "tree_sha": 根 tree SHA, "committed_at": 提交时间（ISO 8601）}
+        """
+        url = f"{self.api_url}/repos/{owner}/{repo}/commits/{ref}"
+        resp = self.transport.get(url, headers=self.headers, proxies=self.proxies)
+        resp.raise_for_status()
+        data = resp.json()
+        return {
+            "sha": data["sha"],
+            "tree_sha": data["commit"]["tree"]["sha"],
+            "committed_at": data["commit"]["committer"]["date"],
+        }
+
+    def get_tree_recursive(self, owner, repo, tree_sha):
+        """
+        返回指定 tree 的递归结构（只含 blob 条目）
+        Returns:
+            {"tree": [...], "truncated": bool}
+        """
+        data = self.get_tree_index(owner, repo, tree_sha)
+        return {"tree": list(data["index"].entries()), "truncated": data["truncated"]}
+
+    def get_tree_index(self, owner, repo, tree_sha):
+        """
+        拉取指定 tree 的全部文件并建立紧凑索引
+        递归接口对超大仓库会截断（truncated: true）且不提示缺了哪些文件；此时改为逐级展开：
+        先取根目录的直接子项，每个子目录再并发递归拉取，仍被截断的子目录继续逐级展开
+        Returns:
+            {"index": PathIndex, "truncated": bool}；truncated 仅在部分子树拉取失败时为 True
+        """
+        data = self._get_tree(owner, repo, tree_sha, recursive=True)
+        if not data.get("truncated"):
+            index = PathIndex.from_entries(data.get("tree", []))
+            truncated = False
+        else:
+            del data
+            print(f"[TREE] {owner}/{repo} 的递归 tree 被截断，改为并发拉取子树...")
+            index, truncated = self._fetch_subtrees(owner, repo, tree_sha)
+            print(f"[TREE] {owner}/{repo}: 共 {len(index)} 个文件、{index.dir_count} 个目录")
+        self._indexes[(owner, repo)] = index
+        return {"index": index, "truncated": truncated}
+
+    def _get_tree(self, owner, repo, tree_sha, recursive: bool) -> Dict[str, Any]:
+        url = f"{self.api_url}/repos/{owner}/{repo}/git/trees/{tree_sha}"
+        resp = self.transport.get(
+            url, headers=self.headers, params={"recursive": "1"} if recursive else None, proxies=self.proxies
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def _fetch_subtrees(self, owner, repo, tree_sha) -> Tuple[PathIndex, bool]:
+        """
+        逐级并发拉取子树，返回 (索引, 是否有子树拉取失败)
+        各子树的结果先按目录暂存，全部完成后再按 git 顺序合并，保证目录树的展示顺序与递归接口一致
+        """
+        # 目录前缀（"" 或 "a/b/"）-> (是否为完整递归结果, 条目)
+        listings: Dict[str, Tuple[bool, List[Dict[str, Any]]]] = {}
+        failed = False
+        with ThreadPoolExecutor(max_workers=EnvConfig.get_tree_fetch_workers()) as executor:
+            def submit(prefix, sha, recursive):
+                future = executor.submit(bind(self._get_tree), owner, repo, sha, recursive)
+                pending[future] = (prefix, sha, recursive)
 
-        return tree_resp.json()["tree"]
+            pending: Dict[Any, Tuple[str, str, bool]] = {}
+            submit("", tree_sha, False)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    prefix, sha, recursive = pending.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        print(f"⚠️ 子树 {prefix or '/'} 拉取失败，目录树将不完整: {e}")
+                        failed = True
+                        continue
+                    if recursive and data.get("truncated"):
+                        # 该子树本身仍超出上限：只取直接子项，继续逐级展开
+                        submit(prefix, sha, False)
+                        continue
+                    entries = data.get("tree", [])
+                    # 单个目录的直接子项超过上限时无法再拆分
+                    failed = failed or bool(data.get("truncated"))
+                    listings[prefix] = (recursive, entries)
+                    if not recursive:
+                        for item in entries:
+                            if item.get("type") == "tree":
+                                submit(f"{prefix}{item['path']}/", item["sha"], True)
+
+        index = PathIndex()
+        # 按 git 顺序（先序）合并：显式栈，不受目录深度限制
+        stack = [("", iter(listings.pop("", (False, []))[1]))]
+        while stack:
+            prefix, items = stack[-1]
+            item = next(items, None)
+            if item is None:
+                stack.pop()
+                continue
+            path = prefix + item["path"]
+            if item.get("type") == "blob":
+                index.add(path, item.get("sha"), item.get("size"))
+            elif item.get("type") == "tree" and path + "/" in listings:
+                recursive, entries = listings.pop(path + "/")
+                if recursive:
+                    index.add_entries(entries, path + "/")
+                else:
+                    stack.append((path + "/", iter(entries)))
+        return index, failed
+
+    def get_readme(self, owner, repo, ref=None):
+        """读取仓库 README（不限文件名与大小写），不存在时返回空字符串"""
+        url = f"{self.api_url}/repos/{owner}/{repo}/readme"
+        resp = self.transport.get(
+            url, headers=self.headers, params={"ref": ref} if ref else None, proxies=self.proxies
+        )
+        if resp.status_code == 404:
+            return ""
+        resp.raise_for_status()
+        res = resp.json()
+        data = base64.b64decode(res['content'])
+        if self.blob_cache:
+            self.blob_cache.put(res.get('sha'), data)
+        return data.decode('utf-8', errors='replace')
+
+    def get_file_raw(self, owner, repo, path, sha: Optional[str] = None, ref: Optional[str] = None):
+        """
+        读取文件内容
+        Args:
+            sha: 文件的 blob SHA（可选）。未提供时尝试从已拉取的 tree 索引中查找，
+                 命中 blob 缓存则不发起任何请求
+            ref: 读取的提交 SHA / 分支（可选），默认读取默认分支
+        """
+        index = self._indexes.get((owner, repo))
+        sha = sha or (index.sha(path) if index is not None else None)
+        if self.blob_cache and sha:
+            cached = self.blob_cache.get(sha)
+            if cached is not None:
+                return cached.decode('utf-8')
 
-    def get_file_raw(self, owner, repo, path):
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-        res = requests.get(url, headers=self.headers, proxies=self.proxies).json()
-        return base64.b64decode(res['content']).decode('utf-8')
\ No newline at end of file
+        url = f"{self.api_url}/repos/{owner}/{repo}/contents/{path}"
+        res = self.transport.get(
+            url, headers=self.headers, params={"ref": ref} if ref else None, proxies=self.proxies
+        ).json()
+        data = base64.b64decode(res['content'])
+        if self.blob_cache:
+            self.blob_cache.put(res.get('sha') or sha, data)
+        return data.decode('utf-8')
\ No newline at end of file
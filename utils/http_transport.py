@@ -0,0 +1,303 @@
+"""
+共享 HTTP 传输层
+- 进程级复用的 keep-alive Session，连接池大小可配置
+- 基于 ETag / Last-Modified 的条件请求：服务端返回 304 时直接使用本地副本，
+  GitHub 对 304 响应不计入 rate limit
+- 所有请求经过 GitHubRateLimiter 节流，被限流时等待后重试
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from configs.env_config import EnvConfig
+from utils.rate_limiter import classify_resource, get_rate_limiter
+from utils.scheduler import scheduler
+from utils.telemetry import telemetry
+
+# 需要随缓存一并恢复的响应头
+_CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+class ConditionalCache:
+    """ETag / Last-Modified 持久化存储（SQLite），线程安全"""
+
+    def __init__(self, path: str, max_entries: int = 20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                body BLOB,
+                accessed_at REAL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]], headers: Dict[str, str]) -> str:
+        # 包含 token 的哈希：不同 token 可见的内容不同（私有仓库、按权限裁剪的字段），
+        # 不能让一个 token 凭 304 拿到另一个 token 缓存的响应体；只存哈希，不落盘 token 本身
+        token = headers.get("Authorization", "").partition(" ")[2]
+        raw = json.dumps(
+            [
+                url,
+                sorted((params or {}).items()),
+                headers.get("Accept", ""),
+                hashlib.sha256(token.encode("utf-8")).hexdigest() if token else "",
+            ],
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, headers, body FROM http_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "headers": json.loads(row[2] or "{}"),
+            "body": row[3],
+        }
+
+    def touch(self, key: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE http_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+
+    def put(self, key: str, url: str, response: requests.Response):
+        headers = {h: response.headers[h] for h in _CACHED_HEADERS if h in response.headers}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    json.dumps(headers),
+                    response.content,
+                    time.time(),
+                ),
+            )
+            # 超出上限时淘汰最久未访问的条目
+            self._conn.execute(
+                """
+                DELETE FROM http_cache WHERE key IN (
+                    SELECT key FROM http_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class HttpTransport:
+    """scanner 与 GitHubReader 共用的 HTTP 传输层"""
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache_path: Optional[str] = None,
+    ):
+        self.timeout = timeout or EnvConfig.get_http_timeout()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections or EnvConfig.get_http_pool_connections(),
+            pool_maxsize=pool_maxsize or EnvConfig.get_http_pool_maxsize(),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        if cache_path is None:
+            cache_path = EnvConfig.get_http_cache_path()
+        self.cache = ConditionalCache(cache_path) if cache_path else None
+
+        self.rate_limiter = get_rate_limiter()
+        self.rate_limit_retries = EnvConfig.get_github_rate_limit_retries()
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "rate_limit_retries": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _send(self, method: str, url: str, headers: Dict[str, str], **kwargs) -> requests.Response:
+        """
+        经配额调度发送请求：先等待配额（不占并发槽位），再占用槽位发出；
+        被限流时按调度器给出的暂停时间等待后重试
+        """
+        resource = classify_resource(url)
+        scheme, _, token = headers.get("Authorization", "").partition(" ")
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                chosen = self.rate_limiter.acquire(resource, token or None)
+                if chosen and chosen != token:
+                    headers = dict(headers, Authorization=f"{scheme or 'token'} {chosen}")
+            else:
+                chosen = token or None
+
+            self._count("requests")
+            started = time.time()
+            try:
+                with scheduler.slot("github"):
+                    resp = self.session.request(method, url, headers=headers, **kwargs)
+            except Exception:
+                telemetry.record_call("http", resource, time.time() - started, error=True, http_requests=1)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.release(resource, chosen)
+                raise
+            telemetry.record_call(
+                "http", resource, time.time() - started, error=resp.status_code >= 400,
+                http_requests=1, http_bytes=self._body_size(resp, kwargs.get("stream")),
+            )
+
+            if self.rate_limiter is None or not self.rate_limiter.update(chosen, resource, resp):
+                return resp
+            if attempt >= self.rate_limit_retries:
+                return resp
+            attempt += 1
+            self._count("rate_limit_retries")
+            telemetry.incr(http_retries=1)
+            resp.close()
+
+    @staticmethod
+    def _body_size(resp: requests.Response, stream: bool) -> int:
+        # 流式响应尚未读取响应体，只能按 Content-Length 估计
+        if stream:
+            return int(resp.headers.get("Content-Length") or 0)
+        return len(resp.content)
+
+    @staticmethod
+    def _from_cache(url: str, entry: Dict[str, Any]) -> requests.Response:
+        """用缓存内容构造一个 200 响应，调用方无需区分是否来自缓存"""
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp._content = entry["body"]
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp.encoding = "utf-8"
+        resp.from_cache = True
+        return resp
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        proxies: Optional[Dict[str, str]] = None,
+        conditional: bool = True,
+        stream: bool = False,
+    ) -> requests.Response:
+        """
+        发起 GET 请求
+        Args:
+            conditional: 是否使用 ETag / Last-Modified 条件请求
+            stream: 是否流式读取响应体（用于归档下载等大响应，不参与条件请求缓存）
+        Returns:
+            requests.Response；304 时返回由本地副本构造的 200 响应
+        """
+        headers = dict(headers or {})
+        key = None
+        entry = None
+        if conditional and not stream and self.cache is not None:
+            key = ConditionalCache.make_key(url, params, headers)
+            entry = self.cache.get(key)
+            if entry:
+                if entry["etag"]:
+                    headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = self._send(
+            "GET",
+            url,
+            headers,
+            params=params,
+            timeout=timeout or self.timeout,
+            proxies=proxies,
+            stream=stream,
+        )
+
+        if resp.status_code == 304 and entry:
+            self._count("not_modified")
+            telemetry.incr(http_cache_hits=1)
+            self.cache.touch(key)
+            return self._from_cache(url, entry)
+
+        if (
+            key is not None
+            and resp.status_code == 200
+            and ("ETag" in resp.headers or "Last-Modified" in resp.headers)
+        ):
+            self.cache.put(key, url, resp)
+        return resp
+
+    def post(
+        self,
+        url: str,
+        json_body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        proxies: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """发起 POST 请求（如 GraphQL 查询），不参与条件请求缓存"""
+        return self._send(
+            "POST",
+            url,
+            dict(headers or {}),
+            json=json_body,
+            timeout=timeout or self.timeout,
+            proxies=proxies,
+        )
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+_transport: Optional[HttpTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """获取进程级共享的传输层实例"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
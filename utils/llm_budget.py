@@ -0,0 +1,345 @@
+"""
+LLM 花费预算
+每次调用前按提示词长度估算 token 与费用，在当前审计（scope）中预留，完成后按实际 usage 结算；
+花费按审计、按阶段（strategist / primary_audit / random_audit / synthesizer）与整个进程分别累计。
+调用会超出预算时按 LLM_BUDGET_ACTION 依次尝试：换用更便宜的模型（downgrade）、截断提示词中的可变内容（truncate）、跳过（skip）
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from configs.env_config import EnvConfig
+from utils.chunker import estimate_tokens
+from utils.circuit_breaker import OPEN, circuit_breakers
+
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("llm_budget_scope", default=None)
+
+_TRUNCATION_NOTICE = "\n\n[... 以下内容因 LLM 预算限制被截断 ...]"
+
+# 截断后至少保留的可变内容比例，低于该比例时审计已无意义，直接跳过
+_MIN_KEEP_RATIO = 0.2
+
+_ACTIONS = ("downgrade", "truncate", "skip")
+
+
+class BudgetExceeded(RuntimeError):
+    """调用会超出预算，且无法通过降级或截断满足"""
+
+
+def truncate_content(text: str, keep_ratio: float) -> str:
+    """按保留比例截断提示词中的可变内容，并注明截断；供调用方实现 shrink 回调"""
+    if keep_ratio >= 1:
+        return text
+    return text[:max(0, int(len(text) * keep_ratio))] + _TRUNCATION_NOTICE
+
+
+def estimate_cost(model_config: Dict[str, Any], prompt_tokens: float, completion_tokens: float) -> float:
+    """按 MODEL_CONFIGS 中的单价（美元 / 百万 token）估算费用"""
+    return (
+        prompt_tokens * model_config.get("input_price", 0.0)
+        + completion_tokens * model_config.get("output_price", 0.0)
+    ) / 1_000_000
+
+
+def _new_usage() -> Dict[str, float]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "estimated_usd": 0.0,
+            "downgraded": 0, "truncated": 0, "skipped": 0}
+
+
+class BudgetScope:
+    """一次审计（或整个进程）的花费与在途预留"""
+
+    def __init__(self, name: str):
+        self.name = name
+        # 第一次 LLM 调用时开始计时，不包含调用前的仓库解析等阶段
+        self.started: Optional[float] = None
+        self.total = _new_usage()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.reserved_usd = 0.0
+        self.reserved_tokens = 0
+        self.stage_reserved: Dict[str, float] = {}
+
+    def stage(self, stage: str) -> Dict[str, float]:
+        return self.stages.setdefault(stage, _new_usage())
+
+    def remaining_usd(self, limit: float) -> float:
+        return limit - self.total["cost_usd"] - self.reserved_usd
+
+    def remaining_tokens(self, limit: int) -> int:
+        spent = self.total["prompt_tokens"] + self.total["completion_tokens"]
+        return limit - spent - self.reserved_tokens
+
+    def remaining_stage_usd(self, stage: str, limit: float) -> float:
+        return limit - self.stage(stage)["cost_usd"] - self.stage_reserved.get(stage, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        def rounded(d):
+            return {k: round(v, 6) if isinstance(v, float) else v for k, v in d.items()}
+
+        return {
+            **rounded(self.total),
+            "elapsed_seconds": round(time.time() - self.started, 2) if self.started else 0.0,
+            "stages": {name: rounded(usage) for name, usage in self.stages.items()},
+        }
+
+
+class BudgetTicket:
+    """一次调用的预算决策：实际使用的模型、（可能被截断的）用户提示词与预留额度"""
+
+    __slots__ = ("model", "user_prompt", "stage", "cost", "prompt_tokens", "completion_tokens", "scopes")
+
+    def __init__(
+        self, model: str, user_prompt: str, stage: str, cost: float,
+        prompt_tokens: int, completion_tokens: int, scopes: List[BudgetScope],
+    ):
+        self.model = model
+        self.user_prompt = user_prompt
+        self.stage = stage
+        self.cost = cost
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.scopes = scopes
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class LLMBudget:
+    """进程级预算账本，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._root = BudgetScope("total")
+
+    @contextmanager
+    def scope(self, name: str):
+        """
+        一次审计的预算范围；同一上下文（含经 telemetry.bind 提交到线程池的任务）中的调用都计入该范围。
+        不在任何范围内的调用（如 LangGraph 的单次运行）由进程级范围同时承担审计预算
+        """
+        scope = BudgetScope(name)
+        token = _current_scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _current_scope.reset(token)
+
+    def _scopes(self) -> List[BudgetScope]:
+        current = _current_scope.get()
+        return [current, self._root] if current is not None else [self._root]
+
+    def _headroom_locked(self, scopes: List[BudgetScope], stage: str) -> Tuple[Optional[float], Optional[int]]:
+        """剩余可用的 (美元, token)；None 表示不限"""
+        audit = scopes[0]
+        usd_limits = []
+        if EnvConfig.get_llm_budget_usd() > 0:
+            usd_limits.append(audit.remaining_usd(EnvConfig.get_llm_budget_usd()))
+        stage_limit = EnvConfig.get_llm_stage_budgets_usd().get(stage, 0)
+        if stage_limit > 0:
+            usd_limits.append(audit.remaining_stage_usd(stage, stage_limit))
+        if EnvConfig.get_llm_total_budget_usd() > 0:
+            usd_limits.append(self._root.remaining_usd(EnvConfig.get_llm_total_budget_usd()))
+        token_limit = EnvConfig.get_llm_budget_tokens()
+        return (
+            min(usd_limits) if usd_limits else None,
+            audit.remaining_tokens(token_limit) if token_limit > 0 else None,
+        )
+
+    def plan(
+        self,
+        role: Optional[str],
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        catalog: Dict[str, Dict[str, Any]],
+        completion_tokens: Optional[int] = None,
+        shrink: Optional[Callable[[float], str]] = None,
+    ) -> BudgetTicket:
+        """
+        调用前的预算检查与预留
+        Args:
+            catalog: 模型配置（MODEL_CONFIGS），提供单价与上下文窗口
+            completion_tokens: 预计输出 token 数（默认取 max_tokens 或 LLM_EXPECTED_COMPLETION_TOKENS）
+            shrink: 按保留比例截断可变内容后重新渲染用户提示词；截断只缩减可变内容，
+                    提示词中的检查清单、输出格式等说明保持完整。未提供时不截断
+        Returns:
+            BudgetTicket；调用结束后必须 release
+        Raises:
+            BudgetExceeded: 降级与截断都无法满足预算（或已超出审计时限）
+        """
+        stage = role or "other"
+        completion = completion_tokens or EnvConfig.get_llm_expected_completion_tokens()
+        system_tokens = estimate_tokens(system_prompt)
+        user_tokens = estimate_tokens(user_prompt)
+        scopes = self._scopes()
+        action = EnvConfig.get_llm_budget_action()
+        action = action if action in _ACTIONS else "downgrade"
+
+        with self._lock:
+            now = time.time()
+            for scope in scopes:
+                if scope.started is None:
+                    scope.started = now
+
+            seconds_limit = EnvConfig.get_llm_budget_seconds()
+            if seconds_limit > 0 and now - scopes[0].started > seconds_limit:
+                self._count_locked(scopes, stage, "skipped")
+                raise BudgetExceeded(f"{stage}: 已超出审计时限 {seconds_limit:.0f}s")
+
+            usd_left, tokens_left = self._headroom_locked(scopes, stage)
+            prompt_tokens = system_tokens + user_tokens
+            tokens = prompt_tokens + completion
+            cost = estimate_cost(catalog.get(model, {}), prompt_tokens, completion)
+
+            def fits(c, t):
+                return (usd_left is None or c <= usd_left) and (tokens_left is None or t <= tokens_left)
+
+            if fits(cost, tokens):
+                return self._reserve_locked(scopes, stage, model, user_prompt, cost, prompt_tokens, completion)
+
+            cheaper = self._cheaper_models(model, prompt_tokens, completion, catalog)
+            if action == "downgrade":
+                for name, candidate_cost in cheaper:
+                    if fits(candidate_cost, tokens):
+                        self._count_locked(scopes, stage, "downgraded")
+                        print(f"[LLM BUDGET] {stage}: {model} 预计 ${cost:.4f} 超出预算，改用 {name}（${candidate_cost:.4f}）")
+                        return self._reserve_locked(
+                            scopes, stage, name, user_prompt, candidate_cost, prompt_tokens, completion
+                        )
+
+            if action in ("downgrade", "truncate") and shrink is not None:
+                # 降级后仍放不下时，用最便宜的模型尽量保留更多内容
+                target = cheaper[-1][0] if action == "downgrade" and cheaper else model
+                config = catalog.get(target, {})
+                allowed = []
+                if usd_left is not None:
+                    input_price = config.get("input_price", 0.0)
+                    budget_for_prompt = usd_left * 1_000_000 - completion * config.get("output_price", 0.0)
+                    allowed.append(budget_for_prompt / input_price if input_price > 0 else float("inf"))
+                if tokens_left is not None:
+                    allowed.append(tokens_left - completion)
+                keep_tokens = min(int(min(allowed)) - system_tokens, user_tokens)
+                # 可变内容清空后剩下的即固定部分（说明、输出格式），截断只作用于可变内容
+                fixed_tokens = estimate_tokens(shrink(0.0))
+                variable_tokens = user_tokens - fixed_tokens
+                keep_ratio = (keep_tokens - fixed_tokens) / variable_tokens if variable_tokens > 0 else 0.0
+                if keep_ratio >= _MIN_KEEP_RATIO:
+                    truncated = shrink(keep_ratio)
+                    truncated_tokens = estimate_tokens(truncated)
+                    if truncated_tokens > keep_tokens:
+                        # 按比例截断有取整误差，超出部分再收缩一次
+                        keep_ratio -= (truncated_tokens - keep_tokens + 1) / variable_tokens
+                        truncated = shrink(max(0.0, keep_ratio))
+                        truncated_tokens = estimate_tokens(truncated)
+                    new_cost = estimate_cost(config, system_tokens + truncated_tokens, completion)
+                    self._count_locked(scopes, stage, "truncated")
+                    if target != model:
+                        self._count_locked(scopes, stage, "downgraded")
+                    print(
+                        f"[LLM BUDGET] {stage}: 可变内容保留约 {keep_ratio:.0%}，"
+                        f"提示词由约 {user_tokens} tokens 截断为 {truncated_tokens} tokens"
+                        f"{f'，并改用 {target}' if target != model else ''}"
+                    )
+                    return self._reserve_locked(
+                        scopes, stage, target, truncated, new_cost, system_tokens + truncated_tokens, completion
+                    )
+
+            self._count_locked(scopes, stage, "skipped")
+            remaining = f"${usd_left:.4f}" if usd_left is not None else f"{tokens_left} tokens"
+            raise BudgetExceeded(f"{stage}: {model} 预计 ${cost:.4f} / {tokens} tokens，超出剩余预算 {remaining}")
+
+    @staticmethod
+    def _cheaper_models(model: str, prompt_tokens: int, completion: int, catalog) -> List[Tuple[str, float]]:
+        """比当前模型便宜、上下文放得下且未熔断的模型，按费用从高到低（越靠前越接近原模型）"""
+        current = estimate_cost(catalog.get(model, {}), prompt_tokens, completion)
+        candidates = []
+        for name, config in catalog.items():
+            if name == model or config.get("context_tokens", 32000) < prompt_tokens + completion:
+                continue
+            if circuit_breakers.get(name).state == OPEN:
+                continue
+            cost = estimate_cost(config, prompt_tokens, completion)
+            if cost < current:
+                candidates.append((name, cost))
+        return sorted(candidates, key=lambda item: -item[1])
+
+    def reserve_hedge(self, ticket: BudgetTicket, model: str, catalog: Dict[str, Dict[str, Any]]) -> Optional[BudgetTicket]:
+        """
+        为对冲请求（同一提示词发往 model）追加预留；放不下时返回 None，调用方不应发出对冲请求
+        Returns:
+            对冲请求的 BudgetTicket；对冲结束后必须 release
+        """
+        cost = estimate_cost(catalog.get(model, {}), ticket.prompt_tokens, ticket.completion_tokens)
+        with self._lock:
+            usd_left, tokens_left = self._headroom_locked(ticket.scopes, ticket.stage)
+            if (usd_left is not None and cost > usd_left) or (tokens_left is not None and ticket.tokens > tokens_left):
+                return None
+            return self._reserve_locked(
+                ticket.scopes, ticket.stage, model, ticket.user_prompt, cost,
+                ticket.prompt_tokens, ticket.completion_tokens,
+            )
+
+    def _reserve_locked(self, scopes, stage, model, user_prompt, cost, prompt_tokens, completion_tokens) -> BudgetTicket:
+        for scope in scopes:
+            scope.reserved_usd += cost
+            scope.reserved_tokens += prompt_tokens + completion_tokens
+            scope.stage_reserved[stage] = scope.stage_reserved.get(stage, 0.0) + cost
+            scope.stage(stage)["estimated_usd"] += cost
+            scope.total["estimated_usd"] += cost
+        return BudgetTicket(model, user_prompt, stage, cost, prompt_tokens, completion_tokens, scopes)
+
+    @staticmethod
+    def _count_locked(scopes, stage, key):
+        for scope in scopes:
+            scope.stage(stage)[key] += 1
+            scope.total[key] += 1
+
+    def release(self, ticket: BudgetTicket):
+        """调用结束（无论成败）后释放预留额度"""
+        with self._lock:
+            for scope in ticket.scopes:
+                scope.reserved_usd -= ticket.cost
+                scope.reserved_tokens -= ticket.tokens
+                scope.stage_reserved[ticket.stage] -= ticket.cost
+
+    def record(self, role: Optional[str], model_config: Dict[str, Any], prompt_tokens: int, completion_tokens: int) -> float:
+        """按实际 usage 结算一次调用（对冲请求各自结算，被取消的请求按估算结算），返回费用（美元）"""
+        stage = role or "other"
+        cost = estimate_cost(model_config, prompt_tokens, completion_tokens)
+        with self._lock:
+            for scope in self._scopes():
+                for usage in (scope.total, scope.stage(stage)):
+                    usage["calls"] += 1
+                    usage["prompt_tokens"] += prompt_tokens
+                    usage["completion_tokens"] += completion_tokens
+                    usage["cost_usd"] += cost
+        return cost
+
+    def stats(self) -> Dict[str, Any]:
+        """整个进程的花费（含各阶段）与当前预算设置"""
+        with self._lock:
+            stats = self._root.stats()
+        stats["limits"] = {
+            "audit_usd": EnvConfig.get_llm_budget_usd(),
+            "audit_tokens": EnvConfig.get_llm_budget_tokens(),
+            "audit_seconds": EnvConfig.get_llm_budget_seconds(),
+            "stage_usd": EnvConfig.get_llm_stage_budgets_usd(),
+            "total_usd": EnvConfig.get_llm_total_budget_usd(),
+            "action": EnvConfig.get_llm_budget_action(),
+        }
+        return stats
+
+    def scope_stats(self, scope: BudgetScope) -> Dict[str, Any]:
+        with self._lock:
+            return scope.stats()
+
+
+# 全局预算账本
+llm_budget = LLMBudget()
@@ -0,0 +1,174 @@
+"""
+LLM 响应持久化缓存
+以完整请求（模型、Base URL、提示词、生成参数）的哈希为键，
+同一仓库未变化时重复运行 strategist / auditor / synthesizer 可直接复用结果
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from configs.env_config import EnvConfig
+
+
+class LLMResponseCache:
+    """基于 SQLite 的响应缓存，支持 TTL、条目数与总大小上限，线程安全"""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, max_bytes: int = 0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                latency REAL,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                created_at REAL,
+                accessed_at REAL,
+                size INTEGER
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+        if "size" not in columns:
+            # 旧版本缓存库没有 size 列：补列并按响应的 UTF-8 字节数回填
+            self._conn.execute("ALTER TABLE llm_cache ADD COLUMN size INTEGER")
+            self._conn.execute("UPDATE llm_cache SET size = length(CAST(response AS BLOB))")
+        self._conn.commit()
+        self._stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0, "saved_tokens": 0}
+
+    @staticmethod
+    def make_key(model_name: str, base_url: str, system_prompt: str, user_prompt: str,
+                 generate_args: Dict[str, Any]) -> str:
+        raw = json.dumps(
+            {
+                "model": model_name,
+                "base_url": base_url,
+                "system": system_prompt,
+                "user": user_prompt,
+                "args": generate_args,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, prompt_tokens, completion_tokens, created_at "
+                "FROM llm_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or (self.ttl_seconds and now - row[4] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self._stats["misses"] += 1
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += row[1] or 0.0
+            self._stats["saved_tokens"] += (row[2] or 0) + (row[3] or 0)
+            return row[0]
+
+    def put(self, key: str, model_name: str, response: str, latency: float,
+            prompt_tokens: int = 0, completion_tokens: int = 0):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(key, model, response, latency, prompt_tokens, completion_tokens, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, latency, prompt_tokens, completion_tokens, now, now, size),
+            )
+            if self.ttl_seconds:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+                )
+            # 超出上限时淘汰最久未访问的条目
+            self._conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            if self.max_bytes:
+                self._evict_bytes_locked()
+            self._conn.commit()
+
+    def _evict_bytes_locked(self):
+        """总大小超出上限时，从最久未访问的条目开始淘汰，直到回到上限以内"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size or 0
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["saved_seconds"] = round(stats["saved_seconds"], 2)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled_for(role: Optional[str]) -> bool:
+    """
+    判断某个角色的调用是否使用缓存
+    Args:
+        role: 调用方角色（strategist / primary_audit / random_audit / synthesizer）
+    """
+    if not EnvConfig.get_llm_cache_enabled():
+        return False
+    roles = EnvConfig.get_llm_cache_roles()
+    return not roles or (role or "default") in roles
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """获取进程级共享缓存；未启用时返回 None"""
+    global _cache
+    if not EnvConfig.get_llm_cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache(
+                EnvConfig.get_llm_cache_path(),
+                EnvConfig.get_llm_cache_ttl(),
+                EnvConfig.get_llm_cache_max_entries(),
+                EnvConfig.get_llm_cache_max_bytes(),
+            )
+        return _cache
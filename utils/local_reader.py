@@ -0,0 +1,203 @@
+"""
+本地仓库读取器
+接口与 GitHubReader 一致，直接读取磁盘上的工作区或裸仓库（bare repo），不产生任何网络请求。
+git 仓库通过 git 命令解析提交与 tree（blob SHA 与 GitHub 一致），普通目录则直接遍历文件系统
+"""
+import mmap
+import os
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from utils.blob_cache import git_blob_sha
+from utils.tree_index import PathIndex
+
+# 超过该大小的文件通过内存映射读取，避免额外的用户态缓冲拷贝
+_MMAP_THRESHOLD = 1024 * 1024
+
+# 非 git 目录没有提交信息，用全零 SHA 占位
+_NULL_SHA = "0" * 40
+
+_SKIP_DIRS = {".git", ".hg", ".svn"}
+
+
+class LocalRepoReader:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"本地仓库不存在: {self.root}")
+        # 本地读取无需再落一份 blob 缓存
+        self.blob_cache = None
+        # (owner, repo) -> PathIndex，由 get_tree_index / get_tree_recursive / get_repo_tree_all 填充
+        self._indexes = {}
+        # 只认仓库根目录本身：位于其他仓库子目录中的普通目录仍按普通目录处理
+        self.bare = self._git("rev-parse", "--is-bare-repository", check=False) == "true"
+        toplevel = None if self.bare else self._git("rev-parse", "--show-toplevel", check=False)
+        self.is_git = self.bare or (
+            toplevel is not None and os.path.realpath(toplevel) == os.path.realpath(self.root)
+        )
+
+    def _git(self, *args, check=True) -> Optional[str]:
+        """执行 git 命令并返回去掉末尾换行的输出；check=False 时失败返回 None"""
+        try:
+            out = subprocess.run(
+                ["git", "-C", self.root, *args],
+                capture_output=True,
+                check=True,
+            ).stdout
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            if check:
+                raise
+            return None
+        return out.decode("utf-8", errors="replace").rstrip("\n")
+
+    def _git_bytes(self, *args) -> bytes:
+        return subprocess.run(["git", "-C", self.root, *args], capture_output=True, check=True).stdout
+
+    def _ls_tree(self, treeish: str, recursive: bool = True) -> List[Dict]:
+        """解析 git ls-tree 输出为 GitHub tree API 同构的条目列表"""
+        args = ["ls-tree", "-l", "-z"] + (["-r", "-t"] if recursive else []) + [treeish]
+        entries = []
+        for record in self._git_bytes(*args).split(b"\0"):
+            if not record:
+                continue
+            meta, _, path = record.decode("utf-8", errors="replace").partition("\t")
+            mode, kind, sha, size = meta.split()
+            item = {"path": path, "mode": mode, "type": kind, "sha": sha}
+            if kind == "blob":
+                item["size"] = int(size)
+            entries.append(item)
+        return entries
+
+    def _walk(self) -> List[Dict]:
+        """非 git 目录：遍历文件系统，blob 条目不带 SHA"""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS)
+            rel_dir = os.path.relpath(dirpath, self.root)
+            prefix = "" if rel_dir == "." else rel_dir.replace(os.sep, "/") + "/"
+            for d in dirnames:
+                entries.append({"path": prefix + d, "type": "tree", "sha": None})
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                if not os.path.isfile(full):
+                    continue
+                entries.append({
+                    "path": prefix + name,
+                    "type": "blob",
+                    "sha": None,
+                    "size": os.path.getsize(full),
+                })
+        return entries
+
+    def _remember(self, owner, repo, tree) -> PathIndex:
+        index = PathIndex.from_entries(tree)
+        self._indexes[(owner, repo)] = index
+        return index
+
+    def get_repo_tree(self, owner, repo):
+        tree = self.get_repo_tree_all(owner, repo)
+        return self._indexes[(owner, repo)].render()
+
+    def get_repo_tree_all(self, owner, repo, branch="main"):
+        """
+        返回扁平 tree 结构；branch 不存在时使用 HEAD
+        """
+        if not self.is_git:
+            tree = self._walk()
+        else:
+            ref = branch if self._git("rev-parse", "--verify", "-q", f"{branch}^{{commit}}", check=False) else "HEAD"
+            tree = self._ls_tree(ref)
+        self._remember(owner, repo, tree)
+        return tree
+
+    def get_commit(self, owner, repo, ref="HEAD"):
+        """
+        Returns:
+            {"sha": 提交 SHA, "tree_sha": 根 tree SHA, "committed_at": 提交时间（ISO 8601）}
+        """
+        if not self.is_git:
+            return {"sha": _NULL_SHA, "tree_sha": _NULL_SHA, "committed_at": self._latest_mtime()}
+        sha, tree_sha, committed_at = self._git("show", "-s", "--format=%H%n%T%n%cI", ref).splitlines()
+        return {"sha": sha, "tree_sha": tree_sha, "committed_at": committed_at}
+
+    def _latest_mtime(self) -> Optional[str]:
+        latest = max(
+            (
+                os.path.getmtime(os.path.join(dirpath, name))
+                for dirpath, dirnames, filenames in os.walk(self.root)
+                if not (set(os.path.relpath(dirpath, self.root).split(os.sep)) & _SKIP_DIRS)
+                for name in filenames
+            ),
+            default=None,
+        )
+        if latest is None:
+            return None
+        return datetime.fromtimestamp(latest, timezone.utc).isoformat()
+
+    def get_tree_recursive(self, owner, repo, tree_sha):
+        """
+        Returns:
+            {"tree": [...], "truncated": False}（本地读取不存在截断）
+        """
+        tree = self._ls_tree(tree_sha) if self.is_git else self._walk()
+        self._remember(owner, repo, tree)
+        return {"tree": tree, "truncated": False}
+
+    def get_tree_index(self, owner, repo, tree_sha):
+        """
+        Returns:
+            {"index": PathIndex, "truncated": False}
+        """
+        tree = self._ls_tree(tree_sha) if self.is_git else self._walk()
+        return {"index": self._remember(owner, repo, tree), "truncated": False}
+
+    def get_readme(self, owner, repo, ref=None):
+        """读取根目录 README（不限扩展名与大小写），不存在时返回空字符串"""
+        if self.is_git:
+            names = [item["path"] for item in self._ls_tree(ref or "HEAD", recursive=False)
+                     if item["type"] == "blob"]
+        else:
+            names = [n for n in os.listdir(self.root) if os.path.isfile(os.path.join(self.root, n))]
+        for name in sorted(names):
+            if name.lower().startswith("readme"):
+                return self.get_file_raw(owner, repo, name, ref=ref)
+        return ""
+
+    def get_file_raw(self, owner, repo, path, sha: Optional[str] = None, ref: Optional[str] = None):
+        """
+        读取文件内容
+        普通目录直接读磁盘（大文件走 mmap）；git 仓库的内容必须与提交中的 blob SHA 一致，
+        工作区文件未修改时直接读磁盘，已修改（或裸仓库、工作区缺失）时读取 git 对象
+        """
+        full = None if self.bare else os.path.join(self.root, *path.split("/"))
+        if not self.is_git:
+            if not os.path.isfile(full):
+                raise FileNotFoundError(f"文件不存在: {path}")
+            return self._read_file(full)
+
+        index = self._indexes.get((owner, repo))
+        sha = sha or (index.sha(path) if index is not None else None)
+        if sha and full and os.path.isfile(full):
+            content = self._read_file(full, sha)
+            if content is not None:
+                return content
+        obj = sha or f"{ref or 'HEAD'}:{path}"
+        return self._git_bytes("cat-file", "blob", obj).decode("utf-8")
+
+    @staticmethod
+    def _read_file(full: str, sha: Optional[str] = None) -> Optional[str]:
+        """
+        读取磁盘文件；给出 sha 时先校验内容的 blob SHA，不一致（工作区有未提交的修改）返回 None
+        大文件直接在内存映射上计算哈希与解码，不再拷贝出一份 bytes
+        """
+        with open(full, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _MMAP_THRESHOLD:
+                data = f.read()
+                if sha and git_blob_sha(data) != sha:
+                    return None
+                return data.decode("utf-8")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if sha and git_blob_sha(mapped) != sha:
+                    return None
+                return str(mapped, "utf-8")
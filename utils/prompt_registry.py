@@ -0,0 +1,97 @@
+"""
+提示词模板注册表
+启动时一次性加载并编译 prompts/ 目录下的全部 YAML 模板，之后直接复用编译结果；
+可选按文件修改时间热加载。模板目录按模块位置解析，与当前工作目录无关
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+from jinja2 import Template
+
+from configs.env_config import EnvConfig
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+
+class PromptRegistry:
+    """按 (文件名, 角色) 索引的已编译模板集合，线程安全"""
+
+    def __init__(self, prompts_dir: Optional[str] = None, hot_reload: Optional[bool] = None,
+                 check_interval: float = 2.0):
+        self.prompts_dir = prompts_dir or PROMPTS_DIR
+        self.hot_reload = EnvConfig.get_prompt_hot_reload() if hot_reload is None else hot_reload
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # name -> {role: {"system": str, "user": Template, "version": str}}
+        self._prompts: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._loaded = False
+        self._last_check = 0.0
+
+    def _compile_file(self, path: str) -> Dict[str, Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+
+        compiled = {}
+        for role, spec in data.items():
+            system = spec.get("system", "")
+            user = spec.get("user", "")
+            compiled[role] = {
+                "system": system,
+                "user": Template(user),
+                "version": hashlib.sha256((system + "\0" + user).encode("utf-8")).hexdigest()[:12],
+            }
+        return compiled
+
+    def _scan_locked(self):
+        """加载新增或已修改的模板文件，调用方需持有锁"""
+        for filename in sorted(os.listdir(self.prompts_dir)):
+            if not filename.endswith((".yaml", ".yml")):
+                continue
+            path = os.path.join(self.prompts_dir, filename)
+            mtime = os.path.getmtime(path)
+            name = os.path.splitext(filename)[0]
+            if self._mtimes.get(name) == mtime:
+                continue
+            self._prompts[name] = self._compile_file(path)
+            self._mtimes[name] = mtime
+        self._loaded = True
+        self._last_check = time.time()
+
+    def _ensure_loaded(self):
+        if self._loaded and not (
+            self.hot_reload and time.time() - self._last_check >= self.check_interval
+        ):
+            return
+        with self._lock:
+            if not self._loaded or self.hot_reload:
+                self._scan_locked()
+
+    def _entry(self, name: str, role: str) -> Dict[str, Any]:
+        self._ensure_loaded()
+        try:
+            return self._prompts[name][role]
+        except KeyError:
+            raise KeyError(f"未找到提示词模板 {name}.yaml 中的角色 {role}") from None
+
+    def get(self, name: str, role: str) -> Tuple[str, Template]:
+        """返回 (system 提示词, 已编译的 user 模板)"""
+        entry = self._entry(name, role)
+        return entry["system"], entry["user"]
+
+    def render(self, name: str, role: str, **kwargs) -> Tuple[str, str]:
+        """渲染 user 模板，返回 (system 提示词, user 提示词)"""
+        system, user = self.get(name, role)
+        return system, user.render(**kwargs)
+
+    def version(self, name: str, role: str) -> str:
+        """返回模板内容的短哈希，模板修改后随之变化"""
+        return self._entry(name, role)["version"]
+
+
+# 全局提示词注册表实例
+prompt_registry = PromptRegistry()
@@ -0,0 +1,257 @@
+"""
+GitHub 配额调度
+按 (token, 资源) 分别跟踪 X-RateLimit-Remaining / Reset（core、search、graphql 互相独立），
+用令牌桶把剩余配额均匀摊到重置前的时间窗内；遇到二级限流的 Retry-After 时暂停对应 token。
+条件请求返回 304 时 GitHub 不扣配额，本地预扣的配额随之退回。
+配置多个 token 时，每次请求自动选用当前最宽裕的 token
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from configs.env_config import EnvConfig
+
+# 未收到响应头之前使用的默认配额：(次数, 时间窗秒数)
+_DEFAULT_LIMITS = {
+    "core": (5000, 3600),
+    "search": (30, 60),
+    "graphql": (5000, 3600),
+}
+
+# 二级限流未给出 Retry-After 时的等待时间（GitHub 文档建议至少 1 分钟）
+_SECONDARY_LIMIT_WAIT = 60.0
+
+
+def classify_resource(url: str) -> str:
+    """按 URL 判断请求消耗的配额类别"""
+    path = urlparse(url).path
+    if path.endswith("/graphql"):
+        return "graphql"
+    if path.startswith("/search/") or "/search/" in path:
+        return "search"
+    return "core"
+
+
+def token_label(token: Optional[str]) -> str:
+    """用于日志与统计的 token 标识，不暴露 token 本身"""
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:8]
+
+
+class TokenBucket:
+    """单个 (token, 资源) 的配额状态，调用方需持有 GitHubRateLimiter 的锁"""
+
+    def __init__(self, resource: str, burst: int, reserve_ratio: float):
+        self.limit, self.window = _DEFAULT_LIMITS.get(resource, _DEFAULT_LIMITS["core"])
+        self.burst = burst
+        self.reserve_ratio = reserve_ratio
+        now = time.time()
+        self.remaining = self.limit
+        self.reset_at = now + self.window
+        self.tokens = self._capacity()
+        self.refilled_at = now
+        self.blocked_until = 0.0
+        # 已预扣配额、尚未收到响应的请求数
+        self.in_flight = 0
+
+    @property
+    def reserve(self) -> int:
+        return max(1, int(self.limit * self.reserve_ratio))
+
+    def _capacity(self) -> float:
+        """
+        桶容量：配额充足时允许消耗剩余配额的 10% 作为突发，
+        接近耗尽时收紧到 burst，剩余请求按速率均匀发出
+        """
+        budget = max(self.remaining - self.reserve, 0)
+        return float(max(self.burst, budget // 10))
+
+    def _rate(self, now: float) -> float:
+        """把剩余可用配额均摊到重置前的时间窗内（次/秒）"""
+        budget = max(self.remaining - self.reserve, 0)
+        return budget / max(self.reset_at - now, 1.0)
+
+    def _refill(self, now: float):
+        if now >= self.reset_at:
+            # 时间窗已滚动：在收到新的响应头之前按默认窗口估计
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+            self.tokens = self._capacity()
+        self.tokens = min(self._capacity(), self.tokens + (now - self.refilled_at) * self._rate(now))
+        self.refilled_at = now
+
+    def wait_time(self, now: float) -> float:
+        """距离可以发出下一个请求还需等待的秒数"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.remaining <= self.reserve:
+            return max(self.reset_at - now, 0.0) + 1.0
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / max(self._rate(now), 1e-6)
+
+    def take(self):
+        self.tokens -= 1
+        self.remaining -= 1
+        self.in_flight += 1
+
+    def finish(self, charged: bool = True):
+        """请求结束；未被计费（如 304）时退回预扣的配额"""
+        self.in_flight = max(0, self.in_flight - 1)
+        if not charged:
+            self.remaining = min(self.limit, self.remaining + 1)
+            self.tokens = min(self._capacity(), self.tokens + 1)
+
+    def update(self, limit: int, remaining: int, reset_at: float):
+        # 服务端的剩余配额已包含所有已完成的请求，再扣除仍在途的请求；
+        # 没有在途请求时即以服务端为准，本地多扣的部分随之恢复
+        self.limit = limit
+        self.remaining = remaining - self.in_flight
+        self.reset_at = reset_at
+
+
+class GitHubRateLimiter:
+    """进程级 GitHub 配额调度器，线程安全"""
+
+    def __init__(
+        self,
+        tokens: Optional[List[str]] = None,
+        burst: Optional[int] = None,
+        reserve_ratio: Optional[float] = None,
+    ):
+        self.tokens = tokens if tokens is not None else EnvConfig.get_github_tokens()
+        self.burst = burst or EnvConfig.get_github_rate_burst()
+        self.reserve_ratio = reserve_ratio if reserve_ratio is not None else EnvConfig.get_github_rate_reserve()
+        self._cond = threading.Condition()
+        self._buckets: Dict[Tuple[Optional[str], str], TokenBucket] = {}
+        self.stats = {"throttled": 0, "waited_seconds": 0.0, "rate_limited": 0}
+
+    def _bucket(self, token: Optional[str], resource: str) -> TokenBucket:
+        key = (token, resource)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(resource, self.burst, self.reserve_ratio)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _candidates(self, token: Optional[str]) -> List[Optional[str]]:
+        # 调用方的 token 属于 token 池（或未配置池）时，允许在池内轮换
+        if len(self.tokens) > 1 and (token is None or token in self.tokens):
+            return list(self.tokens)
+        return [token]
+
+    def acquire(self, resource: str, token: Optional[str] = None) -> Optional[str]:
+        """
+        阻塞直到某个 token 在该资源上有可用配额
+        Returns:
+            实际应使用的 token
+        """
+        waited = 0.0
+        with self._cond:
+            while True:
+                now = time.time()
+                best, best_wait = None, None
+                for candidate in self._candidates(token):
+                    bucket = self._bucket(candidate, resource)
+                    wait = bucket.wait_time(now)
+                    if (
+                        best_wait is None
+                        or wait < best_wait
+                        or (wait == best_wait and bucket.remaining > self._bucket(best, resource).remaining)
+                    ):
+                        best, best_wait = candidate, wait
+                if best_wait <= 0:
+                    self._bucket(best, resource).take()
+                    if waited:
+                        self.stats["throttled"] += 1
+                        self.stats["waited_seconds"] += waited
+                    return best
+                self._cond.wait(best_wait)
+                waited += time.time() - now
+
+    def release(self, resource: str, token: Optional[str] = None):
+        """请求未收到响应（连接失败等）时结束在途计数；请求可能已到达服务端，预扣的配额不退回"""
+        with self._cond:
+            self._bucket(token, resource).finish()
+
+    def update(self, token: Optional[str], resource: str, response) -> bool:
+        """
+        根据响应头更新配额；resource 为 acquire 时的资源类别
+        Returns:
+            该响应是否为限流拒绝（调用方应重试）
+        """
+        headers = response.headers
+        now = time.time()
+        limited = False
+        with self._cond:
+            # 304 不计入配额（GitHub 对条件请求命中不计费）
+            self._bucket(token, resource).finish(charged=response.status_code != 304)
+            resource = headers.get("X-RateLimit-Resource", resource)
+            if resource not in _DEFAULT_LIMITS:
+                resource = classify_resource(response.url or "")
+            bucket = self._bucket(token, resource)
+            try:
+                bucket.update(
+                    int(headers["X-RateLimit-Limit"]),
+                    int(headers["X-RateLimit-Remaining"]),
+                    float(headers["X-RateLimit-Reset"]),
+                )
+            except (KeyError, ValueError):
+                pass
+
+            if response.status_code in (403, 429):
+                retry_after = headers.get("Retry-After")
+                if retry_after is not None:
+                    # 二级限流：暂停该 token 的全部资源
+                    until = now + float(retry_after)
+                    for (t, _), b in self._buckets.items():
+                        if t == token:
+                            b.blocked_until = max(b.blocked_until, until)
+                    limited = True
+                elif headers.get("X-RateLimit-Remaining") == "0":
+                    bucket.blocked_until = max(bucket.blocked_until, bucket.reset_at + 1)
+                    limited = True
+                elif "rate limit" in response.text.lower():
+                    bucket.blocked_until = max(bucket.blocked_until, now + _SECONDARY_LIMIT_WAIT)
+                    limited = True
+            if limited:
+                self.stats["rate_limited"] += 1
+                print(
+                    f"⚠️ GitHub 限流（token {token_label(token)} / {resource}），"
+                    f"暂停至 {time.strftime('%H:%M:%S', time.localtime(bucket.blocked_until or now))}"
+                )
+            self._cond.notify_all()
+        return limited
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各 token 在各资源上的剩余配额（token 以哈希标识）"""
+        with self._cond:
+            result: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for (token, resource), bucket in self._buckets.items():
+                result.setdefault(token_label(token), {})[resource] = {
+                    "limit": bucket.limit,
+                    "remaining": bucket.remaining,
+                    "reset_at": int(bucket.reset_at),
+                }
+            stats = dict(self.stats)
+        stats["waited_seconds"] = round(stats["waited_seconds"], 2)
+        return {"buckets": result, **stats}
+
+
+_limiter: Optional[GitHubRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[GitHubRateLimiter]:
+    """获取进程级共享的配额调度器；通过 GITHUB_RATE_LIMIT_ENABLED=0 关闭"""
+    global _limiter
+    if not EnvConfig.get_github_rate_limit_enabled():
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = GitHubRateLimiter()
+        return _limiter
@@ -0,0 +1,76 @@
+"""
+仓库快照
+一次运行只解析一次仓库：固定到某个提交 SHA，缓存文件索引（目录树文本按需渲染）与 README，
+Scanner / Strategist / Auditor 共享同一份快照，保证所有阶段读取的是同一版本
+"""
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from utils.telemetry import telemetry
+from utils.tree_index import PathIndex
+
+
+@dataclass
+class RepoSnapshot:
+    owner: str
+    repo: str
+    commit_sha: str
+    tree_sha: str
+    committed_at: Optional[str] = None
+    index: PathIndex = field(default_factory=PathIndex, repr=False)
+    readme: str = ""
+    truncated: bool = False
+
+    @classmethod
+    @telemetry.traced("resolve_snapshot")
+    def resolve(cls, reader, owner: str, repo: str, ref: str = "HEAD") -> "RepoSnapshot":
+        """
+        解析仓库快照：提交、递归 tree、README 共 3 次请求（递归 tree 被截断时按子树补齐）
+        Args:
+            reader: GitHubReader 兼容的读取器
+            ref: 分支名、tag 或 HEAD（默认分支）
+        """
+        commit = reader.get_commit(owner, repo, ref)
+        tree_data = reader.get_tree_index(owner, repo, commit["tree_sha"])
+        return cls(
+            owner=owner,
+            repo=repo,
+            commit_sha=commit["sha"],
+            tree_sha=commit["tree_sha"],
+            committed_at=commit.get("committed_at"),
+            index=tree_data["index"],
+            readme=reader.get_readme(owner, repo, commit["sha"]),
+            truncated=tree_data.get("truncated", False),
+        )
+
+    @property
+    def tree(self) -> List[Dict[str, Any]]:
+        """扁平 blob 条目（与 GitHub tree API 同构），每次访问时由索引生成"""
+        return list(self.index.entries())
+
+    @property
+    def tree_text(self) -> str:
+        """渲染后的目录树文本，首次访问时生成"""
+        if not hasattr(self, "_tree_text"):
+            self._tree_text = self.index.render()
+        return self._tree_text
+
+    def blob_sha(self, path: str) -> Optional[str]:
+        return self.index.sha(path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为可 JSON 序列化的字典（用于 LangGraph 状态持久化）；文件索引以紧凑形式保存"""
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data["index"] = self.index.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RepoSnapshot":
+        data = dict(data)
+        data.pop("tree_text", None)
+        if "tree" in data:
+            # 兼容旧版状态：扁平 tree 列表
+            data["index"] = PathIndex.from_entries(data.pop("tree"))
+        else:
+            data["index"] = PathIndex.from_dict(data.get("index") or {})
+        return cls(**data)
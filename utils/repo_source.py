@@ -0,0 +1,57 @@
+"""
+仓库来源解析
+统一处理 GitHub URL、file:// URL 与本地路径，并据此选择对应的读取器
+"""
+import os
+from urllib.parse import unquote, urlparse
+
+from utils.github_reader import GitHubReader
+from utils.local_reader import LocalRepoReader
+
+
+def is_local_repo(url: str) -> bool:
+    """file:// URL 或不带 http(s) 协议的路径都视为本地仓库"""
+    return not url.startswith(("https://", "http://"))
+
+
+def local_repo_path(url: str) -> str:
+    if url.startswith("file://"):
+        return unquote(urlparse(url).path)
+    return os.path.expanduser(url)
+
+
+def parse_github_url(url: str):
+    """Parse GitHub repository URL with validity checks"""
+    url = url.rstrip("/")
+    if not url.startswith(("https://github.com/", "http://github.com/")):
+        raise ValueError("Only GitHub repository URLs are supported (e.g. https://github.com/owner/repo)")
+
+    parts = url.split("/")
+    if len(parts) < 5:
+        raise ValueError(f"Invalid GitHub repository URL: {url}")
+
+    owner, repo = parts[-2], parts[-1]
+    if not owner or not repo:
+        raise ValueError(f"Failed to parse owner/repo from: {url}")
+    return owner, repo
+
+
+def parse_repo_url(url: str):
+    """
+    解析 (owner, repo)
+    本地仓库取上级目录名与目录名，裸仓库的 .git 后缀会被去掉，如 /mirrors/org/proj.git -> (org, proj)
+    """
+    if not is_local_repo(url):
+        return parse_github_url(url)
+    path = os.path.abspath(local_repo_path(url)).rstrip(os.sep)
+    parent, name = os.path.split(path)
+    if name.endswith(".git"):
+        name = name[:-4]
+    return os.path.basename(parent) or "local", name
+
+
+def open_reader(url: str, github_token=None):
+    """按仓库来源返回 LocalRepoReader 或 GitHubReader"""
+    if is_local_repo(url):
+        return LocalRepoReader(local_repo_path(url))
+    return GitHubReader(github_token)
@@ -0,0 +1,66 @@
+"""
+进程级并发调度器
+按资源类别（github / llm）分别限制同时在途的请求数，
+批量审计多个仓库时所有仓库共享同一组配额
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from configs.env_config import EnvConfig
+
+
+class ConcurrencyScheduler:
+    """按名称管理的并发槽位"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limits: Dict[str, int] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+    def _default_limit(self, name: str) -> int:
+        defaults = {
+            "github": EnvConfig.get_github_concurrency,
+            "llm": EnvConfig.get_llm_concurrency,
+        }
+        getter = defaults.get(name)
+        return getter() if getter else 8
+
+    def configure(self, **limits: Optional[int]):
+        """
+        设置各类别的并发上限，例如 configure(github=16, llm=8)
+        值为 None 的类别保持不变；需在请求开始前调用
+        """
+        with self._lock:
+            for name, limit in limits.items():
+                if limit is None:
+                    continue
+                self._limits[name] = max(1, int(limit))
+                self._semaphores[name] = threading.BoundedSemaphore(self._limits[name])
+
+    def _semaphore(self, name: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(name)
+            if sem is None:
+                self._limits[name] = self._default_limit(name)
+                sem = threading.BoundedSemaphore(self._limits[name])
+                self._semaphores[name] = sem
+            return sem
+
+    @contextmanager
+    def slot(self, name: str):
+        """占用一个并发槽位，离开上下文时释放"""
+        sem = self._semaphore(name)
+        sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
+
+    def limits(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._limits)
+
+
+# 全局调度器实例
+scheduler = ConcurrencyScheduler()
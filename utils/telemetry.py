@@ -0,0 +1,275 @@
+"""
+运行遥测
+用 contextvars 跟踪当前所在的阶段 span（analyze_repo / create_audit_plan / _audit_single_file /
+generate_final_report 等），每次外部调用（GitHub HTTP、LLM）记录耗时，并把请求数、字节数、token、
+重试与缓存命中累加到当前 span 及其全部上级 span；运行结束时写出 JSON 运行清单与 Prometheus textfile
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from configs.env_config import EnvConfig
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("telemetry_span", default=None)
+
+# Prometheus 指标名前缀
+_METRIC_PREFIX = "duediligai"
+
+
+class Span:
+    """一个阶段的耗时与计数；counters 包含其所有下级 span 与外部调用的累计值"""
+
+    __slots__ = ("id", "name", "attrs", "parent", "started", "finished", "counters")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional["Span"]):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.counters: Dict[str, float] = {}
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self, run_started: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "parent_id": self.parent.id if self.parent else None,
+            "name": self.name,
+            "attrs": self.attrs,
+            "start_offset_seconds": round(self.started - run_started, 3),
+            "seconds": round(self.seconds, 3),
+            "counters": _rounded(self.counters),
+        }
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    把调用方当前的 span 上下文绑定到 fn，用于提交到线程池的任务
+    （线程池中的线程不会继承 contextvars）；每次调用使用独立的上下文副本，可被多个线程并发执行
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+class Telemetry:
+    """进程级遥测记录器，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """开始新的一次运行（清空已记录的数据）"""
+        with self._lock:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.started_at = time.time()
+            self._spans: List[Span] = []
+            self._totals: Dict[str, float] = {}
+            # (kind, target) -> {"count", "errors", "seconds", "max_seconds", 及各计数}
+            self._calls: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return EnvConfig.get_telemetry_enabled()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """记录一个阶段；嵌套使用时自动挂到当前 span 之下"""
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, attrs, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finished = time.time()
+            with self._lock:
+                self._spans.append(span)
+
+    def traced(self, name: str):
+        """装饰器形式的 span"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def incr(self, **counters: float):
+        """累加计数到当前 span 链与本次运行总计"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._add_locked(counters)
+
+    def _add_locked(self, counters: Dict[str, float]):
+        span = _current_span.get()
+        while span is not None:
+            for key, value in counters.items():
+                span.counters[key] = span.counters.get(key, 0) + value
+            span = span.parent
+        for key, value in counters.items():
+            self._totals[key] = self._totals.get(key, 0) + value
+
+    def record_call(self, kind: str, target: str, seconds: float, error: bool = False, **counters: float):
+        """
+        记录一次外部调用
+        Args:
+            kind: "http" 或 "llm"
+            target: GitHub 配额资源（core / search / graphql）或模型配置名
+            counters: 本次调用的计数，如 http_bytes、prompt_tokens
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            call = self._calls.setdefault(
+                (kind, target), {"count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0}
+            )
+            call["count"] += 1
+            call["errors"] += int(error)
+            call["seconds"] += seconds
+            call["max_seconds"] = max(call["max_seconds"], seconds)
+            for key, value in counters.items():
+                call[key] = call.get(key, 0) + value
+            self._add_locked(dict(counters, **{f"{kind}_seconds": seconds}))
+
+    def manifest(self, **extra) -> Dict[str, Any]:
+        """本次运行的结构化清单"""
+        now = time.time()
+        with self._lock:
+            spans = list(self._spans)
+            totals = dict(self._totals)
+            calls = {key: dict(value) for key, value in self._calls.items()}
+
+        stages: Dict[str, Dict[str, float]] = {}
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += span.seconds
+            stage["max_seconds"] = max(stage["max_seconds"], span.seconds)
+
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "finished_at": now,
+            "wall_seconds": round(now - self.started_at, 3),
+            **extra,
+            "totals": _rounded(totals),
+            "stages": {name: _rounded(s) for name, s in stages.items()},
+            "calls": {f"{kind}:{target}": _rounded(c) for (kind, target), c in calls.items()},
+            "spans": [s.to_dict(self.started_at) for s in sorted(spans, key=lambda s: s.started)],
+        }
+
+    def write_manifest(self, path: Optional[str] = None, **extra) -> Optional[str]:
+        """写出 JSON 运行清单；路径为空时不写出"""
+        path = EnvConfig.get_telemetry_manifest_path() if path is None else path
+        if not path or not self.enabled:
+            return None
+        _atomic_write(path, json.dumps(self.manifest(**extra), ensure_ascii=False, indent=2))
+        return path
+
+    def prometheus_text(self) -> str:
+        """Prometheus 文本格式（供 node_exporter textfile collector 采集）"""
+        manifest = self.manifest()
+        lines: List[str] = []
+
+        def metric(name, kind, help_text, samples):
+            full = f"{_METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{full}{suffix}{_labels(labels)} {value}")
+
+        metric("run_wall_seconds", "gauge", "Wall time of the last run.",
+               [("", {}, manifest["wall_seconds"])])
+        metric("stage_seconds", "summary", "Time spent per pipeline stage.", [
+            sample
+            for stage, s in manifest["stages"].items()
+            for sample in (("_sum", {"stage": stage}, s["seconds"]), ("_count", {"stage": stage}, s["count"]))
+        ])
+        calls = [(key.split(":", 1), c) for key, c in manifest["calls"].items()]
+        metric("call_seconds", "summary", "Outbound call latency by kind and target.", [
+            sample
+            for (kind, target), c in calls
+            for sample in (
+                ("_sum", {"kind": kind, "target": target}, c["seconds"]),
+                ("_count", {"kind": kind, "target": target}, c["count"]),
+            )
+        ])
+        metric("call_errors_total", "counter", "Failed outbound calls by kind and target.",
+               [("", {"kind": kind, "target": target}, c["errors"]) for (kind, target), c in calls])
+        metric("http_bytes_total", "counter", "Response bytes received from GitHub by resource.",
+               [("", {"resource": target}, c.get("http_bytes", 0)) for (kind, target), c in calls if kind == "http"])
+        metric("llm_tokens_total", "counter", "LLM tokens by model and type.", [
+            ("", {"model": target, "type": token_type}, c.get(f"{token_type}_tokens", 0))
+            for (kind, target), c in calls if kind == "llm"
+            for token_type in ("prompt", "completion")
+        ])
+        metric("llm_cost_usd_total", "counter", "Estimated LLM spend in USD by model.",
+               [("", {"model": target}, c.get("cost_usd", 0)) for (kind, target), c in calls if kind == "llm"])
+        metric("events_total", "counter", "Run totals (requests, retries, cache hits, ...).", [
+            ("", {"event": key}, value)
+            for key, value in sorted(manifest["totals"].items()) if not key.endswith(("_seconds", "_usd"))
+        ])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = None) -> Optional[str]:
+        """写出 Prometheus textfile；路径为空时不写出"""
+        path = EnvConfig.get_telemetry_prom_path() if path is None else path
+        if not path or not self.enabled:
+            return None
+        _atomic_write(path, self.prometheus_text())
+        return path
+
+
+def _rounded(values: Dict[str, Any]) -> Dict[str, Any]:
+    """秒数保留 3 位小数；费用（*_usd）单次调用往往不足 0.001 美元，保留 6 位"""
+    return {
+        k: round(v, 6 if k.endswith("_usd") else 3) if isinstance(v, float) else v
+        for k, v in values.items()
+    }
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _atomic_write(path: str, text: str):
+    """先写临时文件再替换，采集方不会读到写了一半的文件"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# 全局遥测记录器
+telemetry = Telemetry()
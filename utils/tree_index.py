@@ -0,0 +1,407 @@
+"""
+仓库文件索引
+大型 monorepo 的 tree 可达数十万个文件：每个目录路径只存一份（文件按目录 id 引用），
+文件名按目录分组存放，blob SHA 与大小用紧凑数组保存；目录树文本按需以迭代方式渲染，
+内存与耗时都随文件数线性增长，也不会因目录层级过深而触发递归上限
+"""
+import sys
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from utils.chunker import CHARS_PER_TOKEN
+
+_INDENT = "    "
+# 折叠行中最多列出的扩展名个数
+_SUMMARY_EXTENSIONS = 3
+# 超出预算时每个目录至少列出的文件数，不足时改为折叠更深的目录
+_MIN_LISTED_FILES = 5
+# "... (另有 N 个文件)" 一行的字符数（不含缩进）上界
+_MORE_LINE_CHARS = 32
+
+
+class PathIndex:
+    """
+    仓库中全部文件（blob）的紧凑索引，保持加入时的顺序
+    （GitHub tree 与 git ls-tree 的顺序即目录树的展示顺序）
+    """
+
+    __slots__ = ("_dirs", "_dir_ids", "_dir_names", "_dir_parents", "_children",
+                 "_file_dirs", "_names", "_shas", "_sizes", "_by_dir")
+
+    def __init__(self):
+        # 目录 id -> 完整路径（不含结尾 /）、最后一级目录名与上级目录 id；0 为仓库根目录
+        self._dirs: List[str] = [""]
+        self._dir_ids: Dict[str, int] = {"": 0}
+        self._dir_names: List[str] = [""]
+        self._dir_parents = array("i", [-1])
+        # 目录 id -> 子项（按首次出现顺序）：文件编码为 2 * 文件序号，子目录编码为 2 * 目录 id + 1
+        self._children: List[array] = [array("i")]
+        self._file_dirs = array("i")
+        self._names: List[str] = []
+        self._shas: List[Optional[str]] = []
+        self._sizes = array("q")
+        # 目录 id -> {文件名: 文件序号}，首次按路径查找时建立
+        self._by_dir: Optional[Dict[int, Dict[str, int]]] = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict[str, Any]], prefix: str = "") -> "PathIndex":
+        """由 GitHub API / ls-tree 的扁平条目建立索引（只收录 blob）；prefix 为子树所在目录"""
+        index = cls()
+        index.add_entries(entries, prefix)
+        return index
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[str]) -> "PathIndex":
+        index = cls()
+        for path in paths:
+            index.add(path)
+        return index
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]], prefix: str = ""):
+        for item in entries:
+            if item.get("type") == "blob":
+                self.add(prefix + item["path"], item.get("sha"), item.get("size"))
+
+    def _dir_id(self, dirpath: str) -> int:
+        dir_id = self._dir_ids.get(dirpath)
+        if dir_id is not None:
+            return dir_id
+        # 向上找到已存在的最近一级目录，再自上而下补齐缺失的各级目录
+        missing = []
+        while dirpath and dirpath not in self._dir_ids:
+            missing.append(dirpath)
+            dirpath = dirpath.rpartition("/")[0]
+        parent = self._dir_ids[dirpath]
+        for path in reversed(missing):
+            dir_id = len(self._dirs)
+            path = sys.intern(path)
+            self._dirs.append(path)
+            self._dir_ids[path] = dir_id
+            self._dir_names.append(sys.intern(path.rpartition("/")[2]))
+            self._dir_parents.append(parent)
+            self._children.append(array("i"))
+            self._children[parent].append(2 * dir_id + 1)
+            parent = dir_id
+        return parent
+
+    def add(self, path: str, sha: Optional[str] = None, size: Optional[int] = None):
+        dirpath, _, name = path.rpartition("/")
+        dir_id = self._dir_id(dirpath) if dirpath else 0
+        file_id = len(self._names)
+        self._file_dirs.append(dir_id)
+        # 同名文件（__init__.py、README.md 等）在各目录间共享同一个字符串
+        self._names.append(sys.intern(name))
+        self._shas.append(sha)
+        self._sizes.append(size if size is not None else -1)
+        self._children[dir_id].append(2 * file_id)
+        self._by_dir = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, path: str) -> bool:
+        return self._lookup(path) is not None
+
+    @property
+    def dir_count(self) -> int:
+        return len(self._dirs) - 1
+
+    def _path(self, file_id: int) -> str:
+        dirpath = self._dirs[self._file_dirs[file_id]]
+        return f"{dirpath}/{self._names[file_id]}" if dirpath else self._names[file_id]
+
+    def _lookup(self, path: str) -> Optional[int]:
+        if self._by_dir is None:
+            by_dir: Dict[int, Dict[str, int]] = {}
+            for file_id, dir_id in enumerate(self._file_dirs):
+                by_dir.setdefault(dir_id, {})[self._names[file_id]] = file_id
+            self._by_dir = by_dir
+        dirpath, _, name = path.rpartition("/")
+        dir_id = self._dir_ids.get(dirpath)
+        if dir_id is None:
+            return None
+        return self._by_dir.get(dir_id, {}).get(name)
+
+    def sha(self, path: str) -> Optional[str]:
+        file_id = self._lookup(path)
+        return self._shas[file_id] if file_id is not None else None
+
+    def paths(self) -> Iterator[str]:
+        for file_id in range(len(self._names)):
+            yield self._path(file_id)
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """按需生成与 GitHub API 相同形式的 blob 条目"""
+        for file_id in range(len(self._names)):
+            entry = {"path": self._path(file_id), "type": "blob", "sha": self._shas[file_id]}
+            if self._sizes[file_id] >= 0:
+                entry["size"] = self._sizes[file_id]
+            yield entry
+
+    def render(self) -> str:
+        """渲染为树状缩进文本（目录以 / 结尾），以显式栈迭代遍历"""
+        lines: List[str] = []
+        # 栈中每层为 (目录 id, 下一个待输出的子项位置)
+        stack = [[0, 0]]
+        while stack:
+            frame = stack[-1]
+            children = self._children[frame[0]]
+            if frame[1] >= len(children):
+                stack.pop()
+                continue
+            child = children[frame[1]]
+            frame[1] += 1
+            indent = _INDENT * (len(stack) - 1)
+            if child & 1:
+                dir_id = child >> 1
+                lines.append(f"{indent}{self._dir_names[dir_id]}/")
+                stack.append([dir_id, 0])
+            else:
+                lines.append(indent + self._names[child >> 1])
+        return "\n".join(lines)
+
+    def summarize(
+        self,
+        max_tokens: int = 0,
+        keep_file: Optional[Callable[[str], bool]] = None,
+        skip_dir: Optional[Callable[[str], bool]] = None,
+        collapse_dir: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        渲染受 token 预算约束的精简目录树
+        1. 只保留 keep_file(文件名) 为真的文件，跳过 skip_dir(目录名) 为真的整个目录，并剪掉因此变空的目录
+        2. collapse_dir(目录名) 为真的目录（测试、示例等）折叠为一行，如 "tests/ (412 个 .py 文件)"
+        3. 仍超出 max_tokens 时，限制每个目录列出的文件数（按文件大小保留前若干个，其余合并为一行）；
+           能列出的文件少于 _MIN_LISTED_FILES 个时，自深向浅逐层折叠目录（同一深度先折叠文件类型单一的目录，
+           再按占用从大到小），直到满足预算或每个目录能列出足够的文件；最后按行截断兜底
+        max_tokens 为 0 表示不限
+        """
+        dir_count = len(self._dirs)
+        # 目录按自上而下的顺序编号（上级目录 id 总是更小），正序遍历即可自顶向下传递，倒序则自底向上汇总
+        skipped = bytearray(dir_count)
+        depth = array("i", [0]) * dir_count
+        for dir_id in range(1, dir_count):
+            parent = self._dir_parents[dir_id]
+            depth[dir_id] = depth[parent] + 1
+            skipped[dir_id] = skipped[parent] or bool(skip_dir and skip_dir(self._dir_names[dir_id]))
+
+        kept = bytearray(len(self._names))
+        subtree_files = array("q", [0]) * dir_count
+        for file_id, dir_id in enumerate(self._file_dirs):
+            if not skipped[dir_id] and (keep_file is None or keep_file(self._names[file_id])):
+                kept[file_id] = 1
+                subtree_files[dir_id] += 1
+
+        # 每个目录（含子树）渲染后的字符数；文件行 = 缩进 + 文件名 + 换行
+        cost = array("q", [0]) * dir_count
+        for file_id, dir_id in enumerate(self._file_dirs):
+            if kept[file_id]:
+                cost[dir_id] += len(_INDENT) * depth[dir_id] + len(self._names[file_id]) + 1
+        for dir_id in range(dir_count - 1, 0, -1):
+            if subtree_files[dir_id]:
+                parent = self._dir_parents[dir_id]
+                cost[dir_id] += len(_INDENT) * (depth[dir_id] - 1) + len(self._dir_names[dir_id]) + 2
+                cost[parent] += cost[dir_id]
+                subtree_files[parent] += subtree_files[dir_id]
+
+        summaries: Dict[int, str] = {}
+
+        def collapse(dir_id: int) -> int:
+            """折叠目录，返回节省的字符数"""
+            line = f"{_INDENT * (depth[dir_id] - 1)}{self._dir_names[dir_id]}/ ({self._describe(dir_id, kept)})"
+            summaries[dir_id] = line
+            saved = cost[dir_id] - len(line) - 1
+            ancestor = dir_id
+            while ancestor > 0:
+                ancestor = self._dir_parents[ancestor]
+                cost[ancestor] -= saved
+            cost[dir_id] = len(line) + 1
+            return saved
+
+        def hidden(dir_id: int) -> bool:
+            ancestor = self._dir_parents[dir_id]
+            while ancestor > 0:
+                if ancestor in summaries:
+                    return True
+                ancestor = self._dir_parents[ancestor]
+            return False
+
+        if collapse_dir is not None:
+            for dir_id in range(1, dir_count):
+                if subtree_files[dir_id] and collapse_dir(self._dir_names[dir_id]) and not hidden(dir_id):
+                    collapse(dir_id)
+
+        budget = max_tokens * CHARS_PER_TOKEN
+        file_cap = None
+        if budget and cost[0] > budget:
+            file_cap = self._file_cap(budget, kept, depth, subtree_files, summaries)
+            levels: Dict[int, List[int]] = {}
+            for d in range(1, dir_count):
+                if subtree_files[d] and d not in summaries and not hidden(d):
+                    levels.setdefault(depth[d], []).append(d)
+            for level in sorted(levels, reverse=True):
+                if file_cap >= _MIN_LISTED_FILES:
+                    break
+                for dir_id in sorted(levels[level], key=lambda d: (not self._is_uniform(d, kept), -cost[d])):
+                    if cost[0] <= budget:
+                        break
+                    if not hidden(dir_id):
+                        collapse(dir_id)
+                if cost[0] <= budget:
+                    file_cap = None
+                    break
+                file_cap = self._file_cap(budget, kept, depth, subtree_files, summaries)
+
+        lines = self._render_summary(kept, subtree_files, summaries, file_cap)
+        if budget:
+            used = 0
+            for i, line in enumerate(lines):
+                used += len(line) + 1
+                if used > budget:
+                    lines = lines[:i] + [f"... (目录树过大，已省略其余 {len(lines) - i} 行)"]
+                    break
+        return "\n".join(lines)
+
+    def _subtree_files(self, dir_id: int, kept) -> Iterator[int]:
+        stack = [dir_id]
+        while stack:
+            for child in self._children[stack.pop()]:
+                if child & 1:
+                    stack.append(child >> 1)
+                elif kept[child >> 1]:
+                    yield child >> 1
+
+    @staticmethod
+    def _extension(name: str) -> str:
+        ext = name.rpartition(".")[2]
+        return f".{ext}" if ext != name and ext else name
+
+    def _describe(self, dir_id: int, kept) -> str:
+        counts = Counter(self._extension(self._names[f]) for f in self._subtree_files(dir_id, kept))
+        top = counts.most_common(_SUMMARY_EXTENSIONS)
+        parts = [f"{n} 个 {ext}" for ext, n in top]
+        rest = sum(counts.values()) - sum(n for _, n in top)
+        if rest:
+            parts.append(f"{rest} 个其他")
+        return "、".join(parts) + " 文件"
+
+    def _is_uniform(self, dir_id: int, kept) -> bool:
+        """直接子项全部为同一扩展名的文件（且至少 2 个）：内容多半重复，优先折叠"""
+        exts = set()
+        files = 0
+        for child in self._children[dir_id]:
+            if child & 1:
+                return False
+            if kept[child >> 1]:
+                files += 1
+                exts.add(self._extension(self._names[child >> 1]))
+        return files > 1 and len(exts) == 1
+
+    def _visible_files(self, dir_id: int, kept, cap: Optional[int]) -> List[int]:
+        files = [child >> 1 for child in self._children[dir_id] if not child & 1 and kept[child >> 1]]
+        if cap is None or len(files) <= cap:
+            return files
+        # 大文件更可能承载核心逻辑；保留的文件仍按原顺序列出
+        ranked = sorted(files, key=lambda f: -self._sizes[f])[:cap]
+        return sorted(ranked)
+
+    def _file_cap(self, budget: int, kept, depth, subtree_files, summaries) -> int:
+        """二分查找每个目录最多列出的文件数，使渲染结果不超出预算"""
+        line_costs: List[List[int]] = [[] for _ in self._dirs]
+        for file_id, dir_id in enumerate(self._file_dirs):
+            if kept[file_id]:
+                line_costs[dir_id].append(len(_INDENT) * depth[dir_id] + len(self._names[file_id]) + 1)
+        # 未折叠的目录：其中的文件行按长度从大到小累加，作为列出前 cap 个文件时的字符数上界
+        fixed = 0
+        prefix_sums: List[tuple] = []
+        stack = [0]
+        while stack:
+            dir_id = stack.pop()
+            if dir_id in summaries:
+                fixed += len(summaries[dir_id]) + 1
+                continue
+            if dir_id:
+                fixed += len(_INDENT) * (depth[dir_id] - 1) + len(self._dir_names[dir_id]) + 2
+            sums = array("q", [0])
+            for c in sorted(line_costs[dir_id], reverse=True):
+                sums.append(sums[-1] + c)
+            prefix_sums.append((sums, len(_INDENT) * depth[dir_id] + _MORE_LINE_CHARS))
+            stack.extend(child >> 1 for child in self._children[dir_id] if child & 1 and subtree_files[child >> 1])
+
+        def size(cap: int) -> int:
+            total = fixed
+            for sums, more_chars in prefix_sums:
+                files = len(sums) - 1
+                total += sums[min(cap, files)]
+                if files > cap:
+                    total += more_chars
+            return total
+
+        lo, hi = 0, max((len(sums) - 1 for sums, _ in prefix_sums), default=0)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if size(mid) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def _render_summary(self, kept, subtree_files, summaries: Dict[int, str], file_cap: Optional[int]) -> List[str]:
+        """与 render 相同的显式栈遍历：跳过被剪掉的目录，折叠目录输出摘要行，超出 file_cap 的文件合并为一行"""
+        lines: List[str] = []
+
+        def frame(dir_id: int) -> list:
+            files = self._visible_files(dir_id, kept, file_cap)
+            total = sum(1 for child in self._children[dir_id] if not child & 1 and kept[child >> 1])
+            return [dir_id, 0, set(files) if file_cap is not None else None, total - len(files)]
+
+        stack = [frame(0)]
+        while stack:
+            top = stack[-1]
+            dir_id, pos, visible, omitted = top
+            children = self._children[dir_id]
+            indent = _INDENT * (len(stack) - 1)
+            if pos >= len(children):
+                if omitted:
+                    lines.append(f"{indent}... (另有 {omitted} 个文件)")
+                stack.pop()
+                continue
+            top[1] += 1
+            child = children[pos]
+            if child & 1:
+                child_id = child >> 1
+                if not subtree_files[child_id]:
+                    continue
+                if child_id in summaries:
+                    lines.append(summaries[child_id])
+                else:
+                    lines.append(f"{indent}{self._dir_names[child_id]}/")
+                    stack.append(frame(child_id))
+            elif kept[child >> 1] and (visible is None or child >> 1 in visible):
+                lines.append(indent + self._names[child >> 1])
+        return lines
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可 JSON 序列化的紧凑形式：目录表 + 每个文件的 [目录 id, 文件名, SHA, 大小]"""
+        return {
+            "dirs": self._dirs[1:],
+            "files": [
+                [self._file_dirs[i], self._names[i], self._shas[i], self._sizes[i]]
+                for i in range(len(self._names))
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PathIndex":
+        index = cls()
+        dirs = [""] + data.get("dirs", [])
+        for dir_id, name, sha, size in data.get("files", []):
+            dirpath = dirs[dir_id]
+            index.add(f"{dirpath}/{name}" if dirpath else name, sha, size if size >= 0 else None)
+        return index
+
+
+def render_tree(files: Iterable[str]) -> str:
+    """将扁平的文件路径列表渲染为树状缩进文本"""
+    return PathIndex.from_paths(files).render()